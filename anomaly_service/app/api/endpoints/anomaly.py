@@ -1,101 +1,517 @@
-from fastapi import APIRouter, HTTPException
-from app.models.session_models import SessionInput, RealSessionInput, AnomalyPredictionResponse, ErrorResponse
-from app.services.feature_extractor import FeatureExtractor
-from app.services.anomaly_predictor import AnomalyPredictor
-from app.utils.mongodb_parser import MongoDBParser
-import numpy as np
+import asyncio
+import hmac
+from typing import Any, AsyncIterator, Dict, List, Optional
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from app.api.responses import DuplexStreamingResponse
+from app.core.config import settings
+from app.models.session_models import (
+    SessionInput, RealSessionInput, AnomalyPredictionResponse, ErrorResponse,
+    BatchSessionInput, BatchPredictionResponse, BatchPredictionItem, JobSubmission
+)
+from app.services.scoring_pipeline import create_scoring_pipeline
+from app.services.executor import PredictionExecutor, ExecutorSaturatedError
+from app.services.metrics import metrics, observe_predictions, observe_since_request, span
+from app.services.job_queue import QUEUED, callback_allowed, create_job_runner, job_document
+from app.services.progression_index import SECONDS_PER_DAY, session_day
+from app.services.micro_batcher import MicroBatcher
+from app.services.profiler import SamplingProfiler, create_profiler
+from app.services.session_store import SessionStore
+from app.services.model_registry import ModelManager, create_model_registry
+from app.utils.session_stream import aiter_ndjson
 
 router = APIRouter()
-feature_extractor = FeatureExtractor()
-anomaly_predictor = AnomalyPredictor()
+scoring_pipeline = create_scoring_pipeline(load_models=False)
+prediction_executor = PredictionExecutor(
+    scoring_pipeline,
+    mode=settings.EXECUTOR_MODE,
+    max_workers=settings.EXECUTOR_WORKERS,
+    max_queue=settings.EXECUTOR_MAX_QUEUE
+)
+micro_batcher = MicroBatcher(
+    prediction_executor,
+    max_batch_size=settings.MICROBATCH_MAX_SIZE,
+    max_wait_ms=settings.MICROBATCH_MAX_WAIT_MS,
+    max_pending=settings.MICROBATCH_MAX_PENDING
+)
+model_manager = ModelManager(scoring_pipeline, create_model_registry())
+request_profiler = create_profiler()
+job_runner = create_job_runner(prediction_executor)
 
-def convert_session_format(session_input: SessionInput) -> dict:
-    """Convierte el formato MongoDB Extended JSON a formato estándar"""
-    return MongoDBParser.convert_session_data(session_input.dict())
+if metrics is not None:
+    metrics.add_gauge("executor_in_flight", "Tareas del executor en curso o en espera",
+                      lambda: prediction_executor.stats()["in_flight"])
+    metrics.add_gauge("microbatch_queue_depth", "Peticiones esperando a formar un lote",
+                      lambda: micro_batcher.stats()["queue_depth"])
+    metrics.add_gauge("model_loaded", "Si el modelo activo está cargado",
+                      lambda: {(scoring_pipeline.anomaly_predictor.model_version,):
+                               float(scoring_pipeline.anomaly_predictor.is_loaded)}, ("version",))
+    if scoring_pipeline.drift_monitor is not None:
+        metrics.add_gauge("drift_psi", "PSI de cada distribución en la última revisión de drift",
+                          lambda: {(name,): signal["psi"] for name, signal in
+                                   ((scoring_pipeline.drift_monitor.last_report() or {}).get("signals") or {}).items()},
+                          ("signal",))
+    if job_runner is not None:
+        metrics.add_gauge("jobs", "Trabajos asíncronos por estado",
+                          lambda: {(status,): float(count) for status, count in job_runner.store.counts().items()},
+                          ("status",))
+
+def verify_admin_token(token: Optional[str]) -> None:
+    """
+    Exige X-Admin-Token en los endpoints de administración
+
+    Sin ADMIN_TOKEN los endpoints quedan desactivados (403) en lugar de abiertos.
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Los endpoints de administración están desactivados (ADMIN_TOKEN no definido)"
+        )
+    if token is None or not hmac.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+async def run_in_executor(method: str, *args: Any) -> Any:
+    """Ejecuta trabajo de CPU del pipeline fuera del event loop; 503 si el servicio está saturado"""
+    try:
+        return await prediction_executor.run(method, *args)
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def json_response(result: Any, exclude: Any = None) -> Response:
+    """
+    Serializa un modelo de respuesta directamente a JSON
+
+    FastAPI volvería a convertir el modelo a diccionario y a validarlo contra
+    `response_model` (que se mantiene para la documentación); el resultado ya
+    es un modelo validado.
+    """
+    return Response(content=result.model_dump_json(exclude=exclude), media_type="application/json")
+
+# Campos que omite la respuesta compacta (?compact=true)
+COMPACT_EXCLUDE = {"features_used"}
+COMPACT_BATCH_EXCLUDE = {"results": {"__all__": {"result": COMPACT_EXCLUDE}}}
+
+async def predict_single(session_data: Any, extended_json: bool) -> AnomalyPredictionResponse:
+    """Predice una sesión, agrupándola con otras peticiones concurrentes si el micro-batching está activo"""
+    if not settings.MICROBATCH_ENABLED:
+        return await run_in_executor("predict_session", session_data, extended_json)
+    try:
+        return await micro_batcher.submit(session_data, extended_json)
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
 
 @router.post("/predict", response_model=AnomalyPredictionResponse)
-async def predict_anomaly(session: SessionInput):
+async def predict_anomaly(session: SessionInput, compact: bool = False):
     """
     Predice anomalías en una sesión de ejercicio usando formato MongoDB Extended JSON
+
+    Con `?compact=true` la respuesta omite `features_used`.
     """
+    observe_since_request("request_parsing")
     try:
-        # Convertir formato MongoDB a estándar
-        session_data = convert_session_format(session)
-        
-        # Extraer características
-        features_dict = feature_extractor.extract_features_from_session(session_data)
-        
-        # Crear array de características para el modelo
-        features_array = np.array([
-            features_dict['adjusted_performance'],
-            features_dict['avg_weight'],
-            features_dict['avg_reps'],
-            features_dict['std_weight'],
-            features_dict['rest_per_set'],
-            features_dict['total_sets'],
-            features_dict['totalDuration']
-        ])
-        
-        # Crear resumen de sesión
-        session_summary = {
-            "total_volume": features_dict.get('total_volume', 0),
-            "intensity_index": features_dict.get('intensity_index', 0),
-            "muscle_groups_count": features_dict.get('muscle_groups_count', 0),
-            "dominant_muscle_group": features_dict.get('dominant_muscle_group', 'N/A')
-        }
-        
-        # Obtener predicción con clasificación
-        response = anomaly_predictor.get_prediction_details(
-            features_array, features_dict, session_summary
-        )
-        
-        return response
-        
+        # Conversión, extracción de características y predicción en el executor
+        with span("inference"):
+            result = await predict_single(session, True)
+        observe_predictions([result])
+        with span("serialize"):
+            return json_response(result, COMPACT_EXCLUDE if compact else None)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+    finally:
+        if request_profiler is not None:
+            request_profiler.request_finished()
 
 @router.post("/predict-real", response_model=AnomalyPredictionResponse)
-async def predict_anomaly_real(session: RealSessionInput):
+async def predict_anomaly_real(session: RealSessionInput, compact: bool = False):
     """
     Predice anomalías en una sesión de ejercicio usando formato JSON estándar
+
+    Con `?compact=true` la respuesta omite `features_used`.
     """
+    observe_since_request("request_parsing")
     try:
-        # Extraer características directamente del formato estándar
-        features_dict = feature_extractor.extract_features_from_session(session.dict())
-        
-        # Crear array de características para el modelo
-        features_array = np.array([
-            features_dict['adjusted_performance'],
-            features_dict['avg_weight'],
-            features_dict['avg_reps'],
-            features_dict['std_weight'],
-            features_dict['rest_per_set'],
-            features_dict['total_sets'],
-            features_dict['totalDuration']
-        ])
-        
-        # Crear resumen de sesión
-        session_summary = {
-            "total_volume": features_dict.get('total_volume', 0),
-            "intensity_index": features_dict.get('intensity_index', 0),
-            "muscle_groups_count": features_dict.get('muscle_groups_count', 0),
-            "dominant_muscle_group": features_dict.get('dominant_muscle_group', 'N/A')
-        }
-        
-        # Obtener predicción con clasificación
-        response = anomaly_predictor.get_prediction_details(
-            features_array, features_dict, session_summary
+        # El extractor lee el modelo validado directamente (sin .dict())
+        with span("inference"):
+            result = await predict_single(session, False)
+        observe_predictions([result])
+        with span("serialize"):
+            return json_response(result, COMPACT_EXCLUDE if compact else None)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+    finally:
+        if request_profiler is not None:
+            request_profiler.request_finished()
+
+@router.post("/predict-batch", response_model=BatchPredictionResponse)
+async def predict_anomaly_batch(batch: BatchSessionInput, compact: bool = False):
+    """
+    Predice anomalías en un lote de sesiones (MongoDB Extended JSON o JSON estándar)
+
+    Todas las sesiones válidas se escalan y puntúan con una sola llamada al modelo.
+    Una sesión mal formada se reporta en su posición sin hacer fallar el lote.
+    Con `?compact=true` los resultados omiten `features_used`.
+    """
+    observe_since_request("request_parsing")
+    if len(batch.sessions) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote excede el máximo de {settings.MAX_BATCH_SIZE} sesiones"
+        )
+
+    try:
+        with span("inference"):
+            results = await run_in_executor("score_sessions", batch.sessions)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+
+    failed = sum(1 for item in results if item.error is not None)
+    response = BatchPredictionResponse(
+        total=len(results),
+        succeeded=len(results) - failed,
+        failed=failed,
+        results=results
+    )
+    observe_predictions([item.result for item in results])
+    with span("serialize"):
+        return json_response(response, COMPACT_BATCH_EXCLUDE if compact else None)
+
+@router.post("/predict-stream")
+async def predict_anomaly_stream(request: Request):
+    """
+    Predice anomalías para un cuerpo NDJSON (una sesión por línea, `application/x-ndjson`)
+
+    Las sesiones se leen del cuerpo a medida que llegan, se puntúan en bloques de
+    STREAM_CHUNK_SIZE y cada resultado se emite como una línea NDJSON en cuanto su
+    bloque termina, sin mantener en memoria la petición ni la respuesta completas.
+    """
+    return DuplexStreamingResponse(stream_predictions(request), media_type="application/x-ndjson")
+
+async def stream_predictions(request: Request) -> AsyncIterator[str]:
+    """Lee sesiones NDJSON del cuerpo y emite sus resultados por bloques"""
+    next_index = 0
+    chunk: List[Any] = []
+    parse_errors: Dict[int, str] = {}
+
+    async for value in aiter_ndjson(request.stream(), settings.STREAM_MAX_LINE_BYTES):
+        if isinstance(value, Exception):
+            parse_errors[len(chunk)] = f"Línea JSON inválida: {str(value)}"
+            value = None
+        chunk.append(value)
+        if len(chunk) >= settings.STREAM_CHUNK_SIZE:
+            yield await score_stream_chunk(chunk, next_index, parse_errors)
+            next_index += len(chunk)
+            chunk, parse_errors = [], {}
+
+    if chunk:
+        yield await score_stream_chunk(chunk, next_index, parse_errors)
+
+async def score_stream_chunk(chunk: List[Any], first_index: int, parse_errors: Dict[int, str]) -> str:
+    """Puntúa un bloque del stream y lo serializa como líneas NDJSON"""
+    while True:
+        try:
+            items = await prediction_executor.run("score_sessions", chunk, first_index)
+            break
+        except ExecutorSaturatedError:
+            # La respuesta ya empezó: en lugar de un 503 se espera a que haya capacidad
+            await asyncio.sleep(0.05)
+        except Exception as e:
+            items = [
+                BatchPredictionItem(index=first_index + offset, error=f"Error interno del servidor: {str(e)}")
+                for offset in range(len(chunk))
+            ]
+            break
+
+    for offset, message in parse_errors.items():
+        items[offset] = BatchPredictionItem(index=first_index + offset, error=message)
+    observe_predictions([item.result for item in items])
+    return "".join(item.model_dump_json() + "\n" for item in items)
+
+@router.post("/jobs", status_code=202)
+async def submit_job(job: JobSubmission):
+    """
+    Encola una o varias sesiones para puntuarlas en segundo plano
+
+    Responde de inmediato con el id del trabajo. El resultado (el mismo
+    cuerpo que /predict-batch) se consulta en GET /jobs/{job_id} o se envía
+    por POST a `callback_url` al terminar. Los trabajos pendientes se
+    guardan en disco y sobreviven a un reinicio.
+    """
+    if job_runner is None:
+        raise HTTPException(status_code=404, detail="La cola de trabajos está desactivada (JOBS_ENABLED=false)")
+    if len(job.sessions) > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El trabajo excede el máximo de {settings.MAX_BATCH_SIZE} sesiones"
+        )
+
+    callback_url = str(job.callback_url) if job.callback_url is not None else None
+    if callback_url is not None and not callback_allowed(callback_url):
+        raise HTTPException(
+            status_code=400,
+            detail="callback_url no permitido: su host no está en JOBS_CALLBACK_ALLOWED_HOSTS"
         )
-        
-        return response
-        
+
+    try:
+        queued = (await asyncio.to_thread(job_runner.store.counts))[QUEUED]
+        if queued >= settings.JOBS_MAX_QUEUED:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Cola de trabajos llena: {queued} trabajos pendientes",
+                headers={"Retry-After": "5"}
+            )
+        job_id = await asyncio.to_thread(job_runner.store.enqueue, job.sessions, callback_url)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+    job_runner.notify()
+    return {
+        "job_id": job_id,
+        "status": QUEUED,
+        "total": len(job.sessions),
+        "status_url": f"{settings.API_V1_STR}/anomaly/jobs/{job_id}"
+    }
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str, compact: bool = False):
+    """
+    Estado de un trabajo (`queued`, `running`, `done` o `failed`) y su resultado al terminar
+
+    Con `?compact=true` los resultados omiten `features_used`.
+    """
+    if job_runner is None:
+        raise HTTPException(status_code=404, detail="La cola de trabajos está desactivada (JOBS_ENABLED=false)")
+    job = await asyncio.to_thread(job_runner.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Trabajo desconocido: {job_id}")
+    return Response(
+        content=job_document(job, COMPACT_BATCH_EXCLUDE if compact else None),
+        media_type="application/json"
+    )
+
 @router.get("/health")
 async def health_check():
     """Verificación de salud del servicio"""
-    return {"status": "healthy", "service": "anomaly-detection"}
+    return {
+        "status": "healthy",
+        "service": "anomaly-detection",
+        "model_loaded": scoring_pipeline.anomaly_predictor.is_loaded,
+        "model_version": scoring_pipeline.anomaly_predictor.model_version
+    }
+
+@router.get("/models")
+async def list_models(x_admin_token: Optional[str] = Header(None)):
+    """Versiones del registro de modelos, versión activa y estado de la activación en curso"""
+    verify_admin_token(x_admin_token)
+    return model_manager.status()
+
+@router.post("/models/{version}/activate", status_code=202)
+async def activate_model(version: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Carga y activa una versión del modelo en segundo plano
+
+    El modelo actual sigue respondiendo hasta que la nueva versión está
+    cargada y calentada; el progreso se consulta en GET /models.
+    """
+    verify_admin_token(x_admin_token)
+    try:
+        model_manager.start_activation(version)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": f"Cargando la versión {version}", "version": version}
+
+@router.get("/stats")
+async def service_stats():
+    """Métricas internas del executor, del micro-batching y de las cachés"""
+    result_cache = scoring_pipeline.result_cache
+    feature_memo = scoring_pipeline.anomaly_predictor.feature_memo
+    user_baselines = scoring_pipeline.user_baselines
+    progression_index = scoring_pipeline.progression_index
+    session_store = scoring_pipeline.session_store
+    drift_monitor = scoring_pipeline.drift_monitor
+    # Los trabajos por estado se cuentan en SQLite
+    jobs = await asyncio.to_thread(job_runner.stats) if job_runner is not None else {"enabled": False}
+    return {
+        "executor": prediction_executor.stats(),
+        "micro_batching": {"enabled": settings.MICROBATCH_ENABLED, **micro_batcher.stats()},
+        "result_cache": result_cache.stats() if result_cache is not None else {"enabled": False},
+        "feature_memo": feature_memo.stats() if feature_memo is not None else {"enabled": False},
+        "user_baselines": user_baselines.stats() if user_baselines is not None else {"enabled": False},
+        "progression": progression_index.stats() if progression_index is not None else {"enabled": False},
+        "jobs": jobs,
+        "session_store": session_store.stats() if session_store is not None else {"enabled": False},
+        "drift": drift_monitor.stats() if drift_monitor is not None else {"enabled": False}
+    }
+
+def get_profiler(x_admin_token: Optional[str]) -> SamplingProfiler:
+    """Profiler del proceso; 404 si PROFILING_ENABLED está desactivado"""
+    verify_admin_token(x_admin_token)
+    if request_profiler is None:
+        raise HTTPException(status_code=404, detail="El profiler está desactivado (PROFILING_ENABLED=false)")
+    return request_profiler
+
+@router.post("/profile", status_code=202)
+async def start_profile(requests: int = 100, interval_ms: float = settings.PROFILING_INTERVAL_MS,
+                        x_admin_token: Optional[str] = Header(None)):
+    """
+    Perfila por muestreo las próximas `requests` peticiones a /predict y /predict-real
+
+    El perfil agrega todo lo que ejecuta el proceso mientras dura la captura
+    (incluidas otras peticiones concurrentes); se descarga con GET /profile/download.
+    """
+    profiler = get_profiler(x_admin_token)
+    try:
+        profiler.start(requests, interval_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"message": f"Perfilando las próximas {requests} peticiones", **profiler.status()}
+
+@router.get("/profile")
+async def profile_status(x_admin_token: Optional[str] = Header(None)):
+    """Estado de la captura de perfil en curso o de la última"""
+    return get_profiler(x_admin_token).status()
+
+@router.get("/profile/download")
+async def download_profile(format: str = "collapsed", top: int = 30, x_admin_token: Optional[str] = Header(None)):
+    """
+    Descarga el perfil agregado de la última captura
+
+    `format=collapsed` devuelve las pilas en formato "collapsed" (flamegraph.pl,
+    speedscope); `format=json`, las funciones con más muestras propias e inclusivas.
+    """
+    profiler = get_profiler(x_admin_token)
+    if profiler.started_at is None:
+        raise HTTPException(status_code=404, detail="No hay ningún perfil capturado")
+    if format == "json":
+        return profiler.summary(top)
+    if format != "collapsed":
+        raise HTTPException(status_code=400, detail="format debe ser 'collapsed' o 'json'")
+    return Response(
+        content=profiler.collapsed(),
+        media_type="text/plain",
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed.txt"'}
+    )
+
+@router.get("/progression/{user_id}")
+async def user_progression(user_id: str, x_admin_token: Optional[str] = Header(None)):
+    """
+    Tendencia de progresión de cada ejercicio de un usuario
+
+    Pendiente de la regresión del peso medio del ejercicio contra la fecha,
+    sobre todas las sesiones puntuadas por el servicio.
+    """
+    verify_admin_token(x_admin_token)
+    progression_index = scoring_pipeline.progression_index
+    if progression_index is None:
+        raise HTTPException(status_code=404, detail="El índice de progresión está desactivado")
+    exercises = progression_index.user_progression(user_id)
+    if exercises is None:
+        raise HTTPException(status_code=404, detail=f"Sin sesiones registradas para el usuario {user_id}")
+    return {"user_id": user_id, "exercises": exercises}
+
+HISTORY_MAX_LIMIT = 1000
+
+def get_session_store() -> SessionStore:
+    session_store = scoring_pipeline.session_store
+    if session_store is None:
+        raise HTTPException(
+            status_code=404, detail="El historial de sesiones está desactivado (SESSION_STORE_ENABLED=false)"
+        )
+    return session_store
+
+def parse_history_date(name: str, value: Optional[str]) -> Optional[float]:
+    """Fecha ISO de un parámetro de consulta en segundos desde epoch"""
+    if value is None:
+        return None
+    day = session_day(value)
+    if day is None:
+        raise HTTPException(status_code=422, detail=f"Fecha inválida en {name}: {value}")
+    return day * SECONDS_PER_DAY
+
+@router.get("/history/stats")
+async def history_stats(days: Optional[float] = 30, x_admin_token: Optional[str] = Header(None)):
+    """
+    Totales de las sesiones puntuadas en los últimos `days` días (`days=0` = todo el historial)
+
+    Sesiones, anomalías y risk_score medio, por tipo de anomalía, por versión
+    del modelo y por día. Se leen de los conteos diarios del historial, sin
+    recorrer las sesiones.
+    """
+    verify_admin_token(x_admin_token)
+    session_store = get_session_store()
+    try:
+        return await asyncio.to_thread(session_store.global_stats, days or None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+
+@router.get("/history/users/{user_id}")
+async def user_history(user_id: str, since: Optional[str] = None, until: Optional[str] = None,
+                       limit: int = 100, anomalies_only: bool = False,
+                       x_admin_token: Optional[str] = Header(None)):
+    """
+    Sesiones puntuadas de un usuario, de la más reciente a la más antigua
+
+    Cada sesión incluye su fecha, etiqueta, tipo de anomalía, risk_score,
+    versión del modelo y características. `since` y `until` son fechas ISO.
+    """
+    verify_admin_token(x_admin_token)
+    session_store = get_session_store()
+    if not 1 <= limit <= HISTORY_MAX_LIMIT:
+        raise HTTPException(status_code=422, detail=f"limit debe estar entre 1 y {HISTORY_MAX_LIMIT}")
+    since_seconds = parse_history_date("since", since)
+    until_seconds = parse_history_date("until", until)
+    try:
+        sessions = await asyncio.to_thread(
+            session_store.user_history, user_id, since_seconds, until_seconds, limit, anomalies_only
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+    return {"user_id": user_id, "count": len(sessions), "sessions": sessions}
+
+@router.get("/history/users/{user_id}/stats")
+async def user_history_stats(user_id: str, days: Optional[float] = 30, x_admin_token: Optional[str] = Header(None)):
+    """Sesiones, tasa de anomalías y risk_score de un usuario en los últimos `days` días (`days=0` = todo)"""
+    verify_admin_token(x_admin_token)
+    session_store = get_session_store()
+    try:
+        stats = await asyncio.to_thread(session_store.user_stats, user_id, days or None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Sin sesiones registradas para el usuario {user_id}")
+    return stats
+
+@router.get("/drift")
+async def drift_report():
+    """
+    Deriva de las características y del risk_score respecto al entrenamiento
+
+    `current` compara la ventana en curso (desde la última revisión) y
+    `last_check` es el resultado de la última revisión periódica. Para cada
+    distribución se reporta PSI, KS y cuantiles de referencia y en vivo;
+    `status` es `stable`, `warning` o `drift` según DRIFT_PSI_WARNING y
+    DRIFT_PSI_ALERT.
+    """
+    drift_monitor = scoring_pipeline.drift_monitor
+    if drift_monitor is None:
+        raise HTTPException(status_code=404, detail="El monitor de drift está desactivado (DRIFT_ENABLED=false)")
+    return {
+        "thresholds": {"psi_warning": drift_monitor.psi_warning, "psi_alert": drift_monitor.psi_alert,
+                       "min_sessions": drift_monitor.min_sessions},
+        "check_interval_seconds": settings.DRIFT_CHECK_INTERVAL_SECONDS,
+        "current": drift_monitor.current(),
+        "last_check": drift_monitor.last_report()
+    }
 
 @router.post("/test-features")
 async def test_feature_extraction(session: SessionInput):
@@ -103,12 +519,13 @@ async def test_feature_extraction(session: SessionInput):
     Endpoint para probar la extracción de características con formato MongoDB
     """
     try:
-        session_data = convert_session_format(session)
-        features = feature_extractor.extract_features_from_session(session_data)
+        features = await run_in_executor("extract_features", session, True)
         return {
             "message": "Características extraídas exitosamente",
             "features": features
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en extracción: {str(e)}")
 
@@ -118,10 +535,12 @@ async def test_feature_extraction_real(session: RealSessionInput):
     Endpoint para probar la extracción de características con formato JSON estándar
     """
     try:
-        features = feature_extractor.extract_features_from_session(session.dict())
+        features = await run_in_executor("extract_features", session, False)
         return {
             "message": "Características extraídas exitosamente",
             "features": features
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en extracción: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error en extracción: {str(e)}")
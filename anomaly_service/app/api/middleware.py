@@ -0,0 +1,54 @@
+import time
+from typing import Any, Callable, Dict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import MetricsRegistry, request_started
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que registra conteo, errores y latencia de cada petición
+
+    La ruta se etiqueta con su plantilla (`/api/v1/anomaly/progression/{user_id}`),
+    no con la URL, para que el número de series no crezca con los parámetros;
+    las peticiones que no corresponden a ninguna ruta se agrupan en "other".
+    Es un middleware ASGI puro (sin BaseHTTPMiddleware) para no añadir una
+    tarea ni copiar el cuerpo de la respuesta.
+    """
+
+    def __init__(self, app: ASGIApp, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+        self._routes: Dict[Callable[..., Any], str] = {}
+
+    def route_template(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "other"
+        if endpoint not in self._routes:
+            for route in scope["app"].routes:
+                if getattr(route, "endpoint", None) is not None:
+                    self._routes[route.endpoint] = route.path
+        return self._routes.get(endpoint, "other")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_started.set(start)
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.registry.observe_request(scope["method"], self.route_template(scope), status,
+                                          time.perf_counter() - start)
@@ -0,0 +1,18 @@
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que puede seguir leyendo el cuerpo de la petición mientras responde
+
+    StreamingResponse escucha `receive()` en paralelo para detectar la desconexión
+    del cliente, lo que consume los mensajes del cuerpo que el generador todavía
+    necesita leer con `request.stream()`. Aquí solo se emite la respuesta; una
+    desconexión llega al generador como ClientDisconnect al leer el cuerpo.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
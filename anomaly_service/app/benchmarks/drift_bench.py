@@ -0,0 +1,102 @@
+"""
+Benchmark del monitor de drift
+
+Compara con la referencia del modelo activo varias poblaciones puntuadas
+con él: las propias sesiones de entrenamiento (PSI y KS deben ser 0), un
+remuestreo con reemplazo de esas sesiones (misma distribución: solo ruido
+de muestreo) y el mismo remuestreo con un cambio conocido (descansos al
+doble, pesos un 30% mayores). Después mide el costo de `observe` por sesión
+para lotes de 1 y de 4096 sesiones.
+
+Uso:
+    python -m app.benchmarks.drift_bench [--sessions 5000] [--repeat 2000]
+"""
+import argparse
+import copy
+import json
+import random
+import time
+import warnings
+from typing import Any, Callable, Dict, List
+
+from app.benchmarks.predictor_bench import SESSIONS_FILE
+from app.services.drift_monitor import DriftMonitor, load_reference
+from app.services.feature_extractor import FeatureExtractor
+from app.services.model_registry import create_model_registry
+from app.services.scoring_pipeline import ScoringPipeline
+
+
+def scale_sets(sessions: List[Dict[str, Any]], field: str, factor: float) -> List[Dict[str, Any]]:
+    """Copia de las sesiones con `field` de cada set multiplicado por `factor` (y totalRestTime coherente)"""
+    shifted = copy.deepcopy(sessions)
+    for session in shifted:
+        for exercise in session["exercises"]:
+            for s in exercise["sets"]:
+                s[field] = s[field] * factor
+        if field == "restTime":
+            session["totalRestTime"] = session["totalRestTime"] * factor
+    return shifted
+
+
+def run(sessions: int, repeat: int) -> Dict[str, Any]:
+    registry = create_model_registry()
+    pipeline = ScoringPipeline(FeatureExtractor(), registry.create_predictor(registry.active_version()))
+
+    def monitor() -> DriftMonitor:
+        return DriftMonitor(lambda version: load_reference(registry, version), min_sessions=1)
+
+    def score(batch: List[Dict[str, Any]]) -> List[Any]:
+        return [r for r in pipeline.predict_sessions(batch, [False] * len(batch)) if not isinstance(r, Exception)]
+
+    with open(SESSIONS_FILE) as f:
+        training = json.load(f)
+    resampled = random.Random(0).choices(training, k=sessions)
+    populations: Dict[str, List[Dict[str, Any]]] = {
+        "entrenamiento": training,
+        "remuestreo": resampled,
+        "descanso x2": scale_sets(resampled, "restTime", 2.0),
+        "peso +30%": scale_sets(resampled, "weight", 1.3),
+    }
+    reports = {}
+    for name, population in populations.items():
+        drift_monitor = monitor()
+        drift_monitor.observe(score(population))
+        reports[name] = drift_monitor.current()
+
+    responses = score(resampled[:4096])
+    drift_monitor = monitor()
+    drift_monitor.observe(responses[:1])
+
+    def per_session_us(fn: Callable[[], None], count: int, calls: int) -> float:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        return (time.perf_counter() - start) / (calls * count) * 1e6
+
+    cost = {
+        1: per_session_us(lambda: drift_monitor.observe(responses[:1]), 1, repeat),
+        len(responses): per_session_us(lambda: drift_monitor.observe(responses), len(responses), 5),
+    }
+    return {"reports": reports, "cost_us": cost}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validación y costo del monitor de drift")
+    parser.add_argument("--sessions", type=int, default=5000, help="Sesiones remuestreadas por población")
+    parser.add_argument("--repeat", type=int, default=2000, help="Llamadas para medir lotes de 1 sesión")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    results = run(args.sessions, args.repeat)
+    for name, report in results["reports"].items():
+        signals = report["signals"]
+        top = sorted(signals, key=lambda signal: -signals[signal]["psi"])[:3]
+        print(f"{name:<14} {report['sessions']:>6} sesiones  {report['status']:<8} "
+              + "  ".join(f"{signal} PSI={signals[signal]['psi']:.3f} KS={signals[signal]['ks']:.3f}"
+                          for signal in top))
+    for size, cost in results["cost_us"].items():
+        print(f"observe, lotes de {size}: {cost:.1f} µs/sesión")
+
+
+if __name__ == "__main__":
+    main()
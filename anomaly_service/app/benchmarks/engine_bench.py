@@ -0,0 +1,80 @@
+"""
+Benchmark del motor de scoring compilado
+
+Verifica que CompiledIsolationForest reproduce IsolationForest.score_samples
+dentro de una tolerancia y compara la latencia de AnomalyPredictor.predict_batch
+con ambos motores para distintos tamaños de lote.
+
+Uso:
+    python -m app.benchmarks.engine_bench [--batch-sizes 1 64 4096] [--repeat 50]
+"""
+import argparse
+import warnings
+import numpy as np
+from typing import Dict, List
+
+from app.services.anomaly_predictor import AnomalyPredictor
+from app.benchmarks.predictor_bench import load_feature_matrix, time_per_call
+
+SCORE_TOLERANCE = 1e-9
+
+
+def make_batch(features: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Genera un lote muestreando sesiones reales con ruido multiplicativo"""
+    rows = features[rng.integers(0, len(features), size=size)]
+    return rows * rng.normal(1.0, 0.2, size=rows.shape)
+
+
+def check_parity(sklearn_predictor: AnomalyPredictor, compiled: AnomalyPredictor, features: np.ndarray) -> float:
+    """Compara los scores del motor compilado con sklearn; devuelve la diferencia máxima"""
+    features_scaled = compiled._scale(features)
+    np.testing.assert_array_equal(features_scaled, sklearn_predictor._scale(features))
+    expected = sklearn_predictor.model.score_samples(features_scaled)
+    actual = compiled.compiled_model.score_samples(features_scaled)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > SCORE_TOLERANCE:
+        raise AssertionError(f"Scores fuera de tolerancia: diferencia máxima {max_diff:.3e}")
+    np.testing.assert_array_equal(
+        compiled.compiled_model.predict(features_scaled),
+        sklearn_predictor.model.predict(features_scaled)
+    )
+    return max_diff
+
+
+def run(batch_sizes: List[int], repeat: int) -> Dict[int, Dict[str, float]]:
+    sklearn_predictor = AnomalyPredictor(scoring_engine="sklearn")
+    compiled_predictor = AnomalyPredictor(scoring_engine="compiled")
+    # Sin memo: se mide el recorrido del bosque, no los aciertos del memo
+    sklearn_predictor.feature_memo = compiled_predictor.feature_memo = None
+    features = load_feature_matrix()
+    rng = np.random.default_rng(0)
+
+    max_diff = check_parity(sklearn_predictor, compiled_predictor, np.vstack([features, make_batch(features, 20000, rng)]))
+    print(f"Paridad con score_samples: OK (diferencia máxima {max_diff:.1e})")
+
+    results = {}
+    for size in batch_sizes:
+        batch = make_batch(features, size, rng)
+        results[size] = {
+            "sklearn_ms": time_per_call(lambda: sklearn_predictor.predict_batch(batch), repeat),
+            "compiled_ms": time_per_call(lambda: compiled_predictor.predict_batch(batch), repeat),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del motor de scoring compilado")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    results = run(args.batch_sizes, args.repeat)
+    print(f"{'lote':>6} {'sklearn (ms)':>14} {'compilado (ms)':>16} {'speedup':>9}")
+    for size, timing in results.items():
+        speedup = timing["sklearn_ms"] / timing["compiled_ms"]
+        print(f"{size:>6} {timing['sklearn_ms']:>14.3f} {timing['compiled_ms']:>16.3f} {speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark del FeatureExtractor columnar
+
+Verifica que extract_features_batch produce exactamente los mismos
+diccionarios (valores y tipos) que extract_features_from_session y compara
+el tiempo de ambos caminos.
+
+Uso:
+    python -m app.benchmarks.extractor_bench [--copies 20]
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from app.services.feature_extractor import FeatureExtractor
+from app.benchmarks.predictor_bench import SESSIONS_FILE
+
+
+def check_parity(extractor: FeatureExtractor, sessions: List[Dict[str, Any]]) -> None:
+    """Compara sesión a sesión el camino columnar con el camino por sesión"""
+    for index, (session, batch_features) in enumerate(zip(sessions, extractor.extract_features_batch(sessions))):
+        expected = extractor.extract_features_from_session(session)
+        if isinstance(batch_features, Exception):
+            raise AssertionError(f"Sesión {index}: error inesperado {batch_features!r}")
+        if list(expected) != list(batch_features):
+            raise AssertionError(f"Sesión {index}: claves distintas")
+        for key, value in expected.items():
+            if value != batch_features[key] or type(value) is not type(batch_features[key]):
+                raise AssertionError(f"Sesión {index}: '{key}' {value!r} != {batch_features[key]!r}")
+
+
+def run(copies: int) -> Dict[str, float]:
+    extractor = FeatureExtractor()
+    with open(SESSIONS_FILE) as f:
+        sessions = json.load(f)
+    check_parity(extractor, sessions)
+
+    sessions = sessions * copies
+    start = time.perf_counter()
+    for session in sessions:
+        extractor.extract_features_from_session(session)
+    per_session_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    extractor.extract_features_batch(sessions)
+    columnar_ms = (time.perf_counter() - start) * 1000
+
+    return {"sessions": len(sessions), "per_session_ms": per_session_ms, "columnar_ms": columnar_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del FeatureExtractor columnar")
+    parser.add_argument("--copies", type=int, default=20, help="Veces que se replica el export de sesiones")
+    args = parser.parse_args()
+
+    results = run(args.copies)
+    print("Paridad con extract_features_from_session: OK")
+    print(f"{results['sessions']} sesiones")
+    print(f"por sesión: {results['per_session_ms']:.1f} ms")
+    print(f"columnar:   {results['columnar_ms']:.1f} ms "
+          f"({results['per_session_ms'] / results['columnar_ms']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark del historial de sesiones puntuadas
+
+Llena un historial nuevo con sesiones sintéticas (usuarios y fechas al azar
+en el último año) y mide el costo de `append` en el camino de la petición,
+las filas por segundo del hilo de escritura y la latencia de las consultas
+de historial y estadísticas por usuario y globales.
+
+Uso:
+    python -m app.benchmarks.history_bench [--sessions 1000000] [--users 5000] [--queries 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.models.session_models import AnomalyPredictionResponse
+from app.services.feature_extractor import FeatureExtractor
+from app.services.session_store import SessionStore
+
+ANOMALY_TYPES = ["Sesión muy corta", "Descanso excesivo", "Desempeño irregular", "Volumen inusual"]
+
+
+def make_responses(count: int, rng: np.random.Generator) -> List[AnomalyPredictionResponse]:
+    """Respuestas con características y scores al azar (10% de anomalías)"""
+    features = rng.gamma(2.0, 50.0, size=(count, len(FeatureExtractor.MODEL_FEATURES)))
+    anomalies = rng.random(count) < 0.1
+    responses = []
+    for row, is_anomaly in zip(features, anomalies):
+        responses.append(AnomalyPredictionResponse.model_construct(
+            prediction="Anomalía" if is_anomaly else "Normal",
+            risk_score=float(-0.65 if is_anomaly else -0.45),
+            features_used=dict(zip(FeatureExtractor.MODEL_FEATURES, row.tolist())),
+            anomaly_type=ANOMALY_TYPES[int(row[0]) % len(ANOMALY_TYPES)] if is_anomaly else "Ninguna",
+            model_version="default",
+        ))
+    return responses
+
+
+def latency_ms(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    p50, p99 = np.percentile(timings, [50, 99])
+    return {"p50_ms": float(p50), "p99_ms": float(p99)}
+
+
+def run(sessions: int, users: int, queries: int, batch_size: int) -> Dict[str, Dict[str, float]]:
+    rng = np.random.default_rng(0)
+    now = time.time()
+    responses = make_responses(min(sessions, 10000), rng)
+    user_ids = [f"user{i:06d}" for i in range(users)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SessionStore(os.path.join(directory, "sessions.sqlite"), batch_size=batch_size,
+                             max_buffer=sessions)
+        append_seconds = 0.0
+        flush_seconds = 0.0
+        for offset in range(0, sessions, batch_size):
+            count = min(batch_size, sessions - offset)
+            dates = now - rng.random(count) * 365 * 86400
+            chosen_users = rng.integers(0, users, size=count)
+            start = time.perf_counter()
+            for i in range(count):
+                store.append(
+                    {"userId": user_ids[chosen_users[i]], "date": float(dates[i])},
+                    responses[(offset + i) % len(responses)],
+                    f"s{offset + i}"
+                )
+            append_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            store.flush()
+            flush_seconds += time.perf_counter() - start
+
+        results = {
+            "write": {
+                "append_us": append_seconds / sessions * 1e6,
+                "flush_rows_per_s": sessions / flush_seconds,
+                "db_mb": os.path.getsize(store.path) / 2 ** 20,
+            },
+            "user_history": latency_ms(lambda: store.user_history(user_ids[rng.integers(users)], limit=100), queries),
+            "user_stats_30d": latency_ms(lambda: store.user_stats(user_ids[rng.integers(users)], 30), queries),
+            "global_stats_30d": latency_ms(lambda: store.global_stats(30), queries),
+            "global_stats_all": latency_ms(lambda: store.global_stats(None), queries),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escritura y consultas del historial de sesiones")
+    parser.add_argument("--sessions", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200, help="Consultas por tipo")
+    parser.add_argument("--batch-size", type=int, default=500, help="Filas por transacción")
+    args = parser.parse_args()
+
+    results = run(args.sessions, args.users, args.queries, args.batch_size)
+    write = results.pop("write")
+    print(f"{args.sessions} sesiones de {args.users} usuarios en el último año")
+    print(f"append (en la petición): {write['append_us']:.1f} µs/sesión")
+    print(f"escritura en lotes de {args.batch_size}: {write['flush_rows_per_s']:.0f} filas/s, "
+          f"{write['db_mb']:.0f} MB en disco")
+    print(f"{'consulta':<18} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, latency in results.items():
+        print(f"{name:<18} {latency['p50_ms']:>8.2f} {latency['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
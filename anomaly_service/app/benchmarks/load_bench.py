@@ -0,0 +1,180 @@
+"""
+Prueba de carga de los endpoints con un driver ASGI en el mismo proceso
+
+Llama a la aplicación ASGI directamente (sin red ni cliente HTTP) con varias
+peticiones concurrentes y mide la latencia de cada petición, desde que se
+envía hasta que la respuesta está completa. Reporta p50/p95/p99 y
+peticiones por segundo de cada endpoint. Las peticiones se construyen con
+sesiones sintéticas (ver app.benchmarks.synthetic), distintas entre sí,
+para no medir aciertos de la caché de resultados ni del memo de
+características; la caché de resultados y la persistencia del estado por
+usuario se desactivan. `jobs` mide solo el encolado (POST /jobs con una
+sesión, en una cola temporal); los trabajos se puntúan en segundo plano
+mientras tanto.
+
+Uso:
+    python -m app.benchmarks.load_bench [--requests 2000] [--concurrency 16] [--output load.json]
+"""
+import os
+import tempfile
+
+# Antes de importar la aplicación (Settings se lee al importar)
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+os.environ.setdefault("USER_BASELINES_PATH", "")
+os.environ.setdefault("PROGRESSION_PATH", "")
+BENCH_DIRECTORY = tempfile.mkdtemp(prefix="load_bench_")
+os.environ.setdefault("JOBS_PATH", os.path.join(BENCH_DIRECTORY, "jobs.sqlite"))
+os.environ.setdefault("SESSION_STORE_PATH", os.path.join(BENCH_DIRECTORY, "sessions.sqlite"))
+
+import argparse
+import asyncio
+import json
+import time
+import warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.benchmarks.synthetic import SessionGenerator, to_extended_json
+
+API_PREFIX = "/api/v1/anomaly"
+BATCH_SIZE = 64
+
+# nombre -> (método, ruta, query, formato del cuerpo)
+ENDPOINTS: Dict[str, Tuple[str, str, str, Optional[str]]] = {
+    "health": ("GET", "/health", "", None),
+    "predict-real": ("POST", "/predict-real", "", "standard"),
+    "predict-real-compact": ("POST", "/predict-real", "compact=true", "standard"),
+    "predict": ("POST", "/predict", "", "extended"),
+    "predict-compact": ("POST", "/predict", "compact=true", "extended"),
+    f"predict-batch-{BATCH_SIZE}": ("POST", "/predict-batch", "compact=true", "batch"),
+    "jobs": ("POST", "/jobs", "", "job"),
+}
+
+
+async def asgi_request(app: Any, method: str, path: str, query: str = "", body: bytes = b"") -> int:
+    """
+    Llama a la aplicación ASGI directamente con una petición
+
+    Sin cliente HTTP ni sockets, para que el tiempo medido sea el del
+    servicio y no el del cliente.
+
+    Returns:
+        int: Código de estado de la respuesta
+    """
+    headers = [(b"content-length", str(len(body)).encode())]
+    if body:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app: Any, method: str, path: str, query: str, bodies: List[bytes],
+                  total: int, concurrency: int) -> Dict[str, float]:
+    """
+    Envía `total` peticiones con `concurrency` clientes concurrentes
+
+    Returns:
+        Dict: Peticiones por segundo, latencias p50/p95/p99/máxima en ms y errores
+    """
+    next_request = iter(range(total))
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for i in next_request:
+            start = time.perf_counter()
+            status = await asgi_request(app, method, path, query, bodies[i % len(bodies)])
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "requests": total,
+        "rps": total / elapsed,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": max(latencies) * 1000,
+        "errors": errors,
+    }
+
+
+def build_bodies(generator: SessionGenerator, count: int) -> Dict[str, List[bytes]]:
+    """Cuerpos de las peticiones en cada formato"""
+    sessions = generator.sessions(count)
+    batches = [sessions[i:i + BATCH_SIZE] for i in range(0, len(sessions), BATCH_SIZE)]
+    return {
+        "standard": [json.dumps(session).encode() for session in sessions],
+        "extended": [json.dumps(to_extended_json(session)).encode() for session in sessions],
+        "batch": [json.dumps({"sessions": batch}).encode() for batch in batches if len(batch) == BATCH_SIZE],
+        "job": [json.dumps({"sessions": [session]}).encode() for session in sessions],
+    }
+
+
+async def run(total: int, concurrency: int, endpoints: Optional[List[str]] = None,
+              sessions: int = 1024, seed: int = 42) -> Dict[str, Dict[str, float]]:
+    import main
+
+    bodies = build_bodies(SessionGenerator.from_file(seed=seed), sessions)
+    results = {}
+    # El scaler avisa en cada llamada de que recibe arreglos sin nombres de columnas
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        async with main.lifespan(main.app):
+            for name in endpoints or list(ENDPOINTS):
+                method, path, query, body_format = ENDPOINTS[name]
+                requests = bodies[body_format] if body_format else [b""]
+                url = f"{API_PREFIX}{path}"
+                # Calentamiento
+                await measure(main.app, method, url, query, requests, min(len(requests), total), concurrency)
+                results[name] = await measure(main.app, method, url, query, requests, total, concurrency)
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'endpoint':<22} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errores':>8}")
+    for name, result in results.items():
+        print(f"{name:<22} {result['rps']:>8.0f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+              f"{result['p99_ms']:>8.2f} {result['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia y peticiones por segundo de cada endpoint")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Peticiones concurrentes")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), help="Endpoints a medir (por defecto todos)")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency, args.endpoints))
+    print(f"{args.requests} peticiones por endpoint, {args.concurrency} concurrentes")
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Microbenchmarks de los componentes del scoring por tamaño de lote
+
+Mide, con sesiones sintéticas (ver app.benchmarks.synthetic), el tiempo de
+MongoDBParser.convert_session_data, de la extracción de características
+(columnar y por sesión) y de AnomalyPredictor.predict_batch con cada motor,
+para varios tamaños de lote. El memo de características se desactiva para
+medir el recorrido del bosque.
+
+Uso:
+    python -m app.benchmarks.micro_bench [--batch-sizes 1 16 256 4096] [--budget 0.5]
+"""
+import argparse
+import json
+import time
+import warnings
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from app.benchmarks.synthetic import SessionGenerator, to_extended_json
+from app.services.anomaly_predictor import AnomalyPredictor
+from app.services.feature_extractor import FeatureExtractor
+from app.utils.mongodb_parser import MongoDBParser
+
+BATCH_SIZES = [1, 16, 256, 4096]
+
+
+def time_batch(fn: Callable[[], object], budget: float) -> float:
+    """
+    Mediana del tiempo por llamada en milisegundos
+
+    Repite la llamada hasta consumir `budget` segundos (al menos 5 veces).
+    """
+    fn()  # calentamiento
+    timings: List[float] = []
+    deadline = time.perf_counter() + budget
+    while len(timings) < 5 or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def run(batch_sizes: List[int], budget: float, seed: int = 42) -> Dict[str, Dict[str, Dict[str, float]]]:
+    extractor = FeatureExtractor()
+    predictors = {engine: AnomalyPredictor(scoring_engine=engine) for engine in AnomalyPredictor.SCORING_ENGINES}
+    for predictor in predictors.values():
+        predictor.feature_memo = None
+
+    sessions = SessionGenerator.from_file(seed=seed).sessions(max(batch_sizes))
+    extended = [to_extended_json(session) for session in sessions]
+    features = np.vstack([extractor.to_model_array(f) for f in extractor.extract_features_batch(sessions)])
+
+    benchmarks: Dict[str, Callable[[int], Callable[[], Any]]] = {
+        "parser.convert_session_data": lambda n: lambda: [
+            MongoDBParser.convert_session_data(s) for s in extended[:n]
+        ],
+        "extractor.extract_features_batch": lambda n: lambda: extractor.extract_features_batch(sessions[:n]),
+        "extractor.extract_features_from_session": lambda n: lambda: [
+            extractor.extract_features_from_session(s) for s in sessions[:n]
+        ],
+        **{
+            f"predictor.predict_batch[{engine}]": (lambda p: lambda n: lambda: p.predict_batch(features[:n]))(predictor)
+            for engine, predictor in predictors.items()
+        },
+    }
+
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for name, make in benchmarks.items():
+            results[name] = {}
+            for size in batch_sizes:
+                ms = time_batch(make(size), budget)
+                results[name][str(size)] = {"ms": ms, "us_per_session": ms * 1000 / size}
+    return results
+
+
+def print_results(results: Dict[str, Dict[str, Dict[str, float]]]) -> None:
+    sizes = next(iter(results.values())).keys()
+    print(f"{'µs por sesión':<42}" + "".join(f"{'n=' + size:>10}" for size in sizes))
+    for name, by_size in results.items():
+        print(f"{name:<42}" + "".join(f"{by_size[size]['us_per_session']:>10.1f}" for size in sizes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de parser, extractor y predictor")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--budget", type=float, default=0.5, help="Segundos de medición por benchmark y tamaño")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    results = run(args.batch_sizes, args.budget)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
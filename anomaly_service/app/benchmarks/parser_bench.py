@@ -0,0 +1,113 @@
+"""
+Benchmark del decodificador de MongoDB Extended JSON
+
+Convierte un export de sesiones en JSON estándar a Extended JSON canónico
+(como lo exporta mongoexport) y compara el camino anterior de
+convert_session_data (solo campos de primer nivel; los sets quedaban
+envueltos y el extractor los contaba como 0) con el decodificador
+recursivo. Verifica que las características obtenidas del Extended JSON
+decodificado son idénticas a las del JSON estándar.
+
+Uso:
+    python -m app.benchmarks.parser_bench [--input ../sessions_fake.json] [--copies 20]
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from app.services.feature_extractor import FeatureExtractor
+from app.utils.mongodb_parser import MongoDBParser
+from app.benchmarks.predictor_bench import SESSIONS_FILE
+from app.benchmarks.synthetic import to_extended_json
+
+
+def legacy_convert_session_data(session_data: Dict[str, Any]) -> Dict[str, Any]:
+    """convert_session_data anterior: solo los campos de primer nivel"""
+    converted = {
+        "userId": session_data.get("userId", ""),
+        "date": MongoDBParser.parse_date(session_data.get("date", {})),
+        "startTime": MongoDBParser.parse_date(session_data.get("startTime", {})),
+        "endTime": MongoDBParser.parse_date(session_data.get("endTime", {})),
+        "totalDuration": MongoDBParser.parse_number(session_data.get("totalDuration", 0)),
+        "totalRestTime": MongoDBParser.parse_number(session_data.get("totalRestTime", 0)),
+        "totalSets": MongoDBParser.parse_number(session_data.get("totalSets", 0)),
+        "exercises": session_data.get("exercises", []),
+        "statistics": session_data.get("statistics", {}),
+        "createdAt": MongoDBParser.parse_date(session_data.get("createdAt", {})),
+        "updatedAt": MongoDBParser.parse_date(session_data.get("updatedAt", {}))
+    }
+    if "_id" in session_data:
+        converted["_id"] = MongoDBParser.parse_object_id(session_data["_id"])
+    return converted
+
+
+def model_features(extractor: FeatureExtractor, sessions: List[Dict[str, Any]]) -> List[Any]:
+    """Vector del modelo por sesión (o la excepción, si la extracción falla)"""
+    return [
+        features if isinstance(features, Exception) else extractor.to_model_array(features).tolist()
+        for features in extractor.extract_features_batch(sessions)
+    ]
+
+
+def check_parity(extractor: FeatureExtractor, standard: List[Dict[str, Any]],
+                 extended: List[Dict[str, Any]]) -> int:
+    """
+    Verifica que el Extended JSON decodificado da las mismas características que el JSON estándar
+
+    Returns:
+        int: Sesiones cuyas características difieren con el camino anterior
+    """
+    expected = model_features(extractor, standard)
+    decoded = model_features(extractor, [MongoDBParser.convert_session_data(s) for s in extended])
+    for index, (want, got) in enumerate(zip(expected, decoded)):
+        if want != got:
+            raise AssertionError(f"Sesión {index}: {got!r} != {want!r}")
+    legacy = model_features(extractor, [legacy_convert_session_data(s) for s in extended])
+    return sum(1 for want, got in zip(expected, legacy) if want != got)
+
+
+def time_ms(function, sessions: List[Dict[str, Any]]) -> float:
+    start = time.perf_counter()
+    function(sessions)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(path: str, copies: int) -> Dict[str, Any]:
+    extractor = FeatureExtractor()
+    with open(path) as f:
+        standard = json.load(f)
+    extended = [to_extended_json(session) for session in standard]
+    legacy_mismatches = check_parity(extractor, standard, extended)
+
+    extended = extended * copies
+    legacy = lambda sessions: [legacy_convert_session_data(s) for s in sessions]
+    decoder = lambda sessions: [MongoDBParser.convert_session_data(s) for s in sessions]
+    return {
+        "sessions": len(extended),
+        "legacy_mismatches": legacy_mismatches,
+        "legacy_convert_ms": time_ms(legacy, extended),
+        "decoder_convert_ms": time_ms(decoder, extended),
+        "legacy_end_to_end_ms": time_ms(lambda s: extractor.extract_features_batch(legacy(s)), extended),
+        "decoder_end_to_end_ms": time_ms(lambda s: extractor.extract_features_batch(decoder(s)), extended),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del decodificador de Extended JSON")
+    parser.add_argument("--input", default=SESSIONS_FILE, help="Export de sesiones en JSON estándar")
+    parser.add_argument("--copies", type=int, default=20, help="Veces que se replica el export de sesiones")
+    args = parser.parse_args()
+
+    results = run(args.input, args.copies)
+    print("Paridad Extended JSON decodificado / JSON estándar: OK")
+    print(f"Camino anterior: {results['legacy_mismatches']} sesiones con características distintas o con error")
+    print(f"{results['sessions']} sesiones")
+    print(f"conversión   anterior: {results['legacy_convert_ms']:.1f} ms   "
+          f"decodificador: {results['decoder_convert_ms']:.1f} ms")
+    print(f"+ extracción anterior: {results['legacy_end_to_end_ms']:.1f} ms   "
+          f"decodificador: {results['decoder_end_to_end_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
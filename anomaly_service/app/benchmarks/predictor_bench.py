@@ -0,0 +1,90 @@
+"""
+Benchmark del AnomalyPredictor
+
+Compara el camino anterior (model.predict + model.score_samples, dos
+recorridos del bosque) con el recorrido único de AnomalyPredictor._score y
+verifica que ambos den exactamente las mismas etiquetas y scores.
+
+Uso:
+    python -m app.benchmarks.predictor_bench [--repeat 200]
+"""
+import argparse
+import json
+import time
+import warnings
+import numpy as np
+from typing import Callable, Dict
+
+from app.services.feature_extractor import FeatureExtractor
+from app.services.anomaly_predictor import AnomalyPredictor
+
+SESSIONS_FILE = "sessions_all.json"
+
+
+def load_feature_matrix(path: str = SESSIONS_FILE) -> np.ndarray:
+    """Extrae la matriz de características del modelo a partir de un export de sesiones"""
+    extractor = FeatureExtractor()
+    with open(path) as f:
+        sessions = json.load(f)
+    return np.vstack([
+        extractor.to_model_array(extractor.extract_features_from_session(s))
+        for s in sessions
+    ])
+
+
+def check_parity(predictor: AnomalyPredictor, features: np.ndarray) -> None:
+    """Verifica que el recorrido único reproduce exactamente predict/score_samples de sklearn"""
+    features_scaled = predictor.scaler.transform(features)
+    is_anomaly, scores, _ = predictor._score(features_scaled)
+
+    np.testing.assert_array_equal(scores, predictor.model.score_samples(features_scaled))
+    np.testing.assert_array_equal(is_anomaly, predictor.model.predict(features_scaled) == -1)
+
+
+def time_per_call(fn: Callable[[], object], repeat: int) -> float:
+    """Tiempo medio por llamada en milisegundos"""
+    fn()  # calentamiento
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(repeat: int) -> Dict[str, float]:
+    predictor = AnomalyPredictor(scoring_engine="sklearn")
+    features = load_feature_matrix()
+
+    # Filas reales más perturbaciones para cubrir también la frontera de decisión
+    rng = np.random.default_rng(0)
+    noisy = features * rng.normal(1.0, 0.3, size=features.shape)
+    check_parity(predictor, np.vstack([features, noisy]))
+
+    row_scaled = predictor.scaler.transform(features[:1])
+
+    def legacy():
+        predictor.model.predict(row_scaled)
+        predictor.model.score_samples(row_scaled)
+
+    results = {
+        "legacy_ms": time_per_call(legacy, repeat),
+        "single_pass_ms": time_per_call(lambda: predictor._score(row_scaled), repeat),
+    }
+    results["saving_pct"] = 100 * (1 - results["single_pass_ms"] / results["legacy_ms"])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de scoring por petición")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    results = run(args.repeat)
+    print("Paridad con sklearn: OK")
+    print(f"predict + score_samples: {results['legacy_ms']:.3f} ms/petición")
+    print(f"recorrido único:         {results['single_pass_ms']:.3f} ms/petición")
+    print(f"ahorro:                  {results['saving_pct']:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
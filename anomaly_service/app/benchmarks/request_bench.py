@@ -0,0 +1,82 @@
+"""
+Benchmark de peticiones por segundo de los endpoints de predicción individual
+
+Envía las sesiones de un export a la aplicación en el mismo proceso
+(llamando a la aplicación ASGI directamente, sin red ni cliente HTTP) con
+varias peticiones concurrentes y mide peticiones por segundo
+de /predict-real (JSON estándar) y /predict (MongoDB Extended JSON), con la
+respuesta completa y con la respuesta compacta (?compact=true). La caché de
+resultados se desactiva para medir el camino completo en cada petición.
+
+Uso:
+    python -m app.benchmarks.request_bench [--requests 2000] [--concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from app.benchmarks.load_bench import asgi_request
+from app.benchmarks.predictor_bench import SESSIONS_FILE
+from app.benchmarks.synthetic import to_extended_json
+
+ENDPOINTS = [
+    ("/predict-real", False, False),
+    ("/predict-real", False, True),
+    ("/predict", True, False),
+    ("/predict", True, True),
+]
+
+
+async def measure(app: Any, path: str, bodies: List[bytes], total: int,
+                  concurrency: int, compact: bool) -> float:
+    """Peticiones por segundo con `concurrency` clientes enviando `total` peticiones"""
+    url = f"/api/v1/anomaly{path}"
+    query = "compact=true" if compact else ""
+    next_request = iter(range(total))
+
+    async def worker():
+        for i in next_request:
+            status = await asgi_request(app, "POST", url, query, bodies[i % len(bodies)])
+            if status != 200:
+                raise RuntimeError(f"{url}: {status}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start)
+
+
+async def run(total: int, concurrency: int) -> Dict[str, Any]:
+    import main
+
+    with open(SESSIONS_FILE) as f:
+        sessions = json.load(f)
+    standard = [json.dumps(session).encode() for session in sessions]
+    extended = [json.dumps(to_extended_json(session)).encode() for session in sessions]
+
+    results = {}
+    async with main.lifespan(main.app):
+        for path, is_extended, compact in ENDPOINTS:
+            bodies = extended if is_extended else standard
+            # Calentamiento (una pasada por todas las sesiones)
+            await measure(main.app, path, bodies, len(bodies), concurrency, compact)
+            rps = await measure(main.app, path, bodies, total, concurrency, compact)
+            results[f"{path}{' compact' if compact else ''}"] = rps
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peticiones por segundo de los endpoints de predicción")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Peticiones concurrentes")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.concurrency))
+    print(f"{args.requests} peticiones por endpoint, {args.concurrency} concurrentes")
+    for name, rps in results.items():
+        print(f"{name:<24} {rps:8.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Benchmark de escalado del servidor pre-fork
+
+Para cada número de workers lanza `python main.py` con SERVER_WORKERS=n en
+un puerto libre y le envía carga HTTP real desde varios procesos cliente
+(conexiones keep-alive, peticiones a /predict-real construidas de antemano
+con sesiones sintéticas). Reporta peticiones por segundo, latencias p50/p99
+y la memoria del servidor: la suma del PSS del padre y los workers, donde
+cada página compartida copy-on-write se reparte entre los procesos que la
+comparten. Con --compare-preload también mide cada caso con
+SERVER_PRELOAD=false (cada worker carga su propio modelo).
+
+La caché de resultados y el memo de características se desactivan para
+medir el camino completo en cada petición. Los clientes corren en la misma
+máquina: para que no compitan con el servidor, conviene una máquina con más
+núcleos que workers + clientes.
+
+Uso:
+    python -m app.benchmarks.serving_bench [--workers 1 2 4] [--duration 10] [--clients 2] [--compare-preload]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.benchmarks.synthetic import SessionGenerator
+
+PATH = "/api/v1/anomaly/predict-real?compact=true"
+SERVER_ENV = {
+    "RESULT_CACHE_ENABLED": "false",
+    "FEATURE_MEMO_ENABLED": "false",
+    "USER_BASELINES_PATH": "",
+    "PROGRESSION_PATH": "",
+    "SESSION_STORE_PATH": os.path.join(tempfile.gettempdir(), "serving_bench_sessions.sqlite"),
+    "MODEL_WATCH_INTERVAL_SECONDS": "0",
+    "SERVER_ACCESS_LOG": "false",
+    "HOST": "127.0.0.1",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_requests(count: int, port: int) -> List[bytes]:
+    """Peticiones HTTP/1.1 completas, listas para escribir en el socket"""
+    requests = []
+    for session in SessionGenerator.from_file().sessions(count):
+        body = json.dumps(session).encode()
+        head = (f"POST {PATH} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n").encode()
+        requests.append(head + body)
+    return requests
+
+
+async def drive(port: int, requests: List[bytes], connections: int, duration: float) -> Tuple[List[float], int]:
+    """Envía peticiones por `connections` conexiones keep-alive durante `duration` segundos"""
+    deadline = time.perf_counter() + duration
+    latencies: List[float] = []
+    errors = 0
+
+    async def connection(offset: int):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(requests[i % len(requests)])
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if not head.startswith(b"HTTP/1.1 200"):
+                errors += 1
+            i += connections
+        writer.close()
+
+    await asyncio.gather(*(connection(offset) for offset in range(connections)))
+    return latencies, errors
+
+
+def client_process(args: Tuple[int, List[bytes], int, float]) -> Tuple[List[float], int]:
+    return asyncio.run(drive(*args))
+
+
+def children(pid: int) -> List[int]:
+    found = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        found.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return found
+
+
+def pss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def start_server(workers: int, port: int, preload: bool) -> subprocess.Popen:
+    env = {**os.environ, **SERVER_ENV, "SERVER_WORKERS": str(workers), "PORT": str(port),
+           "SERVER_PRELOAD": str(preload).lower()}
+    server = subprocess.Popen([sys.executable, "main.py"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/anomaly/health", timeout=1):
+                pass
+            if workers == 1 or len(children(server.pid)) >= workers:
+                time.sleep(1.0)  # los demás workers terminan su lifespan
+                return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"El servidor con {workers} workers no arrancó")
+
+
+def run_case(workers: int, preload: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    port = free_port()
+    server = start_server(workers, port, preload)
+    try:
+        requests = build_requests(args.sessions, port)
+        per_client = max(1, args.connections // args.clients)
+        context = multiprocessing.get_context("fork")
+        with context.Pool(args.clients) as pool:
+            pool.map(client_process, [(port, requests, per_client, args.warmup)] * args.clients)
+            start = time.perf_counter()
+            results = pool.map(client_process, [(port, requests, per_client, args.duration)] * args.clients)
+            elapsed = time.perf_counter() - start
+        latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        pids = [server.pid, *children(server.pid)]
+        return {
+            "workers": workers,
+            "preload": preload,
+            "rps": len(latencies) / elapsed,
+            "p50_ms": float(p50),
+            "p99_ms": float(p99),
+            "errors": sum(errors for _, errors in results),
+            "processes": len(pids),
+            "pss_mb": sum(pss_mb(pid) for pid in pids),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Escalado de peticiones por segundo con el número de workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de medición por caso")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos de calentamiento por caso")
+    parser.add_argument("--clients", type=int, default=2, help="Procesos cliente")
+    parser.add_argument("--connections", type=int, default=32, help="Conexiones keep-alive en total")
+    parser.add_argument("--sessions", type=int, default=2048, help="Sesiones sintéticas distintas")
+    parser.add_argument("--compare-preload", action="store_true",
+                        help="Medir también con SERVER_PRELOAD=false (cada worker carga el modelo)")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}, {args.clients} procesos cliente, {args.connections} conexiones")
+    print(f"{'workers':>7} {'preload':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errores':>8} {'PSS MB':>8}")
+    results = []
+    for workers in args.workers:
+        for preload in ([True, False] if args.compare_preload and workers > 1 else [True]):
+            result = run_case(workers, preload, args)
+            results.append(result)
+            print(f"{workers:>7} {str(preload).lower():>8} {result['rps']:>8.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p99_ms']:>8.1f} {result['errors']:>8} {result['pss_mb']:>8.0f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
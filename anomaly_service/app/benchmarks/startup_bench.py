@@ -0,0 +1,103 @@
+"""
+Benchmark de arranque del servicio
+
+Lanza un intérprete nuevo por escenario, importa `main` y carga el modelo
+como lo hace el lifespan, y reporta tiempos y memoria residente:
+
+    - sklearn: modelo y scaler con joblib.load
+    - compiled (compilando): sin artefacto, se compila el bosque y se guarda
+    - compiled (mmap): artefacto ya generado, abierto con mmap
+
+`RSS archivo` son las páginas respaldadas por archivos (incluido el mmap del
+artefacto), que el kernel comparte entre todos los workers que lo abren.
+
+Uso:
+    python -m app.benchmarks.startup_bench [--repeat 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+# Se ejecuta en cada intérprete nuevo; imprime las mediciones como JSON
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.scoring_pipeline.anomaly_predictor.load_models()
+loaded = time.perf_counter()
+
+status = {}
+with open("/proc/self/status") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "RssAnon", "RssFile"):
+            status[key] = int(value.split()[0]) / 1024
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "load_ms": (loaded - imported) * 1000,
+    "rss_mb": status.get("VmRSS", 0.0),
+    "rss_anon_mb": status.get("RssAnon", 0.0),
+    "rss_file_mb": status.get("RssFile", 0.0),
+    "sklearn_imported": "sklearn" in sys.modules,
+    "pandas_imported": "pandas" in sys.modules,
+}))
+"""
+
+
+def measure(env_overrides: Dict[str, str]) -> Dict[str, float]:
+    """Mide un arranque en un proceso nuevo con las variables de entorno indicadas"""
+    env = {**os.environ, **env_overrides}
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(repeat: int) -> List[Dict[str, object]]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        artifact = os.path.join(directory, "compiled_forest.joblib")
+        scenarios = [
+            ("sklearn", {"SCORING_ENGINE": "sklearn"}, False),
+            ("compiled (compilando)", {"SCORING_ENGINE": "compiled", "COMPILED_MODEL_PATH": artifact}, True),
+            ("compiled (mmap)", {"SCORING_ENGINE": "compiled", "COMPILED_MODEL_PATH": artifact}, False),
+        ]
+        for name, env, remove_artifact in scenarios:
+            runs = []
+            for _ in range(repeat):
+                if remove_artifact and os.path.exists(artifact):
+                    os.remove(artifact)
+                runs.append(measure(env))
+            # Mediana por métrica para atenuar el ruido entre arranques
+            summary = {
+                key: sorted(run[key] for run in runs)[len(runs) // 2]
+                for key in runs[0] if key.endswith(("_ms", "_mb"))
+            }
+            summary["sklearn_imported"] = runs[0]["sklearn_imported"]
+            summary["pandas_imported"] = runs[0]["pandas_imported"]
+            results.append({"scenario": name, **summary})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo de arranque y memoria")
+    parser.add_argument("--repeat", type=int, default=3, help="Arranques por escenario (se reporta la mediana)")
+    args = parser.parse_args()
+
+    print(f"{'escenario':<24} {'import (ms)':>12} {'carga (ms)':>11} {'RSS (MB)':>9} "
+          f"{'RSS anón.':>10} {'RSS archivo':>12} {'sklearn':>8} {'pandas':>7}")
+    for result in run(args.repeat):
+        print(f"{result['scenario']:<24} {result['import_ms']:>12.0f} {result['load_ms']:>11.0f} "
+              f"{result['rss_mb']:>9.1f} {result['rss_anon_mb']:>10.1f} {result['rss_file_mb']:>12.1f} "
+              f"{'sí' if result['sklearn_imported'] else 'no':>8} {'sí' if result['pandas_imported'] else 'no':>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Suite de benchmarks para comparar versiones del servicio
+
+Ejecuta los microbenchmarks (micro_bench) y la prueba de carga (load_bench)
+y guarda los resultados en un JSON junto con los metadatos de la ejecución
+(commit, versión de Python, motor de scoring, parámetros). Con --compare
+muestra la variación de cada métrica respecto a un JSON anterior y marca
+las regresiones que superan el umbral.
+
+Uso:
+    python -m app.benchmarks.suite [--output cache/bench/actual.json] [--compare cache/bench/base.json]
+    python -m app.benchmarks.suite --quick --compare cache/bench/base.json
+"""
+# load_bench fija el entorno de los benchmarks antes de que se importe Settings
+from app.benchmarks import load_bench
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.benchmarks import micro_bench
+from app.core.config import settings
+
+# Métricas comparadas y si un valor mayor es mejor
+METRICS = {"us_per_session": False, "rps": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "scoring_engine": settings.SCORING_ENGINE,
+            "microbatch_enabled": settings.MICROBATCH_ENABLED,
+            "batch_sizes": args.batch_sizes,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        }
+    }
+    print("⏱️ Microbenchmarks...", file=sys.stderr)
+    results["micro"] = micro_bench.run(args.batch_sizes, args.budget, args.seed)
+    print("⏱️ Prueba de carga...", file=sys.stderr)
+    results["load"] = asyncio.run(load_bench.run(args.requests, args.concurrency, seed=args.seed))
+    return results
+
+
+def iter_metrics(results: Dict[str, Any]) -> Iterator[Tuple[str, str, float]]:
+    """(nombre, métrica, valor) de cada medición de un JSON de resultados"""
+    for name, by_size in results.get("micro", {}).items():
+        for size, values in by_size.items():
+            yield f"{name} n={size}", "us_per_session", values["us_per_session"]
+    for name, values in results.get("load", {}).items():
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            yield name, metric, values[metric]
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    """
+    Imprime la variación de cada métrica respecto a la línea base
+
+    Returns:
+        int: Número de regresiones mayores que `threshold` (fracción)
+    """
+    previous = {(name, metric): value for name, metric, value in iter_metrics(baseline)}
+    regressions = 0
+    print(f"\nComparación con {baseline.get('meta', {}).get('commit')} "
+          f"({baseline.get('meta', {}).get('timestamp')}), umbral {threshold:.0%}")
+    for name, metric, value in iter_metrics(current):
+        before = previous.get((name, metric))
+        if not before:
+            continue
+        change = value / before - 1
+        worse = -change if METRICS[metric] else change
+        flag = ""
+        if worse > threshold:
+            flag = "  ⚠️ regresión"
+            regressions += 1
+        elif -worse > threshold:
+            flag = "  ✅ mejora"
+        print(f"{name:<52} {metric:<15} {before:>10.2f} -> {value:>10.2f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks y prueba de carga con resultados en JSON")
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto cache/bench/<fecha>.json)")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Variación a partir de la cual se marca una regresión (fracción)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=micro_bench.BATCH_SIZES)
+    parser.add_argument("--budget", type=float, default=0.5, help="Segundos de medición por microbenchmark")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones por endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="Peticiones concurrentes")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de las sesiones sintéticas")
+    parser.add_argument("--quick", action="store_true", help="Ejecución corta (lotes hasta 256, 500 peticiones)")
+    args = parser.parse_args()
+    if args.quick:
+        args.batch_sizes = [size for size in args.batch_sizes if size <= 256]
+        args.budget = min(args.budget, 0.2)
+        args.requests = min(args.requests, 500)
+
+    results = run(args)
+    micro_bench.print_results(results["micro"])
+    print()
+    load_bench.print_results(results["load"])
+
+    output = args.output or os.path.join(
+        "cache", "bench", f"{datetime.now():%Y%m%d-%H%M%S}-{results['meta']['commit'] or 'local'}.json"
+    )
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Resultados guardados en {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"⚠️ {regressions} métricas empeoraron más de {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Generador de sesiones sintéticas para los benchmarks
+
+Aprende de un export real (por defecto sessions_all.json) las
+distribuciones empíricas de cada componente de una sesión: número de
+ejercicios, catálogo de ejercicios con su grupo muscular y frecuencia, sets
+por ejercicio, peso/repeticiones/descanso de cada ejercicio, proporción de
+sets completados y duración por set. Las sesiones nuevas se construyen
+muestreando esas distribuciones (con una pequeña variación del peso para
+que no se repitan vectores de características) y son coherentes entre sí:
+`totalRestTime`, `totalSets` y `statistics` se calculan a partir de los sets
+generados, igual que en la app.
+
+Uso:
+    python -m app.benchmarks.synthetic --sessions 1000 --check
+    python -m app.benchmarks.synthetic --sessions 100000 --output cache/synthetic.ndjson
+"""
+import argparse
+import json
+import random
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.benchmarks.predictor_bench import SESSIONS_FILE
+from app.services.feature_extractor import FeatureExtractor
+
+DATE_FIELDS = ("date", "startTime", "endTime", "createdAt", "updatedAt")
+
+
+def to_extended_json(value: Any, key: str = "") -> Any:
+    """Envuelve números, fechas e ids como en un export canónico de MongoDB"""
+    if isinstance(value, dict):
+        return {k: to_extended_json(v, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_extended_json(item) for item in value]
+    if key in DATE_FIELDS and isinstance(value, str):
+        millis = int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+        return {"$date": {"$numberLong": str(millis)}}
+    if key == "_id" and isinstance(value, str):
+        return {"$oid": value}
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return {"$numberInt": str(value)}
+    if isinstance(value, float):
+        return {"$numberDouble": repr(value)}
+    return value
+
+
+class SessionGenerator:
+    """
+    Genera sesiones en JSON estándar con las distribuciones de un export real
+
+    Args:
+        sessions: Sesiones reales en JSON estándar
+        seed: Semilla (la misma semilla produce las mismas sesiones)
+        users: Número de usuarios distintos (por defecto los del export)
+        weight_jitter: Desviación relativa aplicada a cada peso muestreado
+    """
+
+    def __init__(self, sessions: List[Dict[str, Any]], seed: int = 42,
+                 users: Optional[int] = None, weight_jitter: float = 0.05):
+        self.random = random.Random(seed)
+        self.weight_jitter = weight_jitter
+        self.exercise_counts: List[int] = []
+        self.set_seconds: List[float] = []
+        exercise_frequency: Counter = Counter()
+        self.muscle_group: Dict[str, str] = {}
+        self.set_counts: Dict[str, List[int]] = defaultdict(list)
+        self.set_values: Dict[str, List[Tuple[float, int, int]]] = defaultdict(list)
+        completed = total = 0
+
+        for session in sessions:
+            exercises = session.get("exercises", [])
+            n_sets = sum(len(exercise.get("sets", [])) for exercise in exercises)
+            self.exercise_counts.append(len(exercises))
+            if n_sets:
+                self.set_seconds.append(session.get("totalDuration", 0) / n_sets)
+            for exercise in exercises:
+                name = exercise["name"]
+                exercise_frequency[name] += 1
+                self.muscle_group[name] = exercise["muscleGroup"]
+                self.set_counts[name].append(len(exercise["sets"]))
+                for s in exercise["sets"]:
+                    self.set_values[name].append((s["weight"], s["reps"], s["restTime"]))
+                    completed += bool(s.get("completed", True))
+                    total += 1
+
+        self.exercise_names = list(exercise_frequency)
+        self.exercise_weights = [exercise_frequency[name] for name in self.exercise_names]
+        self.completed_rate = completed / total if total else 1.0
+        n_users = users or len({session.get("userId") for session in sessions}) or 1
+        self.user_ids = [self._hex(28) for _ in range(n_users)]
+        self._next_date = {user_id: datetime(2025, 1, 1, tzinfo=timezone.utc) for user_id in self.user_ids}
+
+    @classmethod
+    def from_file(cls, path: str = SESSIONS_FILE, **kwargs: Any) -> "SessionGenerator":
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    def _hex(self, length: int) -> str:
+        return f"{self.random.getrandbits(4 * length):0{length}x}"
+
+    def _uuid(self) -> str:
+        value = self._hex(32)
+        return f"{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}"
+
+    def _pick_exercises(self, count: int) -> List[str]:
+        """Ejercicios distintos, muestreados según su frecuencia en el export"""
+        count = min(count, len(self.exercise_names))
+        picked: List[str] = []
+        while len(picked) < count:
+            name = self.random.choices(self.exercise_names, self.exercise_weights)[0]
+            if name not in picked:
+                picked.append(name)
+        return picked
+
+    def session(self) -> Dict[str, Any]:
+        """Genera una sesión"""
+        rng = self.random
+        user_id = rng.choice(self.user_ids)
+        exercises = []
+        sets_by_muscle: Counter = Counter()
+        total_rest = 0
+        n_sets = 0
+
+        for order, name in enumerate(self._pick_exercises(rng.choice(self.exercise_counts)), start=1):
+            sets = []
+            for _ in range(rng.choice(self.set_counts[name])):
+                weight, reps, rest = rng.choice(self.set_values[name])
+                weight = max(0.0, round(weight * (1 + rng.gauss(0, self.weight_jitter)) * 2) / 2)
+                completed = rng.random() < self.completed_rate
+                sets.append({
+                    "id": self._uuid(), "reps": reps, "weight": weight,
+                    "restTime": rest, "completed": completed,
+                })
+                total_rest += rest
+                n_sets += 1
+                if completed:
+                    sets_by_muscle[self.muscle_group[name]] += 1
+            exercises.append({
+                "id": self._uuid(), "name": name, "muscleGroup": self.muscle_group[name],
+                "sets": sets, "order": order,
+            })
+
+        duration = max(int(round(n_sets * rng.choice(self.set_seconds))), total_rest)
+        start = self._next_date[user_id] + timedelta(hours=rng.randint(6, 21), minutes=rng.randint(0, 59))
+        self._next_date[user_id] += timedelta(days=rng.randint(1, 3))
+        end = start + timedelta(seconds=duration)
+        iso = lambda moment: moment.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+        return {
+            "_id": self._hex(24),
+            "userId": user_id,
+            "date": iso(start),
+            "startTime": iso(start),
+            "endTime": iso(end),
+            "totalDuration": duration,
+            "totalRestTime": total_rest,
+            "totalSets": n_sets,
+            "exercises": exercises,
+            "statistics": {
+                "setsByMuscleGroup": dict(sets_by_muscle),
+                "totalCompletedSets": sum(sets_by_muscle.values()),
+                "totalRestTime": total_rest,
+            },
+            "createdAt": iso(end),
+            "updatedAt": iso(end),
+            "__v": 0,
+        }
+
+    def sessions(self, count: int) -> List[Dict[str, Any]]:
+        return [self.session() for _ in range(count)]
+
+    def iter_sessions(self, count: int) -> Iterator[Dict[str, Any]]:
+        for _ in range(count):
+            yield self.session()
+
+
+def feature_summary(sessions: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Media, desviación y percentiles 5/50/95 de cada característica del modelo"""
+    extractor = FeatureExtractor()
+    matrix = np.vstack([
+        extractor.to_model_array(features)
+        for features in extractor.extract_features_batch(sessions)
+        if not isinstance(features, Exception)
+    ])
+    return {
+        name: {
+            "mean": float(np.mean(column)),
+            "std": float(np.std(column)),
+            "p5": float(np.percentile(column, 5)),
+            "p50": float(np.percentile(column, 50)),
+            "p95": float(np.percentile(column, 95)),
+        }
+        for name, column in zip(FeatureExtractor.MODEL_FEATURES, matrix.T)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera sesiones sintéticas con las distribuciones de un export")
+    parser.add_argument("--input", default=SESSIONS_FILE, help="Export real del que se aprenden las distribuciones")
+    parser.add_argument("--sessions", type=int, default=1000, help="Sesiones a generar")
+    parser.add_argument("--users", type=int, help="Usuarios distintos (por defecto los del export)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--extended", action="store_true", help="Generar en MongoDB Extended JSON")
+    parser.add_argument("--output", help="Archivo NDJSON de salida ('-' para stdout)")
+    parser.add_argument("--check", action="store_true",
+                        help="Comparar las características del modelo del export y de las sesiones generadas")
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        real = json.load(f)
+    generator = SessionGenerator(real, seed=args.seed, users=args.users)
+
+    if args.output:
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            for session in generator.iter_sessions(args.sessions):
+                output.write(json.dumps(to_extended_json(session) if args.extended else session) + "\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    if args.check:
+        generated = SessionGenerator(real, seed=args.seed, users=args.users).sessions(args.sessions)
+        real_summary = feature_summary(real)
+        synthetic_summary = feature_summary(generated)
+        print(f"{'característica':<22} {'media real':>12} {'sintética':>12} {'p50 real':>10} {'sintética':>10}",
+              file=sys.stderr)
+        for name in FeatureExtractor.MODEL_FEATURES:
+            r, s = real_summary[name], synthetic_summary[name]
+            print(f"{name:<22} {r['mean']:>12.1f} {s['mean']:>12.1f} {r['p50']:>10.1f} {s['p50']:>10.1f}",
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
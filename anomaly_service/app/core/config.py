@@ -13,12 +13,121 @@ class Settings(BaseSettings):
     # Configuración de modelos
     MODEL_PATH: str = "models/modelo_isolation.pkl"
     SCALER_PATH: str = "models/scaler.pkl"
+    # Motor de scoring: "sklearn" o "compiled" (árboles aplanados en NumPy)
+    SCORING_ENGINE: str = "sklearn"
+    # Artefacto del motor compilado (se genera al arrancar; se abre con mmap)
+    COMPILED_MODEL_PATH: str = "models/compiled_forest.joblib"
+    
+    # Registro de versiones del modelo (models/registry/<versión>/)
+    MODEL_REGISTRY_DIR: str = "models/registry"
+    MODEL_VERSION: str = ""  # Vacío = versión del archivo ACTIVE del registro, o "default" (MODEL_PATH)
+    MODEL_WATCH_INTERVAL_SECONDS: float = 5.0  # Cada cuánto se revisa ACTIVE; 0 = desactivado
+    MODEL_WARMUP_PATH: str = "models/warmup_sessions.json"  # Sesiones de muestra para calentar un modelo nuevo
+    MODEL_WARMUP_SESSIONS: int = 64
+    ADMIN_TOKEN: str = ""  # Token de X-Admin-Token; vacío = endpoints de administración desactivados
+    
+    # Configuración de predicción por lotes
+    MAX_BATCH_SIZE: int = 5000
+    STREAM_CHUNK_SIZE: int = 500  # Sesiones por bloque en /predict-stream
+    STREAM_MAX_LINE_BYTES: int = 1048576  # Una línea más larga en /predict-stream se reporta como error
+    
+    # Executor para el trabajo de CPU (fuera del event loop)
+    EXECUTOR_MODE: str = "thread"  # "thread" o "process" (modelo precargado en cada proceso)
+    EXECUTOR_WORKERS: int = 0  # 0 = número de CPUs
+    EXECUTOR_MAX_QUEUE: int = 64  # Tareas en espera antes de responder 503
+    
+    # Caché de resultados (clave: contenido relevante de la sesión + huella del modelo)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_BACKEND: str = "memory"  # "memory" (por proceso) o "disk" (SQLite compartido entre workers)
+    RESULT_CACHE_MAX_ENTRIES: int = 10000
+    RESULT_CACHE_TTL_SECONDS: float = 3600
+    RESULT_CACHE_PATH: str = "cache/results.sqlite"
+    
+    # Memo de vectores de características (omite scaler y bosque en vectores repetidos)
+    FEATURE_MEMO_ENABLED: bool = True
+    FEATURE_MEMO_MAX_ENTRIES: int = 4096
+    
+    # Atribución por característica a partir de la profundidad de los cortes del bosque
+    ATTRIBUTIONS_ENABLED: bool = True
+    
+    # Líneas base por usuario (z-scores respecto a su propio historial)
+    USER_BASELINES_ENABLED: bool = True
+    USER_BASELINES_HALF_LIFE_SESSIONS: float = 20.0  # Sesiones tras las que una sesión pesa la mitad
+    USER_BASELINES_MIN_SESSIONS: int = 5  # Historial mínimo antes de reportar z-scores
+    USER_BASELINES_Z_THRESHOLD: float = 3.0
+    USER_BASELINES_PATH: str = "cache/user_baselines.npz"  # Vacío = solo en memoria
+    USER_BASELINES_SAVE_EVERY: int = 500  # Actualizaciones entre guardados a disco
+    
+    # Índice de progresión por (usuario, ejercicio): regresión del peso medio contra la fecha
+    PROGRESSION_ENABLED: bool = True
+    PROGRESSION_MIN_SESSIONS: int = 3  # Sesiones mínimas del ejercicio para calcular la pendiente
+    PROGRESSION_STALL_THRESHOLD: float = 0.02  # Cambio relativo a 30 días por debajo del cual está estancado
+    PROGRESSION_PATH: str = "cache/progression.npz"  # Vacío = solo en memoria
+    PROGRESSION_SAVE_EVERY: int = 500  # Actualizaciones entre guardados a disco
+    PROGRESSION_FEATURE_ENABLED: bool = False  # Añade la tendencia a features_used (no entra al modelo)
+    
+    # Historial de sesiones puntuadas (SQLite), escrito en lotes fuera de la petición
+    SESSION_STORE_ENABLED: bool = True
+    SESSION_STORE_PATH: str = "cache/sessions.sqlite"
+    SESSION_STORE_BATCH_SIZE: int = 500  # Filas por transacción
+    SESSION_STORE_FLUSH_INTERVAL_SECONDS: float = 1.0  # Espera máxima de una fila en el buffer
+    SESSION_STORE_MAX_BUFFER: int = 100000  # Filas pendientes antes de descartar las nuevas
+    SESSION_STORE_RETENTION_DAYS: float = 0  # Días de historial que se conservan; 0 = sin límite
+    
+    # Drift de las distribuciones en vivo respecto al entrenamiento (GET /anomaly/drift)
+    DRIFT_ENABLED: bool = True
+    DRIFT_REFERENCE_PATH: str = "models/drift_reference.json"  # Referencia de la versión "default"
+    DRIFT_CHECK_INTERVAL_SECONDS: float = 3600.0  # Cada cuánto se compara y reinicia la ventana; 0 = solo bajo demanda
+    DRIFT_MIN_SESSIONS: int = 500  # Sesiones mínimas de la ventana para compararla
+    DRIFT_PSI_WARNING: float = 0.1
+    DRIFT_PSI_ALERT: float = 0.25
+    
+    # Micro-batching de predicciones individuales concurrentes
+    MICROBATCH_ENABLED: bool = True
+    MICROBATCH_MAX_SIZE: int = 64  # N: se vacía el lote al llegar a N peticiones
+    MICROBATCH_MAX_WAIT_MS: float = 5.0  # T: o al pasar T ms desde la primera
+    MICROBATCH_MAX_PENDING: int = 1024  # Peticiones en espera antes de responder 503
+    
+    # Métricas en formato Prometheus (GET /metrics)
+    METRICS_ENABLED: bool = True
+    METRICS_STAGE_TIMING: bool = True  # Histograma de duración de cada etapa del scoring
+    METRICS_WINDOW_SIZE: int = 1000  # Predicciones recientes para la tasa de anomalías y los cuantiles del score
+    
+    # Profiler por muestreo de peticiones reales (endpoints /profile, requieren ADMIN_TOKEN)
+    PROFILING_ENABLED: bool = False
+    PROFILING_INTERVAL_MS: float = 5.0  # Intervalo de muestreo por defecto
+    PROFILING_MAX_REQUESTS: int = 10000  # Máximo de peticiones por captura
+    PROFILING_MAX_SECONDS: float = 300.0  # La captura termina aunque no lleguen las peticiones pedidas
+    
+    # Cola de trabajos asíncronos (POST /anomaly/jobs), persistida en SQLite
+    JOBS_ENABLED: bool = True
+    JOBS_PATH: str = "cache/jobs.sqlite"
+    JOBS_WORKERS: int = 2  # Tareas que vacían la cola en paralelo (por proceso)
+    JOBS_BATCH_SIZE: int = 256  # Sesiones por lote; varios trabajos pequeños se puntúan juntos
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0  # Revisión de la cola sin avisos (trabajos de otros procesos)
+    JOBS_MAX_QUEUED: int = 10000  # Trabajos pendientes antes de responder 503
+    JOBS_LEASE_SECONDS: float = 120.0  # Un trabajo tomado por un proceso que muere vuelve a la cola tras este plazo
+    JOBS_MAX_ATTEMPTS: int = 3  # Tomas de un trabajo antes de marcarlo como fallido
+    JOBS_RESULT_TTL_SECONDS: float = 86400  # Tiempo que se conservan los trabajos terminados
+    JOBS_CALLBACK_ALLOWED_HOSTS: str = ""  # Hosts (separados por comas) que pueden recibir callbacks; vacío = ninguno
+    JOBS_CALLBACK_TIMEOUT_SECONDS: float = 5.0
+    JOBS_CALLBACK_MAX_ATTEMPTS: int = 5  # Intentos de entrega del callback (espera 1, 2, 4... s entre ellos)
+    JOBS_CALLBACK_SECRET: str = ""  # Si se define, cada callback lleva X-Signature (HMAC-SHA256 del cuerpo)
     
     # Configuración del servidor
     HOST: str = "0.0.0.0"
     PORT: int = 8000
     DEBUG: bool = False
     
+    # Servidor de producción (python main.py)
+    SERVER_WORKERS: int = 1  # 1 = un proceso (uvicorn.run); >1 = workers pre-fork; 0 = número de CPUs
+    SERVER_PRELOAD: bool = True  # Cargar el modelo en el padre antes de crear los workers (memoria compartida)
+    SERVER_KEEP_ALIVE_SECONDS: int = 5  # Tiempo que se mantiene abierta una conexión sin peticiones
+    SERVER_BACKLOG: int = 2048  # Conexiones pendientes de aceptar en el socket compartido
+    SERVER_MAX_REQUESTS: int = 0  # Peticiones tras las que un worker se recicla; 0 = sin límite
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = 30  # Espera máxima a las peticiones en curso al apagar
+    SERVER_ACCESS_LOG: bool = True
+    
     # Configuración de CORS
     BACKEND_CORS_ORIGINS: list = ["*"]
     
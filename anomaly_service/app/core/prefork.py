@@ -0,0 +1,157 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+import uvicorn
+
+from app.core.config import settings
+
+
+def create_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Socket de escucha creado en el padre y heredado por todos los workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """
+    Servidor de producción con varios procesos worker creados con fork()
+
+    El padre abre el socket, importa la aplicación y (con `preload`) carga el
+    modelo una sola vez antes de crear los workers: los arreglos del bosque
+    quedan en páginas que los hijos comparten copy-on-write en lugar de que
+    cada worker haga su propio `joblib.load`. `gc.freeze()` saca los objetos
+    ya creados de las pasadas del recolector para que este no escriba en sus
+    cabeceras y rompa el copy-on-write. Cada worker sirve con su propio
+    `uvicorn.Server` sobre el socket heredado (el kernel reparte las
+    conexiones) y el padre solo supervisa: reinicia los workers que terminan
+    y reenvía SIGTERM/SIGINT para un apagado ordenado.
+
+    Las líneas base y el índice de progresión son por proceso: con
+    USER_BASELINES_PATH o PROGRESSION_PATH definidos, cada worker guardaría
+    su parte en el mismo .npz y el último en guardar borraría lo de los
+    demás, así que el servidor no arranca con más de un worker.
+
+    Args:
+        app: Aplicación ASGI
+        workers: Número de procesos worker
+        preload: Función que carga el modelo en el padre (None = cada worker lo carga en su lifespan)
+    """
+
+    def __init__(self, app: Any, workers: int, preload: Optional[Callable[[], None]] = None,
+                 host: str = "0.0.0.0", port: int = 8000):
+        if not hasattr(os, "fork"):
+            raise RuntimeError("El modo pre-fork requiere os.fork() (Linux o macOS)")
+        shared = shared_state_paths()
+        if workers > 1 and shared:
+            raise RuntimeError(
+                f"Con {workers} workers pre-fork cada uno sobrescribiría el estado por usuario de los demás "
+                f"en {', '.join(shared)}: vacía esas variables (estado solo en memoria) o usa SERVER_WORKERS=1"
+            )
+        self.app = app
+        self.workers = workers
+        self.preload = preload
+        self.host = host
+        self.port = port
+        self.sock: Optional[socket.socket] = None
+        self.children: Dict[int, int] = {}  # pid -> número de worker
+        self.stopping = False
+
+    def run(self) -> None:
+        self.sock = create_socket(self.host, self.port, settings.SERVER_BACKLOG)
+        print(f"🚀 Servidor pre-fork en http://{self.host}:{self.port} con {self.workers} workers (padre {os.getpid()})")
+
+        if self.preload is not None:
+            start = time.perf_counter()
+            self.preload()
+            print(f"✅ Modelo precargado en el padre en {(time.perf_counter() - start) * 1000:.0f} ms")
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        for worker in range(self.workers):
+            self.spawn(worker)
+        self.supervise()
+        self.sock.close()
+        print("🛑 Servidor pre-fork detenido")
+
+    def spawn(self, worker: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self.run_worker()
+        self.children[pid] = worker
+
+    def run_worker(self) -> None:
+        """Cuerpo del proceso hijo: nunca retorna"""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            config = uvicorn.Config(
+                self.app,
+                lifespan="on",
+                timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+                timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS or None,
+                limit_max_requests=settings.SERVER_MAX_REQUESTS or None,
+                backlog=settings.SERVER_BACKLOG,
+                access_log=settings.SERVER_ACCESS_LOG,
+            )
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def supervise(self) -> None:
+        """Espera a los workers y reemplaza los que terminan mientras el servidor sigue activo"""
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            worker = self.children.pop(pid, None)
+            if worker is None or self.stopping:
+                continue
+            print(f"⚠️ Worker {worker} (pid {pid}) terminó con código {os.waitstatus_to_exitcode(status)}; "
+                  f"reiniciando")
+            time.sleep(1.0)  # evita un bucle de reinicios si el worker falla al arrancar
+            if not self.stopping:
+                self.spawn(worker)
+
+    def handle_stop(self, signum: int, frame: Any) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def shared_state_paths() -> List[str]:
+    """Variables de estado por usuario que se persisten en un archivo único (no apto para varios workers)"""
+    return [
+        name for name, enabled, path in (
+            ("USER_BASELINES_PATH", settings.USER_BASELINES_ENABLED, settings.USER_BASELINES_PATH),
+            ("PROGRESSION_PATH", settings.PROGRESSION_ENABLED, settings.PROGRESSION_PATH),
+        )
+        if enabled and path
+    ]
+
+
+def worker_count() -> int:
+    """SERVER_WORKERS, con 0 = número de CPUs"""
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
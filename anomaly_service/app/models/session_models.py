@@ -1,21 +1,91 @@
 # app/models/session_models.py
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, HttpUrl
+from typing import Annotated, Any, ClassVar, Dict, List, NotRequired, Optional, Union
+from typing_extensions import TypedDict  # pydantic exige la versión de typing_extensions en Python < 3.12
 from datetime import datetime
 
-class Set(BaseModel):
-    id: str
-    reps: int
-    weight: float
+class DictAccessModel(BaseModel):
+    """
+    Modelo con lectura tipo diccionario (`get` e `in`) sobre sus campos
+
+    El pipeline, las cachés y el FeatureExtractor leen las sesiones con
+    `.get`; así consumen el modelo validado directamente, sin copiarlo a un
+    diccionario con `.dict()`. Las claves que pydantic no admite como nombre
+    de campo (`_id`, que sería un atributo privado) se declaran con alias y
+    se leen con su clave original.
+    """
+    model_config = ConfigDict(populate_by_name=True)
+    
+    # Clave del documento -> nombre del campo
+    FIELD_NAMES: ClassVar[Dict[str, str]] = {"_id": "id_"}
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        name = self.FIELD_NAMES.get(key, key)
+        value = self.__dict__.get(name, default)
+        # Un campo con alias ausente en la entrada queda en None: se trata como clave ausente
+        return default if value is None and name != key else value
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None if key in self.FIELD_NAMES else key in self.__dict__
+
+# Sets y ejercicios se validan como TypedDict: pydantic comprueba los tipos
+# (estrictos: sin números como texto ni booleanos como números) pero el
+# resultado son diccionarios, que el extractor, la caché de resultados y el
+# índice de progresión leen directamente, sin crear un modelo por set.
+# Los campos que el backend no siempre envía (`id`, `weight?: number` en
+# SessionSetDto) son opcionales: el extractor usa 0 si faltan.
+class Set(TypedDict):
+    __pydantic_config__ = ConfigDict(strict=True)
+    
+    id: NotRequired[str]
+    reps: float  # entero o decimal (10 y 10.0)
+    weight: NotRequired[float]
     restTime: float
-    completed: bool = True
+    completed: NotRequired[bool]  # True si falta
 
-class Exercise(BaseModel):
-    id: str
+class Exercise(TypedDict):
+    __pydantic_config__ = ConfigDict(strict=True)
+    
+    id: NotRequired[str]
     name: str
     muscleGroup: str
     sets: List[Set]
-    order: Optional[int]
+    order: NotRequired[Optional[int]]
+
+NUMBER_WRAPPERS = ("$numberInt", "$numberLong", "$numberDouble", "$numberDecimal")
+
+def _check_number_wrapper(value: Dict[str, str]) -> Dict[str, str]:
+    """Un solo envoltorio numérico de MongoDB con un valor convertible a número"""
+    if len(value) != 1 or next(iter(value)) not in NUMBER_WRAPPERS:
+        raise ValueError(f"Se esperaba un número o uno de {', '.join(NUMBER_WRAPPERS)}")
+    wrapper, number = next(iter(value.items()))
+    try:
+        float(number)
+    except ValueError:
+        raise ValueError(f"Valor {wrapper} inválido: {number!r}")
+    return value
+
+# Número en MongoDB Extended JSON: envuelto ({"$numberInt": "12"}) o sin envolver
+ExtendedNumber = Union[float, Annotated[Dict[str, str], AfterValidator(_check_number_wrapper)]]
+
+class ExtendedSet(TypedDict):
+    """Set en MongoDB Extended JSON (mismos campos que Set, con números envueltos)"""
+    __pydantic_config__ = ConfigDict(strict=True)
+    
+    id: NotRequired[str]
+    reps: ExtendedNumber
+    weight: NotRequired[ExtendedNumber]
+    restTime: ExtendedNumber
+    completed: NotRequired[bool]
+
+class ExtendedExercise(TypedDict):
+    __pydantic_config__ = ConfigDict(strict=True)
+    
+    id: NotRequired[str]
+    name: str
+    muscleGroup: str
+    sets: List[ExtendedSet]
+    order: NotRequired[Optional[ExtendedNumber]]
 
 class Statistics(BaseModel):
     setsByMuscleGroup: Dict[str, int]
@@ -37,9 +107,9 @@ class Session(BaseModel):
     updatedAt: datetime
 
 # Modelos para la API de anomalías
-class SessionInput(BaseModel):
+class SessionInput(DictAccessModel):
     """Modelo para entrada de sesión en formato MongoDB Extended JSON"""
-    _id: Dict[str, str]
+    id_: Optional[Dict[str, str]] = Field(None, alias="_id")
     userId: str
     date: Dict[str, Dict[str, str]]
     startTime: Dict[str, Dict[str, str]]
@@ -47,15 +117,15 @@ class SessionInput(BaseModel):
     totalDuration: Dict[str, str]
     totalRestTime: Dict[str, str]
     totalSets: Dict[str, str]
-    exercises: list
+    exercises: List[ExtendedExercise]
     statistics: Dict[str, Any]
     createdAt: Dict[str, Dict[str, str]]
     updatedAt: Dict[str, Dict[str, str]]
     __v: Dict[str, str]
 
-class RealSessionInput(BaseModel):
+class RealSessionInput(DictAccessModel):
     """Modelo para entrada de sesión en formato JSON estándar (como lo envía la app móvil)"""
-    _id: str
+    id_: Optional[str] = Field(None, alias="_id")
     userId: str
     date: str  # ISO date string
     startTime: str  # ISO date string
@@ -63,20 +133,61 @@ class RealSessionInput(BaseModel):
     totalDuration: int
     totalRestTime: int
     totalSets: int
-    exercises: list
+    exercises: List[Exercise]
     statistics: Dict[str, Any]
     createdAt: str  # ISO date string
     updatedAt: str  # ISO date string
     __v: int
 
+class PersonalizedScore(BaseModel):
+    """Comparación de la sesión con la línea base del propio usuario"""
+    sessions_seen: int  # Sesiones del usuario registradas antes de esta
+    z_scores: Optional[Dict[str, float]] = None  # None hasta tener USER_BASELINES_MIN_SESSIONS
+    max_abs_z: Optional[float] = None
+    deviating_features: List[str] = []  # Características con |z| > USER_BASELINES_Z_THRESHOLD
+    is_unusual: bool = False
+
 class AnomalyPredictionResponse(BaseModel):
     """Modelo para respuesta de predicción de anomalía"""
+    # Permite el campo model_version (pydantic reserva el prefijo "model_")
+    model_config = ConfigDict(protected_namespaces=())
+    
     prediction: str  # "Normal" o "Anomalía"
     risk_score: float
     features_used: Dict[str, Any]
     session_summary: Dict[str, Any]
     message: str
     anomaly_type: str  # Tipo específico de anomalía o "Ninguna"
+    model_version: Optional[str] = None  # Versión del modelo que produjo la predicción
+    personalized: Optional[PersonalizedScore] = None  # Score respecto al historial del usuario
+    # Profundidad media que acorta cada característica en el bosque (positivo = hacia anomalía),
+    # de mayor a menor; suman c(n) - profundidad media de la sesión, no 1
+    feature_attributions: Optional[Dict[str, float]] = None
+
+class BatchSessionInput(BaseModel):
+    """Modelo para entrada de varias sesiones (MongoDB Extended JSON o JSON estándar, se pueden mezclar)"""
+    # Cada sesión se valida al puntuar (SessionInput o RealSessionInput según su formato)
+    # para que una sesión inválida falle en su posición y no rechace todo el lote
+    sessions: List[Any] = Field(..., min_length=1)
+
+class JobSubmission(BaseModel):
+    """Modelo para encolar un trabajo de scoring asíncrono"""
+    sessions: List[Any] = Field(..., min_length=1)  # Mismo formato que /predict-batch
+    callback_url: Optional[HttpUrl] = None  # Recibe el resultado por POST al terminar
+
+class BatchPredictionItem(BaseModel):
+    """Resultado de una sesión dentro de un lote"""
+    index: int  # Posición de la sesión en la petición
+    session_id: Optional[str] = None
+    result: Optional[AnomalyPredictionResponse] = None
+    error: Optional[str] = None
+
+class BatchPredictionResponse(BaseModel):
+    """Modelo para respuesta de predicción por lotes"""
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchPredictionItem]
 
 class ErrorResponse(BaseModel):
     """Modelo para respuestas de error"""
@@ -1,21 +1,129 @@
+import hashlib
+import os
 import joblib
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+from app.core.config import settings
 from app.models.session_models import AnomalyPredictionResponse
+from app.services.compiled_forest import CompiledIsolationForest
+from app.services.feature_extractor import FeatureExtractor
+from app.services.feature_memo import FeatureMemo
+from app.services.metrics import span
+
+# Cambia cuando cambia lo que guarda el artefacto compilado (obliga a recompilarlo)
+COMPILED_ARTIFACT_FORMAT = 2
 
 class AnomalyPredictor:
-    def __init__(self):
+    SCORING_ENGINES = ("sklearn", "compiled")
+    
+    def __init__(self, scoring_engine: Optional[str] = None, feature_memo: Optional[FeatureMemo] = None,
+                 model_path: Optional[str] = None, scaler_path: Optional[str] = None,
+                 compiled_path: Optional[str] = None, model_version: str = "default", load: bool = True,
+                 attributions: Optional[bool] = None):
         self.model = None
         self.scaler = None
-        self._load_models()
+        self.compiled_model = None
+        # Bosque aplanado con el que se calculan las atribuciones (el mismo
+        # compiled_model con el motor compilado; uno propio con sklearn)
+        self.attribution_forest = None
+        # Parámetros del scaler usados por el motor compilado (None si no aplica)
+        self.scaler_mean = None
+        self.scaler_scale = None
+        self.model_fingerprint = ""
+        self.model_path = model_path or settings.MODEL_PATH
+        self.scaler_path = scaler_path or settings.SCALER_PATH
+        self.compiled_path = compiled_path or settings.COMPILED_MODEL_PATH
+        # Versión del registro de modelos; se informa en cada respuesta
+        self.model_version = model_version
+        self.scoring_engine = scoring_engine or settings.SCORING_ENGINE
+        if self.scoring_engine not in self.SCORING_ENGINES:
+            raise ValueError(f"Motor de scoring desconocido: {self.scoring_engine}")
+        if feature_memo is None and settings.FEATURE_MEMO_ENABLED:
+            feature_memo = FeatureMemo(settings.FEATURE_MEMO_MAX_ENTRIES)
+        self.feature_memo = feature_memo
+        self.attributions = settings.ATTRIBUTIONS_ENABLED if attributions is None else attributions
+        if load:
+            self.load_models()
+    
+    @property
+    def is_loaded(self) -> bool:
+        """Si el predictor tiene cargado lo necesario para su motor de scoring"""
+        if self.scoring_engine == "compiled":
+            return self.compiled_model is not None
+        return self.model is not None and self.scaler is not None
     
-    def _load_models(self):
-        """Carga el modelo entrenado y el scaler"""
+    def load_models(self):
+        """
+        Carga el modelo entrenado y el scaler desde `model_path` y `scaler_path`
+        (por defecto MODEL_PATH y SCALER_PATH)
+        
+        Con el motor compilado se usa el artefacto `compiled_path`: sus
+        arreglos se abren con mmap (las páginas se comparten entre todos los
+        procesos que lo cargan) y no hace falta importar sklearn. Si el
+        artefacto no existe o corresponde a otro modelo, se compila a partir
+        de los .pkl y se vuelve a guardar. Con el motor sklearn y las
+        atribuciones activas también se aplana el bosque, solo para ellas.
+        """
         try:
-            self.model = joblib.load('models/modelo_isolation.pkl')
-            self.scaler = joblib.load('models/scaler.pkl')
+            self.model_fingerprint = self._fingerprint(self.model_path, self.scaler_path)
+            if self.scoring_engine == "compiled" and self._load_compiled_artifact(self.compiled_path):
+                self.attribution_forest = self.compiled_model
+                return
+            self.model = joblib.load(self.model_path)
+            self.scaler = joblib.load(self.scaler_path)
         except FileNotFoundError as e:
             raise Exception(f"Error al cargar el modelo: {e}")
+        
+        if self.scoring_engine == "compiled":
+            self.compiled_model = CompiledIsolationForest.from_sklearn(self.model)
+            self.scaler_mean = self.scaler.mean_ if self.scaler.with_mean else None
+            self.scaler_scale = self.scaler.scale_ if self.scaler.with_std else None
+            self._save_compiled_artifact(self.compiled_path)
+            self.attribution_forest = self.compiled_model
+        elif self.attributions:
+            self.attribution_forest = CompiledIsolationForest.from_sklearn(self.model)
+    
+    def _load_compiled_artifact(self, path: str) -> bool:
+        """Abre el artefacto compilado con mmap; False si falta o es de otro modelo"""
+        if not os.path.exists(path):
+            return False
+        artifact = joblib.load(path, mmap_mode='r')
+        if artifact.get("format") != COMPILED_ARTIFACT_FORMAT or artifact.get("fingerprint") != self.model_fingerprint:
+            return False
+        self.compiled_model = artifact["forest"]
+        self.scaler_mean = artifact["scaler_mean"]
+        self.scaler_scale = artifact["scaler_scale"]
+        return True
+    
+    def _save_compiled_artifact(self, path: str) -> None:
+        """Guarda el bosque compilado sin comprimir (requisito para abrirlo con mmap)"""
+        artifact = {
+            "format": COMPILED_ARTIFACT_FORMAT,
+            "fingerprint": self.model_fingerprint,
+            "forest": self.compiled_model,
+            "scaler_mean": self.scaler_mean,
+            "scaler_scale": self.scaler_scale,
+        }
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            joblib.dump(artifact, temp_path)
+            # Reemplazo atómico: otro proceso nunca ve un artefacto a medio escribir
+            os.replace(temp_path, path)
+        except OSError as e:
+            # Sistema de archivos de solo lectura: se sigue con el modelo en memoria
+            print(f"⚠️ No se pudo guardar el modelo compilado en {path}: {e}")
+    
+    @staticmethod
+    def _fingerprint(*paths: str) -> str:
+        """Huella del contenido de los artefactos; cambia si se reemplaza el modelo o el scaler"""
+        digest = hashlib.sha256()
+        for path in paths:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()[:16]
     
     def predict(self, features: np.ndarray) -> tuple[bool, float]:
         """
@@ -27,21 +135,140 @@ class AnomalyPredictor:
         Returns:
             tuple: (es_anomalia, risk_score)
         """
-        if self.model is None or self.scaler is None:
+        if not self.is_loaded:
+            raise Exception("Modelo no cargado correctamente")
+        
+        is_anomaly, anomaly_scores, _ = self._predict_memoized(np.asarray(features, dtype=float).reshape(1, -1))
+        
+        return bool(is_anomaly[0]), anomaly_scores[0]
+    
+    def predict_batch(self, features: np.ndarray, explain: bool = False) -> tuple:
+        """
+        Realiza la predicción de anomalía para varias sesiones a la vez
+        
+        Args:
+            features: Matriz (n_sesiones, n_características) sin escalar
+            explain: Si además se calcula la atribución de cada característica
+                (requiere que el predictor tenga las atribuciones activas)
+            
+        Returns:
+            tuple: (es_anomalia por fila, risk_score por fila), más la matriz de
+            atribuciones (n_sesiones, n_características) con `explain`
+        """
+        if not self.is_loaded:
             raise Exception("Modelo no cargado correctamente")
         
-        # Escalar las características
-        features_scaled = self.scaler.transform(features.reshape(1, -1))
+        features = np.asarray(features, dtype=float)
+        if features.ndim != 2 or features.shape[0] == 0:
+            raise ValueError("Se esperaba una matriz de características no vacía")
+        if explain and self.attribution_forest is None:
+            raise ValueError("Las atribuciones no están activas en este predictor")
+        
+        is_anomaly, anomaly_scores, attributions = self._predict_memoized(features, explain)
+        if explain:
+            return is_anomaly, anomaly_scores, attributions
+        return is_anomaly, anomaly_scores
+    
+    def _predict_memoized(self, features: np.ndarray, explain: bool = False) -> tuple:
+        """
+        Escala y puntúa solo las filas cuyo vector no está en el memo
+        
+        Las filas repetidas dentro de la misma matriz se puntúan una sola vez.
+        Con `explain`, una entrada memorizada sin atribuciones se vuelve a puntuar.
+        
+        Returns:
+            tuple: (es_anomalia, scores, atribuciones o None)
+        """
+        if self.feature_memo is None:
+            # Una sola llamada al scaler y al modelo para toda la matriz
+            with span("scale"):
+                features_scaled = self._scale(features)
+            with span("score"):
+                return self._score(features_scaled, explain)
+        
+        keys = self.feature_memo.keys(features)
+        found = self.feature_memo.get_many(keys)
+        if explain:
+            found = [entry if entry is None or entry[2] is not None else None for entry in found]
+        is_anomaly = np.empty(len(keys), dtype=bool)
+        anomaly_scores = np.empty(len(keys), dtype=float)
+        attributions = np.empty((len(keys), features.shape[1])) if explain else None
+        
+        # Primera fila de cada vector sin resultado memorizado
+        pending: Dict[bytes, int] = {}
+        for row, (key, entry) in enumerate(zip(keys, found)):
+            if entry is not None:
+                is_anomaly[row], anomaly_scores[row] = entry[0], entry[1]
+                if explain:
+                    attributions[row] = entry[2]
+            elif key not in pending:
+                pending[key] = row
         
-        # Predecir anomalía
-        prediction = self.model.predict(features_scaled)
-        # El Isolation Forest devuelve -1 para anomalías, 1 para normal
-        is_anomaly = prediction[0] == -1
+        if pending:
+            rows = list(pending.values())
+            with span("scale"):
+                features_scaled = self._scale(features[rows])
+            with span("score"):
+                new_anomaly, new_scores, new_attributions = self._score(features_scaled, explain)
+            new_entries = [
+                (bool(anomaly), float(score), new_attributions[i] if explain else None)
+                for i, (anomaly, score) in enumerate(zip(new_anomaly, new_scores))
+            ]
+            self.feature_memo.set_many(list(zip(pending, new_entries)))
+            results = dict(zip(pending, new_entries))
+            for row, (key, entry) in enumerate(zip(keys, found)):
+                if entry is None:
+                    is_anomaly[row], anomaly_scores[row], row_attributions = results[key]
+                    if explain:
+                        attributions[row] = row_attributions
         
-        # Obtener el score de anomalía (más bajo = más anómalo)
-        anomaly_score = self.model.score_samples(features_scaled)[0]
+        return is_anomaly, anomaly_scores, attributions
+    
+    def _scale(self, features: np.ndarray) -> np.ndarray:
+        """Aplica el StandardScaler; con el motor compilado se hace directo con NumPy"""
+        if self.compiled_model is None:
+            return self.scaler.transform(features)
+        
+        # Mismas operaciones que StandardScaler.transform
+        features_scaled = np.array(features, dtype=float)
+        if self.scaler_mean is not None:
+            features_scaled -= self.scaler_mean
+        if self.scaler_scale is not None:
+            features_scaled /= self.scaler_scale
+        return features_scaled
+    
+    def _score(self, features_scaled: np.ndarray, explain: bool = False) -> tuple:
+        """
+        Calcula score y etiqueta recorriendo el bosque una sola vez
+        
+        `model.predict` vuelve a calcular `score_samples` internamente y marca
+        como anomalía (-1) las filas con `score_samples - offset_ < 0`, así que
+        la etiqueta se obtiene comparando el score con `offset_`. Con el motor
+        compilado las atribuciones salen del mismo recorrido; con sklearn se
+        recorre además el bosque aplanado.
         
-        return is_anomaly, anomaly_score
+        Args:
+            features_scaled: Matriz de características ya escaladas
+            explain: Si se calculan las atribuciones por característica
+            
+        Returns:
+            tuple: (es_anomalia por fila, score por fila; más bajo = más anómalo,
+            atribuciones por fila o None)
+        """
+        attributions = None
+        if self.compiled_model is not None:
+            if explain:
+                anomaly_scores, attributions = self.compiled_model.score_samples(features_scaled, attributions=True)
+            else:
+                anomaly_scores = self.compiled_model.score_samples(features_scaled)
+            offset = self.compiled_model.offset_
+        else:
+            anomaly_scores = self.model.score_samples(features_scaled)
+            offset = self.model.offset_
+            if explain:
+                _, attributions = self.attribution_forest.score_samples(features_scaled, attributions=True)
+        is_anomaly = anomaly_scores - offset < 0
+        return is_anomaly, anomaly_scores, attributions
     
     def clasificar_anomalia(self, features_dict: Dict[str, Any]) -> str:
         """
@@ -83,8 +310,41 @@ class AnomalyPredictor:
         Returns:
             AnomalyPredictionResponse: Respuesta completa con clasificación
         """
-        is_anomaly, risk_score = self.predict(features)
+        return self.get_batch_prediction_details(
+            np.asarray(features, dtype=float).reshape(1, -1), [features_dict], [session_summary]
+        )[0]
+    
+    def get_batch_prediction_details(self, features: np.ndarray, features_dicts: List[Dict[str, Any]],
+                                     session_summaries: List[Dict[str, Any]]) -> List[AnomalyPredictionResponse]:
+        """
+        Obtiene los detalles de predicción de varias sesiones con una sola pasada del modelo
         
+        Args:
+            features: Matriz de características, una fila por sesión
+            features_dicts: Diccionarios de características en el mismo orden que las filas
+            session_summaries: Resúmenes de sesión en el mismo orden que las filas
+            
+        Returns:
+            List[AnomalyPredictionResponse]: Respuestas en el mismo orden de entrada
+        """
+        explain = self.attribution_forest is not None and self.attributions
+        if explain:
+            is_anomaly, risk_scores, attributions = self.predict_batch(features, explain=True)
+        else:
+            is_anomaly, risk_scores = self.predict_batch(features)
+        with span("build_response"):
+            # Redondeo y conversión a float de Python en una sola operación para todo el lote
+            attribution_rows = attributions.round(4).tolist() if explain else [None] * len(risk_scores)
+            return [
+                self._build_response(bool(anomaly), score, features_dict, summary, row_attributions)
+                for anomaly, score, features_dict, summary, row_attributions
+                in zip(is_anomaly, risk_scores, features_dicts, session_summaries, attribution_rows)
+            ]
+    
+    def _build_response(self, is_anomaly: bool, risk_score: float, features_dict: Dict[str, Any],
+                        session_summary: Dict[str, Any],
+                        attributions: Optional[List[float]] = None) -> AnomalyPredictionResponse:
+        """Construye la respuesta a partir del resultado del modelo"""
         # Determinar el mensaje y clasificación
         if is_anomaly:
             anomaly_type = self.clasificar_anomalia(features_dict)
@@ -101,5 +361,10 @@ class AnomalyPredictor:
             features_used=features_dict,
             session_summary=session_summary,
             message=message,
-            anomaly_type=anomaly_type
+            anomaly_type=anomaly_type,
+            model_version=self.model_version,
+            feature_attributions=(
+                dict(sorted(zip(FeatureExtractor.MODEL_FEATURES, attributions), key=lambda item: -item[1]))
+                if attributions is not None else None
+            )
         ) 
\ No newline at end of file
@@ -0,0 +1,231 @@
+import numpy as np
+from typing import Any
+
+
+def average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """
+    Longitud media de camino de un iTree con n muestras (misma fórmula que sklearn)
+
+    Args:
+        n_samples: Número de muestras de entrenamiento en cada nodo
+
+    Returns:
+        np.ndarray: Corrección de profundidad para cada valor de n_samples
+    """
+    n_samples = np.asarray(n_samples, dtype=float)
+    result = np.zeros_like(n_samples)
+    result[n_samples == 2] = 1.0
+    mask = n_samples > 2
+    n = n_samples[mask]
+    result[mask] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return result
+
+
+class CompiledIsolationForest:
+    """
+    Isolation Forest aplanado en arreglos contiguos de NumPy
+
+    Todos los árboles se guardan en un único arreglo de nodos (característica,
+    umbral, hijos y corrección de profundidad de las hojas). Las hojas apuntan
+    a sí mismas con umbral infinito, de modo que el recorrido es una serie de
+    operaciones vectorizadas sobre (filas x árboles) repetida `max_depth` veces,
+    sin pasar por sklearn en cada predicción.
+
+    El mismo recorrido da también la atribución de cada característica: al
+    pasar de un nodo con n_p muestras a un hijo con n_h, la profundidad
+    esperada restante pasa de c(n_p) a 1 + c(n_h), y ese ahorro se asigna a
+    la característica del corte. La suma de los ahorros del camino es
+    exactamente c(n_raíz) - profundidad del camino, así que las atribuciones
+    de una fila suman la diferencia entre la profundidad media de una muestra
+    típica y la de la fila, que es lo que determina el score. Un corte que
+    manda la sesión al lado pequeño aporta mucho; uno que la deja con la
+    mayoría aporta un valor negativo. Como el camino queda determinado por la
+    hoja, los ahorros acumulados por característica se precalculan para
+    cada nodo y el recorrido solo suma los vectores de las hojas alcanzadas.
+    """
+
+    # Filas por bloque al puntuar lotes grandes (mantiene los temporales en caché)
+    CHUNK_ROWS = 256
+
+    def __init__(self, feature: np.ndarray, threshold: np.ndarray, left: np.ndarray,
+                 right: np.ndarray, correction: np.ndarray, roots: np.ndarray,
+                 max_depth: int, denominator: float, offset: float, path_attribution: np.ndarray):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # Hijos intercalados: children[2 * nodo + va_a_la_derecha]
+        self.children = np.ascontiguousarray(np.stack([left, right], axis=1).ravel())
+        self.correction = correction
+        self.roots = roots
+        self.max_depth = max_depth
+        self.denominator = denominator
+        self.offset_ = offset
+        # (nodo, característica): profundidad esperada ahorrada desde la raíz hasta el nodo
+        self.path_attribution = path_attribution
+
+    def __setstate__(self, state: dict) -> None:
+        # Al abrir el artefacto con mmap los arreglos llegan como np.memmap; una
+        # vista ndarray de las mismas páginas evita el coste de la subclase
+        # (__array_finalize__) en cada np.take del recorrido
+        self.__dict__.update({
+            name: np.asarray(value) if isinstance(value, np.ndarray) else value
+            for name, value in state.items()
+        })
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "CompiledIsolationForest":
+        """
+        Compila un IsolationForest de sklearn ya entrenado
+
+        Args:
+            model: Instancia de sklearn.ensemble.IsolationForest
+
+        Returns:
+            CompiledIsolationForest: Motor equivalente con los árboles aplanados
+        """
+        features, thresholds, lefts, rights, corrections, roots = [], [], [], [], [], []
+        path_attributions = []
+        max_depth = 0
+        base = 0
+
+        for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            node_count = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(node_count)
+
+            # Índices de característica referidos a la matriz completa
+            feature = np.asarray(estimator_features)[np.where(is_leaf, 0, tree.feature)]
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+            left = np.where(is_leaf, node_ids, tree.children_left) + base
+            right = np.where(is_leaf, node_ids, tree.children_right) + base
+
+            # Nodos en el camino hasta la hoja + camino medio esperado bajo la hoja - 1
+            path_lengths = cls._decision_path_lengths(tree.children_left, tree.children_right)
+            correction = path_lengths + average_path_length(tree.n_node_samples) - 1.0
+            path_attribution = cls._path_attributions(
+                tree.children_left, tree.children_right, feature, tree.n_node_samples, model.n_features_in_
+            )
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            corrections.append(correction)
+            path_attributions.append(path_attribution)
+            roots.append(base)
+            max_depth = max(max_depth, int(tree.max_depth))
+            base += node_count
+
+        denominator = len(model.estimators_) * average_path_length([model.max_samples_])[0]
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            correction=np.ascontiguousarray(np.concatenate(corrections), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            denominator=float(denominator),
+            offset=float(model.offset_),
+            path_attribution=np.ascontiguousarray(np.concatenate(path_attributions), dtype=np.float64)
+        )
+
+    @staticmethod
+    def _decision_path_lengths(children_left: np.ndarray, children_right: np.ndarray) -> np.ndarray:
+        """
+        Número de nodos en el camino desde la raíz (la raíz cuenta como 1)
+
+        Los árboles de sklearn se construyen en profundidad, por lo que los
+        hijos siempre tienen un índice mayor que su padre.
+        """
+        lengths = np.ones(len(children_left), dtype=float)
+        for node in range(len(children_left)):
+            if children_left[node] != -1:
+                lengths[children_left[node]] = lengths[node] + 1
+                lengths[children_right[node]] = lengths[node] + 1
+        return lengths
+
+    @staticmethod
+    def _path_attributions(children_left: np.ndarray, children_right: np.ndarray, feature: np.ndarray,
+                           n_node_samples: np.ndarray, n_features: int) -> np.ndarray:
+        """
+        Ahorro de profundidad acumulado por característica desde la raíz hasta cada nodo
+
+        Cada rama padre -> hijo suma c(n_padre) - 1 - c(n_hijo) a la
+        característica del corte del padre. Como en `_decision_path_lengths`,
+        los padres se visitan antes que sus hijos.
+        """
+        expected = average_path_length(n_node_samples)
+        attributions = np.zeros((len(children_left), n_features))
+        for node in range(len(children_left)):
+            for child in (children_left[node], children_right[node]):
+                if child != -1:
+                    attributions[child] = attributions[node]
+                    attributions[child, feature[node]] += expected[node] - 1.0 - expected[child]
+        return attributions
+
+    def score_samples(self, features_scaled: np.ndarray, attributions: bool = False):
+        """
+        Equivalente a IsolationForest.score_samples (más bajo = más anómalo)
+
+        Args:
+            features_scaled: Matriz (n_filas, n_características) ya escalada
+            attributions: Si además se calcula la atribución por característica
+                en el mismo recorrido
+
+        Returns:
+            np.ndarray: Score de cada fila, o con `attributions` la tupla
+            (scores, matriz (n_filas, n_características) con la profundidad
+            media que acorta cada característica; positivo = hacia anomalía)
+        """
+        # sklearn evalúa los árboles en float32; se replica para que las
+        # comparaciones con los umbrales den el mismo resultado
+        X = np.asarray(features_scaled, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if not np.all(np.isfinite(X)):
+            raise ValueError("El motor compilado requiere características finitas")
+
+        if X.shape[0] <= self.CHUNK_ROWS:
+            scores, gains = self._score_chunk(X, attributions)
+        else:
+            chunks = [
+                self._score_chunk(X[start:start + self.CHUNK_ROWS], attributions)
+                for start in range(0, X.shape[0], self.CHUNK_ROWS)
+            ]
+            scores = np.concatenate([chunk_scores for chunk_scores, _ in chunks])
+            gains = np.vstack([chunk_gains for _, chunk_gains in chunks]) if attributions else None
+        if not attributions:
+            return scores
+        return scores, gains
+
+    def _score_chunk(self, X: np.ndarray, attributions: bool = False) -> tuple:
+        n_rows = X.shape[0]
+        # Características en orden (característica, fila) para indexar con feature * n_rows + fila
+        flat_X = np.ascontiguousarray(X.T).ravel()
+        rows = np.arange(n_rows, dtype=np.intp)
+
+        # Un nodo actual por (árbol, fila); las hojas se quedan donde están.
+        # Los índices son válidos por construcción, mode='clip' evita la verificación de límites
+        nodes = np.repeat(self.roots[:, None], n_rows, axis=1)
+        for _ in range(self.max_depth):
+            feature = np.take(self.feature, nodes, mode='clip')
+            values = np.take(flat_X, feature * n_rows + rows, mode='clip')
+            go_right = values > np.take(self.threshold, nodes, mode='clip')
+            nodes = np.take(self.children, 2 * nodes + go_right, mode='clip')
+
+        depths = np.take(self.correction, nodes, mode='clip').sum(axis=0)
+        scores = -(2.0 ** (-depths / self.denominator))
+        if not attributions:
+            return scores, None
+        # Media por árbol: las atribuciones de una fila suman c(n_raíz) - profundidad media
+        gains = np.take(self.path_attribution, nodes, axis=0, mode='clip').sum(axis=0) / len(self.roots)
+        return scores, gains
+
+    def predict(self, features_scaled: np.ndarray) -> np.ndarray:
+        """Equivalente a IsolationForest.predict: -1 para anomalías, 1 para normal"""
+        scores = self.score_samples(features_scaled)
+        return np.where(scores - self.offset_ < 0, -1, 1)
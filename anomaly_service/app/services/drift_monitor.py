@@ -0,0 +1,312 @@
+import asyncio
+import bisect
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.session_models import AnomalyPredictionResponse
+from app.services.feature_extractor import FeatureExtractor
+from app.services.model_registry import DEFAULT_VERSION, ModelRegistry, create_model_registry
+
+# Distribuciones vigiladas: las características del modelo y el score
+SIGNALS = [*FeatureExtractor.MODEL_FEATURES, "risk_score"]
+# Percentiles de entrenamiento que delimitan los intervalos del sketch
+REFERENCE_PERCENTILES = np.arange(1, 100)
+# Grupos de igual masa de referencia sobre los que se calcula el PSI
+PSI_BINS = 10
+PSI_EPSILON = 1e-4
+# Coeficiente del valor crítico de KS de dos muestras para α = 0.05
+KS_ALPHA_COEFFICIENT = 1.358
+# Lotes más pequeños que esto se cuentan con bisect en lugar de NumPy
+SMALL_BATCH = 32
+REPORT_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def build_reference(matrix: np.ndarray, scores: np.ndarray, anomaly_rate: float) -> Dict[str, Any]:
+    """
+    Foto de referencia de las distribuciones de entrenamiento
+
+    Para cada característica y para el score guarda los percentiles 1..99
+    (sin repetidos) y cuántas filas de entrenamiento caen en cada intervalo
+    que delimitan. Se guarda en metadata.json al entrenar.
+
+    Args:
+        matrix: Filas de entrenamiento (n x MODEL_FEATURES)
+        scores: score_samples del modelo entrenado para esas filas
+        anomaly_rate: Fracción de filas de entrenamiento marcadas como anomalía
+    """
+    columns = np.column_stack([matrix, scores])
+    signals = {}
+    for name, column in zip(SIGNALS, columns.T):
+        edges = np.unique(np.percentile(column, REFERENCE_PERCENTILES))
+        counts = np.bincount(np.searchsorted(edges, column), minlength=len(edges) + 1)
+        signals[name] = {"edges": edges.tolist(), "counts": counts.tolist()}
+    return {"rows": int(len(matrix)), "anomaly_rate": float(anomaly_rate), "signals": signals}
+
+
+def quantile_from_counts(edges: np.ndarray, counts: np.ndarray, q: float) -> Optional[float]:
+    """Cuantil aproximado por interpolación lineal dentro del intervalo (los extremos se recortan a los bordes)"""
+    total = counts.sum()
+    if total == 0:
+        return None
+    cumulative = np.cumsum(counts)
+    target = q * total
+    b = int(np.searchsorted(cumulative, target))
+    lower = edges[max(b - 1, 0)]
+    upper = edges[min(b, len(edges) - 1)]
+    before = cumulative[b - 1] if b > 0 else 0
+    fraction = (target - before) / counts[b] if counts[b] else 0.0
+    return float(lower + (upper - lower) * fraction)
+
+
+def population_stability_index(reference: np.ndarray, live: np.ndarray) -> float:
+    """
+    PSI entre dos histogramas sobre los mismos intervalos
+
+    Los intervalos se agrupan en PSI_BINS grupos de igual masa de
+    referencia (deciles), la agrupación habitual del PSI; un intervalo con
+    mucha masa (valores repetidos) queda en su propio grupo.
+    """
+    reference_fraction = reference / reference.sum()
+    before = np.cumsum(reference_fraction) - reference_fraction
+    groups = np.minimum((before * PSI_BINS + 1e-9).astype(int), PSI_BINS - 1)
+    expected = np.bincount(groups, weights=reference, minlength=PSI_BINS) / reference.sum()
+    actual = np.bincount(groups, weights=live, minlength=PSI_BINS) / live.sum()
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(reference: np.ndarray, live: np.ndarray) -> float:
+    """Máxima distancia entre las funciones de distribución, evaluadas en los bordes de los intervalos"""
+    return float(np.max(np.abs(np.cumsum(reference) / reference.sum() - np.cumsum(live) / live.sum())))
+
+
+class DriftMonitor:
+    """
+    Deriva de las distribuciones de las sesiones puntuadas respecto al entrenamiento
+
+    Cada característica del modelo y el risk_score tienen un sketch de
+    tamaño fijo: un contador por intervalo entre percentiles de
+    entrenamiento (unos 100 enteros). Cada sesión puntuada suma 1 al
+    intervalo de cada valor, así que la memoria no crece con el tráfico y
+    el costo por sesión es una búsqueda binaria por distribución.
+
+    Periódicamente (`check`) la ventana actual se compara con la referencia
+    guardada al entrenar, con PSI sobre deciles de referencia y el
+    estadístico KS, y se reinicia. Un cambio de versión del modelo cambia
+    la referencia y reinicia la ventana.
+    """
+
+    def __init__(self, reference_loader: Callable[[str], Optional[Dict[str, Any]]],
+                 min_sessions: int = 500, psi_warning: float = 0.1, psi_alert: float = 0.25):
+        self.reference_loader = reference_loader
+        self.min_sessions = min_sessions
+        self.psi_warning = psi_warning
+        self.psi_alert = psi_alert
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._reference: Optional[Dict[str, Any]] = None
+        self._edges: List[np.ndarray] = []
+        self._edge_lists: List[List[float]] = []
+        self._reference_counts: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+        self._sessions = 0
+        self._anomalies = 0
+        self._window_start = time.time()
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _set_version(self, version: str) -> None:
+        """Carga la referencia de la versión y empieza una ventana nueva (con el lock tomado)"""
+        self._version = version
+        self._last_report = None
+        self._reference = None
+        self._edges, self._edge_lists, self._reference_counts = [], [], []
+        try:
+            reference = self.reference_loader(version)
+            if reference is not None:
+                signals = [reference["signals"][name] for name in SIGNALS]
+                self._edges = [np.asarray(signal["edges"], dtype=float) for signal in signals]
+                self._edge_lists = [list(signal["edges"]) for signal in signals]
+                self._reference_counts = [np.asarray(signal["counts"], dtype=float) for signal in signals]
+                self._reference = reference
+        except Exception as e:
+            self._edges, self._edge_lists, self._reference_counts = [], [], []
+            print(f"⚠️ No se pudo leer la referencia de drift de {version}: {e}")
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        self._counts = [np.zeros(len(edges) + 1, dtype=np.int64) for edges in self._edges]
+        self._sessions = 0
+        self._anomalies = 0
+        self._window_start = time.time()
+
+    def observe(self, responses: List[AnomalyPredictionResponse]) -> None:
+        """Añade al sketch las características y el score de respuestas del modelo"""
+        if not responses:
+            return
+        version = responses[-1].model_version or DEFAULT_VERSION
+        rows = [
+            [*(response.features_used[name] for name in FeatureExtractor.MODEL_FEATURES), response.risk_score]
+            for response in responses if (response.model_version or DEFAULT_VERSION) == version
+        ]
+        anomalies = sum(response.prediction == "Anomalía" for response in responses
+                        if (response.model_version or DEFAULT_VERSION) == version)
+        with self._lock:
+            if version != self._version:
+                self._set_version(version)
+            if self._reference is None:
+                return
+            if len(rows) < SMALL_BATCH:
+                for row in rows:
+                    for value, edges, counts in zip(row, self._edge_lists, self._counts):
+                        counts[bisect.bisect_left(edges, value)] += 1
+            else:
+                columns = np.asarray(rows, dtype=float).T
+                for column, edges, counts in zip(columns, self._edges, self._counts):
+                    counts += np.bincount(np.searchsorted(edges, column), minlength=len(counts))
+            self._sessions += len(rows)
+            self._anomalies += anomalies
+
+    def _report(self) -> Dict[str, Any]:
+        """Compara la ventana actual con la referencia (con el lock tomado)"""
+        report: Dict[str, Any] = {
+            "model_version": self._version,
+            "window_start": self._window_start,
+            "window_end": time.time(),
+            "sessions": self._sessions,
+        }
+        if self._reference is None:
+            return {**report, "status": "no_reference"}
+        reference_rows = self._reference["rows"]
+        report["reference_sessions"] = reference_rows
+        report["anomaly_rate"] = {
+            "reference": self._reference["anomaly_rate"],
+            "live": self._anomalies / self._sessions if self._sessions else None,
+        }
+        if self._sessions < self.min_sessions:
+            return {**report, "status": "insufficient_data"}
+
+        ks_critical = KS_ALPHA_COEFFICIENT * np.sqrt(
+            (reference_rows + self._sessions) / (reference_rows * self._sessions)
+        )
+        signals = {}
+        worst = 0.0
+        for name, edges, reference_counts, counts in zip(SIGNALS, self._edges, self._reference_counts, self._counts):
+            psi = population_stability_index(reference_counts, counts)
+            ks = ks_statistic(reference_counts, counts)
+            worst = max(worst, psi)
+            signals[name] = {
+                "psi": round(psi, 4),
+                "ks": round(ks, 4),
+                "ks_significant": bool(ks > ks_critical),
+                "status": self._status(psi),
+                "reference_quantiles": {f"p{int(q * 100)}": quantile_from_counts(edges, reference_counts, q)
+                                        for q in REPORT_QUANTILES},
+                "live_quantiles": {f"p{int(q * 100)}": quantile_from_counts(edges, counts, q)
+                                   for q in REPORT_QUANTILES},
+            }
+        return {
+            **report,
+            "status": self._status(worst),
+            "ks_critical": round(float(ks_critical), 4),
+            "signals": signals,
+        }
+
+    def _status(self, psi: float) -> str:
+        if psi >= self.psi_alert:
+            return "drift"
+        if psi >= self.psi_warning:
+            return "warning"
+        return "stable"
+
+    def current(self) -> Dict[str, Any]:
+        """Comparación de la ventana en curso, sin reiniciarla"""
+        with self._lock:
+            if self._version is None:
+                return {"model_version": None, "sessions": 0, "status": "insufficient_data"}
+            return self._report()
+
+    def last_report(self) -> Optional[Dict[str, Any]]:
+        """Resultado de la última revisión periódica con datos suficientes"""
+        return self._last_report
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """
+        Revisión periódica: compara la ventana y empieza otra
+
+        Mientras la ventana no tenga `min_sessions` sesiones sigue
+        acumulando y no se reporta nada.
+        """
+        with self._lock:
+            if self._reference is None or self._sessions < self.min_sessions:
+                return None
+            report = self._report()
+            self._last_report = report
+            self._reset_window()
+        if report["status"] != "stable":
+            drifted = [name for name, signal in report["signals"].items() if signal["status"] != "stable"]
+            print(f"⚠️ Drift en el modelo {report['model_version']} ({report['status']}): {', '.join(drifted)}")
+        return report
+
+    def start(self, interval_seconds: float) -> None:
+        """Ejecuta `check` cada `interval_seconds` (0 = solo bajo demanda)"""
+        if interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run(interval_seconds))
+
+    async def _run(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Error revisando el drift: {e}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        last = self._last_report
+        return {
+            "model_version": self._version,
+            "has_reference": self._reference is not None,
+            "window_sessions": self._sessions,
+            "min_sessions": self.min_sessions,
+            "last_check": last["window_end"] if last else None,
+            "last_status": last["status"] if last else None,
+        }
+
+
+def load_reference(registry: ModelRegistry, version: str) -> Optional[Dict[str, Any]]:
+    """Referencia de una versión: `drift_reference` de su metadata.json o DRIFT_REFERENCE_PATH para "default" """
+    if version != DEFAULT_VERSION:
+        return registry.metadata(version).get("drift_reference")
+    try:
+        with open(settings.DRIFT_REFERENCE_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def create_drift_monitor() -> Optional[DriftMonitor]:
+    """Crea el monitor de drift con la configuración de Settings (None si está desactivado)"""
+    if not settings.DRIFT_ENABLED:
+        return None
+    registry = create_model_registry()
+    return DriftMonitor(
+        lambda version: load_reference(registry, version),
+        min_sessions=settings.DRIFT_MIN_SESSIONS,
+        psi_warning=settings.DRIFT_PSI_WARNING,
+        psi_alert=settings.DRIFT_PSI_ALERT
+    )
@@ -0,0 +1,141 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Optional
+
+from app.services.model_registry import create_model_registry
+from app.services.scoring_pipeline import ScoringPipeline, create_scoring_pipeline
+
+
+class ExecutorSaturatedError(Exception):
+    """Se lanza cuando la cola del executor está llena (back-pressure)"""
+
+
+# Pipeline propio de cada proceso worker (solo en modo "process")
+_worker_pipeline: Optional[ScoringPipeline] = None
+
+
+def _init_worker(scoring_engine: str, model_version: str) -> None:
+    """Carga el modelo una vez al arrancar cada proceso worker"""
+    global _worker_pipeline
+    # Las líneas base por usuario se aplican en el proceso principal
+    _worker_pipeline = create_scoring_pipeline(scoring_engine, model_version=model_version, user_state=False)
+
+
+def _run_in_worker(model_version: str, method: str, *args: Any) -> Any:
+    """
+    Ejecuta un método del pipeline del proceso worker
+
+    Si el proceso principal activó otra versión del modelo, el worker la
+    carga antes de atender la tarea.
+    """
+    predictor = _worker_pipeline.anomaly_predictor
+    if predictor.model_version != model_version:
+        _worker_pipeline.anomaly_predictor = create_model_registry().create_predictor(
+            model_version, predictor.scoring_engine
+        )
+    return getattr(_worker_pipeline, method)(*args)
+
+
+class PredictionExecutor:
+    """
+    Ejecuta el trabajo de CPU (extracción de características y scoring) fuera del event loop
+
+    Modos:
+        - "thread": pool de hilos que comparte el pipeline del proceso principal
+        - "process": pool de procesos, cada uno con su propio modelo precargado
+
+    Se admiten como máximo `max_workers + max_queue` tareas en curso; a partir
+    de ahí `run` lanza ExecutorSaturatedError en lugar de encolar sin límite.
+    """
+
+    MODES = ("thread", "process")
+
+    def __init__(self, pipeline: ScoringPipeline, mode: str = "thread",
+                 max_workers: int = 0, max_queue: int = 64):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de executor desconocido: {mode}")
+        self.pipeline = pipeline
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._pool: Optional[Executor] = None
+        self._in_flight = 0
+
+    @property
+    def capacity(self) -> int:
+        """Número máximo de tareas en curso (ejecutándose + en cola)"""
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self) -> None:
+        """Crea el pool de workers (idempotente)"""
+        if self._pool is not None:
+            return
+        if self.mode == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(
+                    self.pipeline.anomaly_predictor.scoring_engine,
+                    self.pipeline.anomaly_predictor.model_version
+                )
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="scoring"
+            )
+
+    def shutdown(self) -> None:
+        """Detiene el pool esperando a las tareas en curso"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    async def run(self, method: str, *args: Any) -> Any:
+        """
+        Ejecuta un método de ScoringPipeline en el pool y espera su resultado
+
+        Args:
+            method: Nombre del método del pipeline (p. ej. "predict_session")
+            *args: Argumentos del método (deben ser serializables en modo "process")
+
+        Returns:
+            El valor devuelto por el método del pipeline
+
+        Raises:
+            ExecutorSaturatedError: Si ya hay `capacity` tareas en curso
+        """
+        if self._in_flight >= self.capacity:
+            raise ExecutorSaturatedError(
+                f"Servicio saturado: {self._in_flight} tareas en curso (máximo {self.capacity})"
+            )
+
+        self.start()
+        if self.mode == "process":
+            call = partial(_run_in_worker, self.pipeline.anomaly_predictor.model_version, method, *args)
+        else:
+            call = partial(getattr(self.pipeline, method), *args)
+
+        self._in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._pool, call)
+        finally:
+            self._in_flight -= 1
+        if self.mode == "process":
+            result = self.pipeline.personalize_result(method, args, result)
+        return result
+
+    def stats(self) -> dict:
+        """Estado actual del executor"""
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+        }
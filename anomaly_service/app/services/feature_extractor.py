@@ -1,6 +1,5 @@
-import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union
 from datetime import datetime
 
 class FeatureExtractor:
@@ -26,6 +25,17 @@ class FeatureExtractor:
         'sets_antebrazos': 0.2,
     }
     
+    # Orden de las características que espera el modelo (igual que en el entrenamiento)
+    MODEL_FEATURES = [
+        'adjusted_performance',
+        'avg_weight',
+        'avg_reps',
+        'std_weight',
+        'rest_per_set',
+        'total_sets',
+        'totalDuration',
+    ]
+    
     @staticmethod
     def extract_exercise_features(exercises: List[Dict]) -> Dict[str, float]:
         """Extrae características de los ejercicios de una sesión"""
@@ -41,22 +51,10 @@ class FeatureExtractor:
             for s in sets:
                 if s.get("completed", True):  # solo incluir sets completados
                     total_sets += 1
-                    # Asegurar que los valores sean números
-                    weight = s.get("weight", 0)
-                    reps = s.get("reps", 0)
-                    rest = s.get("restTime", 0)
-                    
-                    # Convertir a float si es necesario
-                    if isinstance(weight, dict):
-                        weight = 0.0
-                    if isinstance(reps, dict):
-                        reps = 0.0
-                    if isinstance(rest, dict):
-                        rest = 0.0
-                    
-                    all_weights.append(float(weight))
-                    all_reps.append(float(reps))
-                    all_rest.append(float(rest))
+                    # Un envoltorio sin convertir ({"$numberInt": ...}) falla aquí en lugar de contar como 0
+                    all_weights.append(float(s.get("weight", 0)))
+                    all_reps.append(float(s.get("reps", 0)))
+                    all_rest.append(float(s.get("restTime", 0)))
 
         return {
             "total_sets": total_sets,
@@ -124,4 +122,212 @@ class FeatureExtractor:
         # Calcular rendimiento ajustado
         features['adjusted_performance'] = self.compute_adjusted_performance(features)
         
-        return features 
\ No newline at end of file
+        return features
+    
+    def extract_features_batch(self, sessions: List[Dict]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Extrae las características de varias sesiones con reducciones vectorizadas
+        
+        Aplana los sets completados de todas las sesiones en columnas (peso,
+        repeticiones, descanso) con el desplazamiento de cada sesión, y los
+        ejercicios en una tabla (sesión, código de grupo muscular). Medias,
+        desviaciones, volumen y rendimiento ajustado se calculan con reducciones
+        agrupadas de NumPy que reproducen exactamente el resultado de
+        `extract_features_from_session`.
+        
+        Args:
+            sessions: Sesiones en formato estándar
+            
+        Returns:
+            List: Diccionario de características o excepción por sesión, en el mismo orden
+        """
+        outcomes: List[Union[Dict[str, Any], Exception, None]] = [None] * len(sessions)
+        positions: List[int] = []
+        session_parts: List[Dict[str, Any]] = []
+        weight_parts: List[np.ndarray] = []
+        reps_parts: List[np.ndarray] = []
+        rest_parts: List[np.ndarray] = []
+        exercise_session: List[int] = []
+        exercise_muscle: List[int] = []
+        muscle_codes: Dict[str, int] = {}
+        muscle_rows: List[List[float]] = []
+        muscle_columns = list(self.MUSCLE_WEIGHTS.items())
+        
+        for index, session_data in enumerate(sessions):
+            try:
+                weights, reps, rests, muscles = self._flatten_exercises(session_data.get('exercises', []))
+                statistics = session_data.get('statistics', {})
+                muscle_features = self.expand_sets_by_muscle_group(statistics)
+                muscle_row = []
+                for col, _ in muscle_columns:
+                    count = muscle_features.get(col, 0)
+                    if not isinstance(count, (int, float)):
+                        raise TypeError(f"unsupported operand type(s) for *: '{type(count).__name__}' and 'float'")
+                    muscle_row.append(count)
+                part = {
+                    'muscle_features': muscle_features,
+                    'dominant_muscle_group': self.get_dominant_muscle_group(statistics),
+                    'totalDuration': session_data.get('totalDuration', 0),
+                    'totalRestTime': session_data.get('totalRestTime', 0),
+                }
+            except Exception as e:
+                outcomes[index] = e
+                continue
+            
+            row = len(positions)
+            positions.append(index)
+            session_parts.append(part)
+            weight_parts.append(weights)
+            reps_parts.append(reps)
+            rest_parts.append(rests)
+            muscle_rows.append(muscle_row)
+            for muscle in muscles:
+                exercise_session.append(row)
+                exercise_muscle.append(muscle_codes.setdefault(muscle, len(muscle_codes)))
+        
+        if not positions:
+            return outcomes
+        
+        n_sessions = len(positions)
+        counts = np.array([len(w) for w in weight_parts], dtype=np.intp)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        all_weights = np.concatenate(weight_parts)
+        all_reps = np.concatenate(reps_parts)
+        all_rest = np.concatenate(rest_parts)
+        
+        avg_weight, std_weight = self._grouped_mean_std(all_weights, offsets, counts)
+        avg_reps, std_reps = self._grouped_mean_std(all_reps, offsets, counts)
+        avg_rest, _ = self._grouped_mean_std(all_rest, offsets, counts)
+        total_volume = self._grouped_sequential_sum(all_weights * all_reps, offsets, counts)
+        
+        # Grupos musculares distintos por sesión (pares únicos sesión-código)
+        n_codes = max(len(muscle_codes), 1)
+        pairs = np.unique(np.asarray(exercise_session, dtype=np.intp) * n_codes
+                          + np.asarray(exercise_muscle, dtype=np.intp))
+        muscle_groups_count = np.bincount(pairs // n_codes, minlength=n_sessions)
+        
+        # Producto (sesiones x grupos) · pesos, acumulado columna a columna en el
+        # mismo orden que compute_adjusted_performance para obtener el mismo redondeo
+        muscle_matrix = np.array(muscle_rows, dtype=float).reshape(n_sessions, len(muscle_columns))
+        muscle_total = np.zeros(n_sessions)
+        for k, (_, weight) in enumerate(muscle_columns):
+            muscle_total += muscle_matrix[:, k] * weight
+        
+        for row, (index, part) in enumerate(zip(positions, session_parts)):
+            has_sets = counts[row] > 0
+            exercise_features = {
+                "total_sets": int(counts[row]),
+                "avg_weight": avg_weight[row] if has_sets else 0,
+                "std_weight": std_weight[row] if has_sets else 0,
+                "avg_reps": avg_reps[row] if has_sets else 0,
+                "std_reps": std_reps[row] if has_sets else 0,
+                "avg_restTime": avg_rest[row] if has_sets else 0,
+                "total_volume": round(float(total_volume[row]), 2) if has_sets else 0,
+                "muscle_groups_count": int(muscle_groups_count[row])
+            }
+            total_duration = part['totalDuration']
+            total_rest_time = part['totalRestTime']
+            total_sets = exercise_features['total_sets']
+            
+            features = {
+                **exercise_features,
+                **part['muscle_features'],
+                'totalDuration': total_duration,
+                'totalRestTime': total_rest_time,
+                'intensity_index': exercise_features['total_volume'] / total_duration if total_duration > 0 else 0,
+                'rest_per_set': total_rest_time / total_sets if total_sets > 0 else 0,
+                'dominant_muscle_group': part['dominant_muscle_group']
+            }
+            features['adjusted_performance'] = (
+                float(muscle_total[row]) * features['avg_weight'] * features['avg_reps']
+            )
+            outcomes[index] = features
+        
+        return outcomes
+    
+    @staticmethod
+    def _flatten_exercises(exercises: List[Dict]) -> tuple:
+        """Aplana los sets completados de una sesión en columnas y lista sus grupos musculares"""
+        weights, reps, rests, muscles = [], [], [], []
+        for ex in exercises:
+            muscles.append(ex.get("muscleGroup", "").strip().upper())
+            for s in ex.get("sets", []):
+                if s.get("completed", True):  # solo incluir sets completados
+                    # Un envoltorio sin convertir falla la sesión en lugar de contar como 0
+                    weights.append(float(s.get("weight", 0)))
+                    reps.append(float(s.get("reps", 0)))
+                    rests.append(float(s.get("restTime", 0)))
+        return (np.array(weights, dtype=float), np.array(reps, dtype=float),
+                np.array(rests, dtype=float), muscles)
+    
+    @staticmethod
+    def _grouped_mean_std(values: np.ndarray, offsets: np.ndarray, counts: np.ndarray) -> tuple:
+        """
+        Media y desviación estándar por sesión, redondeadas a 2 decimales
+        
+        Usa np.add.reduceat sobre los segmentos contiguos, que suma igual que
+        np.mean/np.std sobre cada sesión. Las sesiones sin sets quedan en 0.
+        """
+        means = np.zeros(len(counts))
+        stds = np.zeros(len(counts))
+        has_sets = counts > 0
+        if has_sets.any():
+            seg_offsets = offsets[has_sets]
+            seg_counts = counts[has_sets]
+            seg_means = np.add.reduceat(values, seg_offsets) / seg_counts
+            deviations = values - np.repeat(seg_means, seg_counts)
+            seg_vars = np.add.reduceat(deviations * deviations, seg_offsets) / seg_counts
+            means[has_sets] = seg_means
+            stds[has_sets] = np.sqrt(seg_vars)
+        return np.round(means, 2), np.round(stds, 2)
+    
+    @staticmethod
+    def _grouped_sequential_sum(values: np.ndarray, offsets: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Suma por sesión en orden secuencial (igual que sum() de Python), vectorizada entre sesiones"""
+        totals = np.zeros(len(counts))
+        for k in range(int(counts.max()) if len(counts) else 0):
+            active = counts > k
+            totals[active] += values[offsets[active] + k]
+        return totals
+    
+    @classmethod
+    def to_model_array(cls, features: Dict) -> np.ndarray:
+        """Construye el vector de características en el orden que espera el modelo"""
+        return np.array([features[name] for name in cls.MODEL_FEATURES], dtype=float)
+    
+    @staticmethod
+    def extract_progression_features(session_data: Dict, progression_index: Any) -> Dict[str, float]:
+        """
+        Características opcionales de progresión de los ejercicios de la sesión
+        
+        Se calculan con el historial anterior a la sesión (ProgressionIndex) y
+        no forman parte de MODEL_FEATURES.
+        
+        Returns:
+            Dict: Cambio relativo medio a 30 días de los ejercicios con
+            tendencia y número de ejercicios en retroceso
+        """
+        user_id = session_data.get("userId")
+        if isinstance(user_id, dict):
+            user_id = user_id.get("$oid")
+        trends = []
+        for exercise in session_data.get("exercises", []):
+            trend = progression_index.trend(str(user_id), str(exercise.get("name", "")).strip())
+            if trend is not None and trend["relative_change_30_days"] is not None:
+                trends.append(trend)
+        return {
+            "progression_trend_30d": (
+                round(float(np.mean([t["relative_change_30_days"] for t in trends])), 4) if trends else 0.0
+            ),
+            "regressing_exercises": sum(1 for t in trends if t["trend"] == "retrocediendo"),
+        }
+    
+    @staticmethod
+    def build_session_summary(features: Dict) -> Dict[str, Any]:
+        """Crea el resumen de sesión que acompaña a la predicción"""
+        return {
+            "total_volume": features.get('total_volume', 0),
+            "intensity_index": features.get('intensity_index', 0),
+            "muscle_groups_count": features.get('muscle_groups_count', 0),
+            "dominant_muscle_group": features.get('dominant_muscle_group', 'N/A')
+        } 
\ No newline at end of file
@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (es_anomalia, score, atribuciones por característica o None)
+MemoEntry = Tuple[bool, float, Optional[np.ndarray]]
+
+
+class FeatureMemo:
+    """
+    Memo acotado (LRU) de vector de características → (es_anomalia, score, atribuciones)
+
+    La clave son los bytes del vector sin escalar de las características del
+    modelo: el scaler y el bosque son deterministas, así que dos sesiones con
+    el mismo vector (misma rutina, distinto `_id` o fecha) tienen el mismo
+    resultado y la segunda no necesita escalar ni recorrer el bosque.
+    Las atribuciones por característica son None si la fila se puntuó sin
+    ellas. El memo pertenece al AnomalyPredictor y se descarta junto con el modelo.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, MemoEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def keys(features: np.ndarray) -> List[bytes]:
+        """Clave de cada fila de una matriz float64 contigua"""
+        # Sumar 0.0 convierte -0.0 en 0.0 para que ambos compartan clave
+        features = np.ascontiguousarray(features, dtype=np.float64) + 0.0
+        return [row.tobytes() for row in features]
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[MemoEntry]]:
+        """Busca varias claves; None en las posiciones sin resultado memorizado"""
+        found: List[Optional[MemoEntry]] = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                found.append(entry)
+            hits = sum(entry is not None for entry in found)
+            self.hits += hits
+            self.misses += len(found) - hits
+        return found
+
+    def set_many(self, items: List[Tuple[bytes, MemoEntry]]) -> None:
+        """Guarda varios resultados desalojando los menos usados recientemente"""
+        with self._lock:
+            for key, result in items:
+                self._entries[key] = result
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos y fallos de este proceso"""
+        with self._lock:
+            hits, misses, evictions, entries = self.hits, self.misses, self.evictions, len(self._entries)
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": evictions,
+        }
@@ -0,0 +1,472 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.models.session_models import BatchPredictionItem, BatchPredictionResponse
+from app.services.executor import PredictionExecutor, ExecutorSaturatedError
+from app.services.metrics import observe_predictions
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# (id del trabajo, sesiones)
+ClaimedJob = Tuple[str, List[Any]]
+
+
+class JobStore:
+    """
+    Cola persistente de trabajos de scoring en SQLite
+
+    Cada trabajo guarda sus sesiones hasta terminar y después su resultado
+    (un BatchPredictionResponse en JSON). Un trabajo tomado por un worker
+    queda en `running` con un plazo (`lease_seconds`): si el proceso muere
+    antes de terminarlo, al vencer el plazo vuelve a estar disponible, así
+    que los trabajos pendientes sobreviven a un reinicio. La toma de trabajos
+    es una transacción `BEGIN IMMEDIATE`, de modo que varios procesos (workers
+    pre-fork) pueden vaciar la misma cola sin tomar dos veces el mismo trabajo.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 120.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Conexión temporal: la del hilo principal no debe heredarse en los workers pre-fork
+        with sqlite3.connect(path, timeout=10.0, isolation_level=None) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL, "
+                "sessions TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_until REAL, "
+                "callback_url TEXT, callback_status TEXT, callback_attempts INTEGER NOT NULL DEFAULT 0, "
+                "callback_error TEXT)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+        connection.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def enqueue(self, sessions: List[Any], callback_url: Optional[str] = None) -> str:
+        """Guarda un trabajo nuevo y devuelve su id"""
+        job_id = uuid.uuid4().hex
+        self._connection().execute(
+            "INSERT INTO jobs (id, status, total, sessions, created_at, callback_url, callback_status) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, len(sessions), json.dumps(sessions), time.time(),
+             callback_url, "pending" if callback_url else None)
+        )
+        return job_id
+
+    def claim(self, max_sessions: int) -> List[ClaimedJob]:
+        """
+        Toma los trabajos pendientes más antiguos hasta sumar `max_sessions` sesiones
+
+        Siempre toma al menos un trabajo si hay alguno, aunque tenga más
+        sesiones que `max_sessions`. Los trabajos cuyo plazo venció (su worker
+        murió) se vuelven a tomar mientras les queden intentos; los que agotaron
+        `max_attempts` los marca como fallidos `fail_expired`.
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, total, sessions FROM jobs "
+                "WHERE status = ? OR (status = ? AND lease_until < ? AND attempts < ?) ORDER BY created_at LIMIT ?",
+                (QUEUED, RUNNING, now, self.max_attempts, max(max_sessions, 1))
+            ).fetchall()
+            claimed: List[ClaimedJob] = []
+            count = 0
+            for job_id, total, sessions in rows:
+                if claimed and count + total > max_sessions:
+                    break
+                claimed.append((job_id, json.loads(sessions)))
+                count += total
+            connection.executemany(
+                "UPDATE jobs SET status = ?, started_at = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(RUNNING, now, now + self.lease_seconds, job_id) for job_id, _ in claimed]
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return claimed
+
+    def fail_expired(self) -> List[str]:
+        """Marca como fallidos los trabajos interrumpidos `max_attempts` veces y devuelve sus ids"""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id FROM jobs WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (RUNNING, now, self.max_attempts)
+            ).fetchall()
+            job_ids = [job_id for job_id, in rows]
+            connection.executemany(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, sessions = NULL, lease_until = NULL "
+                "WHERE id = ?",
+                [(FAILED, "El trabajo se interrumpió demasiadas veces", now, job_id) for job_id in job_ids]
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return job_ids
+
+    def complete(self, job_id: str, response: BatchPredictionResponse) -> None:
+        """Guarda el resultado y descarta las sesiones del trabajo"""
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, sessions = NULL, finished_at = ?, lease_until = NULL "
+            "WHERE id = ?",
+            (DONE, response.model_dump_json(), time.time(), job_id)
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._connection().execute(
+            "UPDATE jobs SET status = ?, error = ?, sessions = NULL, finished_at = ?, lease_until = NULL "
+            "WHERE id = ?",
+            (FAILED, error, time.time(), job_id)
+        )
+
+    def extend_lease(self, job_ids: List[str]) -> None:
+        """Renueva el plazo de trabajos tomados que siguen en curso (p. ej. esperando al executor)"""
+        self._connection().executemany(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = ?",
+            [(time.time() + self.lease_seconds, job_id, RUNNING) for job_id in job_ids]
+        )
+
+    def release(self, job_ids: List[str]) -> None:
+        """Devuelve a la cola trabajos tomados que no se terminaron (apagado ordenado)"""
+        self._connection().executemany(
+            "UPDATE jobs SET status = ?, lease_until = NULL, attempts = attempts - 1 WHERE id = ? AND status = ?",
+            [(QUEUED, job_id, RUNNING) for job_id in job_ids]
+        )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado del trabajo con su resultado (texto JSON) si terminó; None si no existe"""
+        row = self._connection().execute(
+            "SELECT id, status, total, result, error, attempts, created_at, started_at, finished_at, "
+            "callback_url, callback_status, callback_attempts, callback_error FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("job_id", "status", "total", "result", "error", "attempts", "created_at", "started_at",
+                "finished_at", "callback_url", "callback_status", "callback_attempts", "callback_error")
+        return dict(zip(keys, row))
+
+    def pending_callbacks(self) -> List[str]:
+        """Trabajos terminados cuyo callback todavía no se entregó"""
+        rows = self._connection().execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND callback_status = 'pending'", (DONE, FAILED)
+        ).fetchall()
+        return [job_id for job_id, in rows]
+
+    def record_callback(self, job_id: str, status: str, attempts: int, error: Optional[str] = None) -> None:
+        self._connection().execute(
+            "UPDATE jobs SET callback_status = ?, callback_attempts = ?, callback_error = ? WHERE id = ?",
+            (status, attempts, error, job_id)
+        )
+
+    def purge(self, older_than: float) -> int:
+        """Borra los trabajos terminados antes de `older_than` (epoch); devuelve cuántos"""
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ? "
+            "AND (callback_status IS NULL OR callback_status != 'pending')",
+            (DONE, FAILED, older_than)
+        )
+        return max(cursor.rowcount, 0)
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+
+class JobRunner:
+    """
+    Vacía la cola de trabajos en segundo plano
+
+    `workers` tareas del event loop toman trabajos en lotes de hasta
+    `batch_size` sesiones (varios trabajos pequeños se puntúan juntos con una
+    sola llamada a ScoringPipeline.score_sessions) a través del mismo executor
+    que las peticiones síncronas. Si el executor está saturado, el lote
+    espera: las peticiones síncronas tienen prioridad. Un aviso de `notify`
+    despierta a los workers al encolar; `poll_interval` cubre los trabajos
+    encolados por otros procesos. Al terminar un trabajo con `callback_url`
+    se le envía el resultado por POST, con reintentos.
+    """
+
+    # Segundos entre reintentos del callback (se duplica en cada intento)
+    CALLBACK_BACKOFF = 1.0
+
+    def __init__(self, store: JobStore, executor: PredictionExecutor, workers: int = 2,
+                 batch_size: int = 256, poll_interval: float = 1.0, result_ttl: float = 86400.0):
+        self.store = store
+        self.executor = executor
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._callbacks: Set[asyncio.Task] = set()
+        self._claimed: Set[str] = set()
+        self._last_purge = 0.0
+
+        # Métricas de este proceso
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.sessions_scored = 0
+        self.batches = 0
+        self.callbacks_delivered = 0
+        self.callbacks_failed = 0
+
+    def start(self) -> None:
+        """Arranca los workers en el event loop actual y reenvía los callbacks pendientes"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._resume_callbacks()))
+
+    async def stop(self) -> None:
+        """Detiene los workers y devuelve a la cola los trabajos que no terminaron"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._claimed:
+            self.store.release(list(self._claimed))
+            self._claimed.clear()
+        for task in self._callbacks:
+            task.cancel()
+        await asyncio.gather(*self._callbacks, return_exceptions=True)
+
+    async def _resume_callbacks(self) -> None:
+        for job_id in await asyncio.to_thread(self.store.pending_callbacks):
+            self._schedule_callback(job_id)
+
+    def notify(self) -> None:
+        """Avisa a los workers de que hay trabajos nuevos"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            # Su callback se envía desde el proceso que los marca como fallidos
+            for job_id in await asyncio.to_thread(self.store.fail_expired):
+                self.jobs_failed += 1
+                self._schedule_callback(job_id)
+            jobs = await asyncio.to_thread(self.store.claim, self.batch_size)
+            if not jobs:
+                await self._purge()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._claimed.update(job_id for job_id, _ in jobs)
+            try:
+                await self._process(jobs)
+            finally:
+                self._claimed.difference_update(job_id for job_id, _ in jobs)
+
+    async def _process(self, jobs: List[ClaimedJob]) -> None:
+        sessions = [session for _, job_sessions in jobs for session in job_sessions]
+        leased_at = time.monotonic()
+        while True:
+            try:
+                items = await self.executor.run("score_sessions", sessions)
+                break
+            except ExecutorSaturatedError:
+                # Mientras espera al executor el trabajo sigue tomado: sin renovar el plazo,
+                # otro worker lo volvería a tomar y gastaría uno de sus intentos
+                if time.monotonic() - leased_at >= self.store.lease_seconds / 2:
+                    await asyncio.to_thread(self.store.extend_lease, [job_id for job_id, _ in jobs])
+                    leased_at = time.monotonic()
+                await asyncio.sleep(0.05)
+            except Exception as e:
+                for job_id, _ in jobs:
+                    await asyncio.to_thread(self.store.fail, job_id, f"Error interno del servidor: {str(e)}")
+                    self.jobs_failed += 1
+                    self._schedule_callback(job_id)
+                return
+
+        self.batches += 1
+        self.sessions_scored += len(sessions)
+        observe_predictions([item.result for item in items])
+        start = 0
+        for job_id, job_sessions in jobs:
+            job_items = items[start:start + len(job_sessions)]
+            start += len(job_sessions)
+            for offset, item in enumerate(job_items):
+                item.index = offset  # posición dentro del trabajo, no del lote
+            failed = sum(1 for item in job_items if item.error is not None)
+            response = BatchPredictionResponse(
+                total=len(job_items), succeeded=len(job_items) - failed, failed=failed, results=job_items
+            )
+            await asyncio.to_thread(self.store.complete, job_id, response)
+            self.jobs_completed += 1
+            self._schedule_callback(job_id)
+
+    async def _purge(self) -> None:
+        now = time.time()
+        if now - self._last_purge >= 60:
+            self._last_purge = now
+            await asyncio.to_thread(self.store.purge, now - self.result_ttl)
+
+    def _schedule_callback(self, job_id: str) -> None:
+        task = asyncio.create_task(self._deliver_callback(job_id))
+        self._callbacks.add(task)
+        task.add_done_callback(self._callbacks.discard)
+
+    async def _deliver_callback(self, job_id: str) -> None:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None or not job["callback_url"] or job["callback_status"] != "pending":
+            return
+        body = job_document(job).encode()
+        error = None
+        for attempt in range(job["callback_attempts"] + 1, settings.JOBS_CALLBACK_MAX_ATTEMPTS + 1):
+            try:
+                await asyncio.to_thread(post_callback, job["callback_url"], body)
+                await asyncio.to_thread(self.store.record_callback, job_id, "delivered", attempt)
+                self.callbacks_delivered += 1
+                return
+            except Exception as e:
+                error = callback_error_message(e)
+                await asyncio.to_thread(self.store.record_callback, job_id, "pending", attempt, error)
+                if attempt < settings.JOBS_CALLBACK_MAX_ATTEMPTS:
+                    await asyncio.sleep(self.CALLBACK_BACKOFF * 2 ** (attempt - 1))
+        await asyncio.to_thread(
+            self.store.record_callback, job_id, "failed", settings.JOBS_CALLBACK_MAX_ATTEMPTS, error
+        )
+        self.callbacks_failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Trabajos por estado (de todos los procesos) y contadores de este proceso"""
+        return {
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "jobs": self.store.counts(),
+            "jobs_completed": self.jobs_completed,
+            "jobs_failed": self.jobs_failed,
+            "sessions_scored": self.sessions_scored,
+            "batches": self.batches,
+            "callbacks_delivered": self.callbacks_delivered,
+            "callbacks_failed": self.callbacks_failed,
+            "callbacks_in_flight": len(self._callbacks),
+        }
+
+
+def job_document(job: Dict[str, Any], exclude_result: Any = None) -> str:
+    """
+    JSON del estado de un trabajo, con el resultado incrustado si terminó
+
+    Args:
+        job: Fila devuelta por JobStore.get
+        exclude_result: Campos a omitir del resultado (como en `model_dump_json(exclude=...)`)
+    """
+    document = {key: value for key, value in job.items() if key not in ("result", "callback_url")}
+    result = job["result"]
+    if result is not None and exclude_result is not None:
+        result = BatchPredictionResponse.model_validate_json(result).model_dump_json(exclude=exclude_result)
+    # El resultado ya es JSON: se incrusta sin volver a decodificarlo
+    return json.dumps(document)[:-1] + f', "result": {result if result is not None else "null"}}}'
+
+
+class CallbackRejectedError(Exception):
+    """El callback no se envía o su respuesta no es 2xx (el mensaje se puede mostrar al cliente)"""
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Sin redirecciones: un host permitido no puede desviar el callback a otro"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def callback_allowed(url: str) -> bool:
+    """Si el host de `url` está en JOBS_CALLBACK_ALLOWED_HOSTS (vacío = ninguno)"""
+    allowed = {host.strip().lower() for host in settings.JOBS_CALLBACK_ALLOWED_HOSTS.split(",") if host.strip()}
+    host = urllib.parse.urlsplit(url).hostname
+    return host is not None and host.lower() in allowed
+
+
+def callback_error_message(error: Exception) -> str:
+    """
+    Error de un intento de callback tal como se guarda y se muestra en GET /jobs/{id}
+
+    Solo se informa el código HTTP que respondió el host permitido; los errores
+    de conexión (DNS, rechazo, timeout) se reducen a un mensaje genérico para no
+    revelar nada de la red del servicio.
+    """
+    if isinstance(error, urllib.error.HTTPError):
+        return f"El callback respondió {error.code}"
+    if isinstance(error, CallbackRejectedError):
+        return str(error)
+    return "No se pudo conectar con el callback"
+
+
+def post_callback(url: str, body: bytes) -> None:
+    """
+    Envía el resultado al callback del trabajo; lanza una excepción si no responde 2xx
+
+    Con JOBS_CALLBACK_SECRET, la cabecera X-Signature lleva el HMAC-SHA256 del cuerpo.
+    El host se vuelve a comprobar al enviar (JOBS_CALLBACK_ALLOWED_HOSTS puede haber
+    cambiado desde que se encoló) y no se siguen redirecciones.
+    """
+    if not callback_allowed(url):
+        raise CallbackRejectedError("El host del callback no está en JOBS_CALLBACK_ALLOWED_HOSTS")
+    headers = {"Content-Type": "application/json"}
+    if settings.JOBS_CALLBACK_SECRET:
+        signature = hmac.new(settings.JOBS_CALLBACK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+        headers["X-Signature"] = f"sha256={signature}"
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    with _callback_opener.open(request, timeout=settings.JOBS_CALLBACK_TIMEOUT_SECONDS) as response:
+        if not 200 <= response.status < 300:
+            raise CallbackRejectedError(f"El callback respondió {response.status}")
+
+
+def create_job_runner(executor: PredictionExecutor) -> Optional[JobRunner]:
+    """Crea la cola persistente y su runner con la configuración de Settings (None si está desactivada)"""
+    if not settings.JOBS_ENABLED:
+        return None
+    store = JobStore(settings.JOBS_PATH, settings.JOBS_LEASE_SECONDS, settings.JOBS_MAX_ATTEMPTS)
+    return JobRunner(
+        store,
+        executor,
+        workers=settings.JOBS_WORKERS,
+        batch_size=settings.JOBS_BATCH_SIZE,
+        poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+        result_ttl=settings.JOBS_RESULT_TTL_SECONDS
+    )
@@ -0,0 +1,260 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.config import settings
+
+# Límites superiores de los buckets de cada histograma (segundos o score)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# score_samples del bosque: más bajo = más anómalo (el umbral del modelo ronda -0.55)
+RISK_SCORE_BUCKETS = (-0.8, -0.75, -0.7, -0.65, -0.6, -0.55, -0.5, -0.45, -0.4, -0.35, -0.3)
+RISK_SCORE_QUANTILES = (0.5, 0.9, 0.99)
+
+LabelValues = Tuple[str, ...]
+GaugeValue = Union[float, Dict[LabelValues, float]]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Contador acumulado por combinación de etiquetas"""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma de buckets fijos por combinación de etiquetas"""
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        # etiquetas -> [conteo por bucket (el último es +Inf)..., suma]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self._series[label_values] = series
+            series[bucket] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(label_values, list(values)) for label_values, values in self._series.items()]
+        for label_values, values in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), values[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Valor instantáneo calculado al exportar las métricas"""
+
+    def __init__(self, name: str, help: str, read: Callable[[], GaugeValue], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labels = labels
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        value = self.read()
+        values = value if isinstance(value, dict) else {(): value}
+        for label_values, number in values.items():
+            if number is not None:
+                lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(number)}")
+        return lines
+
+
+class _Span:
+    """Mide la duración de un bloque y la registra en el histograma de etapas"""
+    __slots__ = ("histogram", "stage", "start")
+
+    def __init__(self, histogram: Histogram, stage: str):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, self.stage)
+
+
+class MetricsRegistry:
+    """
+    Métricas del servicio en el formato de texto de Prometheus
+
+    Contadores e histogramas de las peticiones HTTP (por método, ruta y
+    estado), histograma de duración de cada etapa del scoring, y
+    distribución de los scores. La tasa de anomalías y los cuantiles del
+    score se calculan sobre las últimas `window_size` predicciones.
+    Registrar una observación cuesta un `bisect` y un lock; el texto se
+    genera solo cuando se consulta /metrics.
+    """
+
+    def __init__(self, window_size: int = 1000, namespace: str = "anomaly"):
+        self.namespace = namespace
+        self.requests = Counter(f"{namespace}_http_requests_total", "Peticiones HTTP atendidas",
+                                ("method", "route", "status"))
+        self.request_errors = Counter(f"{namespace}_http_request_errors_total",
+                                      "Peticiones HTTP con error del servidor (5xx o excepción)",
+                                      ("method", "route"))
+        self.request_duration = Histogram(f"{namespace}_http_request_duration_seconds",
+                                          "Latencia de las peticiones HTTP", REQUEST_BUCKETS, ("method", "route"))
+        self.stage_duration = Histogram(f"{namespace}_stage_duration_seconds",
+                                        "Duración de cada etapa del scoring por llamada", STAGE_BUCKETS, ("stage",))
+        self.predictions = Counter(f"{namespace}_predictions_total", "Predicciones devueltas por tipo",
+                                   ("prediction", "anomaly_type"))
+        self.risk_score = Histogram(f"{namespace}_risk_score", "Distribución del risk_score de las predicciones",
+                                    RISK_SCORE_BUCKETS)
+        self._window: "deque[Tuple[bool, float]]" = deque(maxlen=window_size)
+        self._gauges: List[Gauge] = [
+            Gauge(f"{namespace}_anomaly_rate", f"Fracción de anomalías en las últimas {window_size} predicciones",
+                  self._anomaly_rate),
+            Gauge(f"{namespace}_risk_score_window",
+                  f"Cuantiles del risk_score en las últimas {window_size} predicciones",
+                  self._risk_score_quantiles, ("quantile",)),
+        ]
+
+    def span(self, stage: str) -> ContextManager:
+        return _Span(self.stage_duration, stage)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        self.requests.inc(method, route, str(status))
+        self.request_duration.observe(seconds, method, route)
+        if status >= 500:
+            self.request_errors.inc(method, route)
+
+    def observe_prediction(self, prediction: str, anomaly_type: str, risk_score: float) -> None:
+        self.predictions.inc(prediction, anomaly_type)
+        self.risk_score.observe(risk_score)
+        self._window.append((prediction != "Normal", risk_score))
+
+    def add_gauge(self, name: str, help: str, read: Callable[[], GaugeValue], labels: Tuple[str, ...] = ()) -> None:
+        """Registra un gauge cuyo valor se lee (con `read`) al exportar"""
+        self._gauges.append(Gauge(f"{self.namespace}_{name}", help, read, labels))
+
+    def _anomaly_rate(self) -> Optional[float]:
+        window = list(self._window)
+        return sum(is_anomaly for is_anomaly, _ in window) / len(window) if window else None
+
+    def _risk_score_quantiles(self) -> Dict[LabelValues, float]:
+        scores = [score for _, score in list(self._window)]
+        if not scores:
+            return {}
+        return {
+            (str(q),): float(value)
+            for q, value in zip(RISK_SCORE_QUANTILES, np.quantile(scores, RISK_SCORE_QUANTILES))
+        }
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (self.requests, self.request_errors, self.request_duration, self.stage_duration,
+                       self.predictions, self.risk_score, *self._gauges):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def create_metrics() -> Optional[MetricsRegistry]:
+    """Crea el registro de métricas con la configuración de Settings (None si está desactivado)"""
+    if not settings.METRICS_ENABLED:
+        return None
+    return MetricsRegistry(window_size=settings.METRICS_WINDOW_SIZE)
+
+
+# Registro del proceso; None con METRICS_ENABLED=false
+metrics = create_metrics()
+
+_NO_SPAN = nullcontext()
+
+# Momento en que el middleware recibió la petición en curso
+request_started: ContextVar[Optional[float]] = ContextVar("request_started", default=None)
+
+
+def span(stage: str) -> ContextManager:
+    """
+    Mide la duración de una etapa del scoring
+
+    Con las métricas desactivadas devuelve un contexto vacío compartido, así
+    que instrumentar una etapa no cuesta más que una comprobación.
+    """
+    if metrics is None or not settings.METRICS_STAGE_TIMING:
+        return _NO_SPAN
+    return metrics.span(stage)
+
+
+def observe_since_request(stage: str) -> None:
+    """
+    Registra como etapa el tiempo transcurrido desde que llegó la petición
+
+    Llamado al entrar a un endpoint mide la lectura del cuerpo y la
+    validación de pydantic, que FastAPI hace antes de llamar al endpoint.
+    """
+    if metrics is None or not settings.METRICS_STAGE_TIMING:
+        return
+    started = request_started.get()
+    if started is not None:
+        metrics.stage_duration.observe(time.perf_counter() - started, stage)
+
+
+def observe_predictions(results: List[Any]) -> None:
+    """Registra el tipo y el score de predicciones devueltas (ignora los None)"""
+    if metrics is None:
+        return
+    for result in results:
+        if result is not None:
+            metrics.observe_prediction(result.prediction, result.anomaly_type, result.risk_score)
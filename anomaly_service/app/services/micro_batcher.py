@@ -0,0 +1,164 @@
+import asyncio
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.models.session_models import AnomalyPredictionResponse
+from app.services.executor import PredictionExecutor, ExecutorSaturatedError
+
+# (sesión, es_extended_json, futuro del llamador)
+PendingRequest = Tuple[Dict[str, Any], bool, asyncio.Future]
+
+
+class MicroBatcher:
+    """
+    Agrupa predicciones de sesiones individuales concurrentes en un solo lote
+
+    Cada petición se encola con su propio futuro. Una tarea en segundo plano
+    vacía la cola como una sola matriz a través de ScoringPipeline.predict_sessions
+    cuando hay `max_batch_size` peticiones o han pasado `max_wait_ms` desde la
+    primera, lo que ocurra antes. Es adaptativo: si no hay ningún lote en curso
+    y la cola está vacía, la petición se despacha de inmediato para no añadir
+    latencia con poca carga; bajo carga las peticiones se acumulan mientras el
+    lote anterior se puntúa.
+    """
+
+    # Límites superiores de los buckets del histograma de tamaños de lote
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+    def __init__(self, executor: PredictionExecutor, max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0, max_pending: int = 1024):
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+        # Métricas
+        self._requests = 0
+        self._batched_requests = 0
+        self._batches = 0
+        self._flush_reasons: Counter = Counter()
+        self._batch_size_histogram: Counter = Counter()
+        self._max_queue_depth = 0
+
+    def start(self) -> None:
+        """Arranca la tarea de vaciado en el event loop actual (idempotente)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Detiene la tarea de vaciado y espera a los lotes en curso"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        # Las peticiones que quedaron en cola no se van a procesar
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(ExecutorSaturatedError("Servicio deteniéndose"))
+
+    async def submit(self, session_data: Dict[str, Any], extended_json: bool) -> AnomalyPredictionResponse:
+        """
+        Encola una sesión y espera su predicción
+
+        Args:
+            session_data: Sesión como diccionario
+            extended_json: Si la sesión viene en formato MongoDB Extended JSON
+
+        Returns:
+            AnomalyPredictionResponse: Predicción de esta sesión
+
+        Raises:
+            ExecutorSaturatedError: Si hay demasiadas peticiones esperando
+        """
+        self.start()
+        if self._queue.qsize() >= self.max_pending:
+            raise ExecutorSaturatedError(
+                f"Servicio saturado: {self._queue.qsize()} peticiones esperando lote"
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((session_data, extended_json, future))
+        self._requests += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[PendingRequest] = [await self._queue.get()]
+
+            if self._flushes or not self._queue.empty():
+                deadline = loop.time() + self.max_wait
+                reason = "timeout"
+                while len(batch) < self.max_batch_size:
+                    if not self._queue.empty():
+                        batch.append(self._queue.get_nowait())
+                        continue
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    reason = "size"
+            else:
+                reason = "idle"
+
+            self._record_batch(len(batch), reason)
+            flush = loop.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: List[PendingRequest]) -> None:
+        sessions = [session_data for session_data, _, _ in batch]
+        flags = [extended_json for _, extended_json, _ in batch]
+        try:
+            outcomes = await self.executor.run("predict_sessions", sessions, flags)
+        except Exception as e:
+            outcomes = [e] * len(batch)
+
+        for (_, _, future), outcome in zip(batch, outcomes):
+            if future.done():  # el llamador canceló la petición
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def _record_batch(self, size: int, reason: str) -> None:
+        self._batches += 1
+        self._batched_requests += size
+        self._flush_reasons[reason] += 1
+        bucket = next((b for b in self.BATCH_SIZE_BUCKETS if size <= b), "+Inf")
+        self._batch_size_histogram[bucket] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas del scheduler: profundidad de cola y distribución de tamaños de lote"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "batches_in_flight": len(self._flushes),
+            "requests": self._requests,
+            "batches": self._batches,
+            "avg_batch_size": self._batched_requests / self._batches if self._batches else 0.0,
+            "flush_reasons": dict(self._flush_reasons),
+            "batch_size_histogram": {
+                str(bucket): self._batch_size_histogram.get(bucket, 0)
+                for bucket in (*self.BATCH_SIZE_BUCKETS, "+Inf")
+            },
+        }
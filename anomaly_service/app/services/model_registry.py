@@ -0,0 +1,298 @@
+import asyncio
+import json
+import os
+import time
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.anomaly_predictor import AnomalyPredictor
+from app.services.feature_extractor import FeatureExtractor
+from app.utils.session_stream import iter_sessions
+
+# Versión que corresponde a MODEL_PATH / SCALER_PATH (fuera del registro)
+DEFAULT_VERSION = "default"
+
+MODEL_FILE = "modelo_isolation.pkl"
+SCALER_FILE = "scaler.pkl"
+COMPILED_FILE = "compiled_forest.joblib"
+WARMUP_FILE = "warmup_sessions.json"
+ACTIVE_FILE = "ACTIVE"
+
+
+class ModelRegistry:
+    """
+    Directorio de versiones del modelo
+
+    Estructura:
+        <root>/<versión>/modelo_isolation.pkl
+        <root>/<versión>/scaler.pkl
+        <root>/<versión>/compiled_forest.joblib   (generado por el motor compilado)
+        <root>/<versión>/warmup_sessions.json     (opcional: muestra de calentamiento)
+        <root>/ACTIVE                             (versión activa)
+
+    La versión "default" corresponde a MODEL_PATH y SCALER_PATH, de modo que
+    el servicio sigue funcionando sin registro.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.root, version)
+
+    def list_versions(self) -> List[str]:
+        """Versiones del registro con modelo y scaler completos, en orden alfabético"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".")
+            and os.path.isfile(os.path.join(self.root, name, MODEL_FILE))
+            and os.path.isfile(os.path.join(self.root, name, SCALER_FILE))
+        )
+
+    def exists(self, version: str) -> bool:
+        if version == DEFAULT_VERSION:
+            return os.path.isfile(settings.MODEL_PATH) and os.path.isfile(settings.SCALER_PATH)
+        return version in self.list_versions()
+
+    def active_version(self) -> str:
+        """Versión configurada: MODEL_VERSION, si no el archivo ACTIVE, si no "default" """
+        if settings.MODEL_VERSION:
+            return settings.MODEL_VERSION
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or DEFAULT_VERSION
+        except FileNotFoundError:
+            return DEFAULT_VERSION
+
+    def set_active(self, version: str) -> None:
+        """Persiste la versión activa (reemplazo atómico del archivo ACTIVE)"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, ACTIVE_FILE)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(version)
+        os.replace(temp_path, path)
+
+    def metadata(self, version: str) -> Dict[str, Any]:
+        """Contenido de metadata.json de la versión, si existe"""
+        try:
+            with open(os.path.join(self.version_dir(version), "metadata.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def warmup_path(self, version: str) -> str:
+        """Muestra de calentamiento de la versión, o MODEL_WARMUP_PATH si no trae una propia"""
+        if version != DEFAULT_VERSION:
+            path = os.path.join(self.version_dir(version), WARMUP_FILE)
+            if os.path.isfile(path):
+                return path
+        return settings.MODEL_WARMUP_PATH
+
+    def create_predictor(self, version: str, scoring_engine: Optional[str] = None,
+                         load: bool = True) -> AnomalyPredictor:
+        """
+        Crea un AnomalyPredictor para una versión del registro
+
+        Raises:
+            ValueError: Si la versión no existe
+        """
+        if version == DEFAULT_VERSION:
+            return AnomalyPredictor(scoring_engine, model_version=version, load=load)
+        if version not in self.list_versions():
+            raise ValueError(f"Versión de modelo desconocida: {version}")
+        directory = self.version_dir(version)
+        return AnomalyPredictor(
+            scoring_engine,
+            model_path=os.path.join(directory, MODEL_FILE),
+            scaler_path=os.path.join(directory, SCALER_FILE),
+            compiled_path=os.path.join(directory, COMPILED_FILE),
+            model_version=version,
+            load=load
+        )
+
+
+def create_model_registry() -> ModelRegistry:
+    """Crea el registro de modelos con la configuración de Settings"""
+    return ModelRegistry(settings.MODEL_REGISTRY_DIR)
+
+
+class ModelManager:
+    """
+    Carga versiones del modelo en segundo plano y las activa sin cortar el servicio
+
+    El nuevo predictor se carga y se calienta con un lote de muestra en un
+    hilo aparte; solo si el calentamiento es correcto se reemplaza
+    `pipeline.anomaly_predictor` con una única asignación. Las peticiones en
+    curso terminan con el predictor que tomaron al empezar.
+    """
+
+    def __init__(self, pipeline: Any, registry: ModelRegistry):
+        self.pipeline = pipeline
+        self.registry = registry
+        self.loading_version: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.activated_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+        # Última versión del watcher que no se pudo activar (no se reintenta hasta que cambie ACTIVE)
+        self._failed_version: Optional[str] = None
+
+    @property
+    def active_version(self) -> str:
+        return self.pipeline.anomaly_predictor.model_version
+
+    def load_active(self) -> None:
+        """Carga de forma síncrona la versión configurada (arranque del servicio)"""
+        predictor = self.registry.create_predictor(
+            self.registry.active_version(), self.pipeline.anomaly_predictor.scoring_engine
+        )
+        self.warm_up(predictor)
+        self.pipeline.anomaly_predictor = predictor
+        self.activated_at = time.time()
+
+    def warm_up(self, predictor: AnomalyPredictor) -> None:
+        """
+        Ejecuta un lote de muestra con el predictor antes de ponerlo en servicio
+
+        Usa las primeras MODEL_WARMUP_SESSIONS sesiones de la muestra de la
+        versión (warmup_sessions.json en su directorio) o de MODEL_WARMUP_PATH,
+        y verifica que los scores sean finitos. Si no hay muestra utilizable
+        usa una matriz sintética y lo avisa en el log.
+
+        Raises:
+            ValueError: Si el modelo no produce scores válidos
+        """
+        feature_extractor = self.pipeline.feature_extractor
+        features = None
+        path = self.registry.warmup_path(predictor.model_version)
+        if os.path.isfile(path):
+            # Solo se leen las sesiones necesarias, no el archivo completo
+            with open(path, encoding="utf-8") as f:
+                sessions = list(islice(iter_sessions(f), settings.MODEL_WARMUP_SESSIONS))
+            rows = [
+                feature_extractor.to_model_array(features_dict)
+                for features_dict in feature_extractor.extract_features_batch(sessions)
+                if not isinstance(features_dict, Exception)
+            ]
+            if rows:
+                features = np.vstack(rows)
+        if features is None:
+            print(f"⚠️ Sin sesiones de muestra válidas en {path}: calentamiento de {predictor.model_version} con datos sintéticos")
+            features = np.ones((settings.MODEL_WARMUP_SESSIONS, len(FeatureExtractor.MODEL_FEATURES)))
+
+        _, scores = predictor.predict_batch(features)
+        if not np.all(np.isfinite(scores)):
+            raise ValueError("El modelo produjo scores no finitos durante el calentamiento")
+
+    async def activate(self, version: str, persist: bool = False) -> None:
+        """
+        Carga, calienta y activa una versión; el predictor actual sigue
+        atendiendo peticiones mientras tanto
+
+        Args:
+            version: Versión del registro (o "default")
+            persist: Si se guarda como versión activa en el archivo ACTIVE
+
+        Raises:
+            ValueError: Si la versión no existe o falla el calentamiento
+        """
+        async with self._lock:
+            self.loading_version = version
+            try:
+                predictor = await asyncio.to_thread(self._prepare, version)
+            except Exception as e:
+                self.last_error = f"{version}: {e}"
+                raise
+            finally:
+                self.loading_version = None
+            # Cambio atómico: una sola asignación de atributo
+            self.pipeline.anomaly_predictor = predictor
+            self.activated_at = time.time()
+            self.last_error = None
+            # Dentro del lock para que el watcher no vea un ACTIVE desactualizado
+            if persist and not settings.MODEL_VERSION:
+                self.registry.set_active(version)
+            print(f"🔄 Modelo activo: {version}")
+
+    def _prepare(self, version: str) -> AnomalyPredictor:
+        predictor = self.registry.create_predictor(version, self.pipeline.anomaly_predictor.scoring_engine)
+        self.warm_up(predictor)
+        return predictor
+
+    def start_activation(self, version: str) -> None:
+        """
+        Inicia la activación de una versión en segundo plano y la persiste como activa
+
+        Raises:
+            ValueError: Si la versión no existe
+            RuntimeError: Si ya hay otra versión cargándose
+        """
+        if not self.registry.exists(version):
+            raise ValueError(f"Versión de modelo desconocida: {version}")
+        if self.loading_version is not None or (self._task is not None and not self._task.done()):
+            raise RuntimeError(f"Ya se está cargando la versión {self.loading_version}")
+        self._task = asyncio.create_task(self._activate_in_background(version))
+
+    async def _activate_in_background(self, version: str) -> None:
+        try:
+            await self.activate(version, persist=True)
+        except Exception as e:
+            print(f"❌ No se pudo activar el modelo {version}: {e}")
+
+    def start_watcher(self, interval_seconds: float) -> None:
+        """Revisa periódicamente el archivo ACTIVE (cambios hechos por otros workers o a mano)"""
+        if interval_seconds > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(interval_seconds))
+
+    async def _watch(self, interval_seconds: float) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            version = self.registry.active_version()
+            if version in (self.active_version, self._failed_version) or self._lock.locked():
+                continue
+            try:
+                await self.activate(version)
+            except Exception as e:
+                self._failed_version = version
+                print(f"❌ No se pudo activar el modelo {version}: {e}")
+
+    async def stop(self) -> None:
+        """Cancela el watcher y espera a la activación en curso, si la hay"""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+        if self._task is not None and not self._task.done():
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def status(self) -> Dict[str, Any]:
+        """Versiones disponibles y estado de la activación"""
+        predictor = self.pipeline.anomaly_predictor
+        versions = self.registry.list_versions()
+        if self.registry.exists(DEFAULT_VERSION):
+            versions = [DEFAULT_VERSION] + versions
+        return {
+            "active_version": predictor.model_version,
+            "model_fingerprint": predictor.model_fingerprint,
+            "scoring_engine": predictor.scoring_engine,
+            "activated_at": self.activated_at,
+            "loading_version": self.loading_version,
+            "last_error": self.last_error,
+            "versions": [
+                {"version": version, "metadata": {
+                    key: value for key, value in self.registry.metadata(version).items()
+                    if key != "drift_reference"  # distribuciones completas: se consultan en /drift
+                }}
+                for version in versions
+            ],
+        }
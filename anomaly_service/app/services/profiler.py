@@ -0,0 +1,185 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import CodeType
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# Funciones donde un hilo está bloqueado esperando trabajo: esas muestras no se cuentan
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+    ("queues.py", "get"),
+}
+
+
+class SamplingProfiler:
+    """
+    Profiler por muestreo de todos los hilos del proceso
+
+    Un hilo en segundo plano toma cada `interval_ms` la pila de cada hilo
+    (`sys._current_frames`) y cuenta cuántas veces aparece cada pila; los
+    hilos bloqueados esperando trabajo se descartan. A diferencia de
+    cProfile, que solo ve el hilo donde se activa, así se capturan tanto el
+    event loop (validación, serialización) como los hilos del executor donde
+    corren la extracción y el scoring. Solo hay coste mientras hay una
+    captura en curso, que termina al completarse `requests` peticiones de
+    predicción o al pasar `max_seconds`.
+    """
+
+    def __init__(self, max_requests: int = 10000, max_seconds: float = 300.0):
+        self.max_requests = max_requests
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: Dict[CodeType, str] = {}
+        self._path_prefixes = sorted({os.path.abspath(p) for p in [os.getcwd(), *sys.path]}, key=len, reverse=True)
+        self._stacks: Counter = Counter()
+        self.target_requests = 0
+        self.requests = 0
+        self.samples = 0
+        self.interval = 0.0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stop_reason: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, requests: int, interval_ms: float = 5.0) -> None:
+        """
+        Empieza una captura de las próximas `requests` peticiones de predicción
+
+        Descarta el perfil de la captura anterior.
+
+        Raises:
+            ValueError: Si `requests` o `interval_ms` están fuera de rango
+            RuntimeError: Si ya hay una captura en curso
+        """
+        if not 1 <= requests <= self.max_requests:
+            raise ValueError(f"requests debe estar entre 1 y {self.max_requests}")
+        if interval_ms < 1:
+            raise ValueError("interval_ms debe ser al menos 1")
+        with self._lock:
+            if self.active:
+                raise RuntimeError("Ya hay una captura de perfil en curso")
+            self._stacks = Counter()
+            self.target_requests = requests
+            self.requests = 0
+            self.samples = 0
+            self.interval = interval_ms / 1000
+            self.started_at = time.time()
+            self.finished_at = None
+            self.stop_reason = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self, reason: str = "detenido") -> None:
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+        self._stop.set()
+
+    def request_finished(self) -> None:
+        """Cuenta una petición de predicción terminada; al llegar al objetivo termina la captura"""
+        if not self.active:
+            return
+        with self._lock:
+            self.requests += 1
+            done = self.requests >= self.target_requests
+        if done:
+            self.stop("peticiones completadas")
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= deadline:
+                self.stop("tiempo máximo alcanzado")
+                break
+            self._sample(own_thread)
+        self.finished_at = time.time()
+
+    def _sample(self, own_thread: int) -> None:
+        stacks: List[Tuple[str, ...]] = []
+        for thread_id, frame in sys._current_frames().items():
+            code = frame.f_code
+            if thread_id == own_thread or (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stacks.append(tuple(reversed(stack)))
+        with self._lock:
+            self._stacks.update(stacks)
+            self.samples += 1
+
+    def _label(self, code: CodeType) -> str:
+        """`ruta/relativa.py:función`, con la ruta relativa al directorio actual o a sys.path"""
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in self._path_prefixes:
+                if filename.startswith(prefix + os.sep):
+                    filename = filename[len(prefix) + 1:]
+                    break
+            label = f"{filename}:{code.co_name}"
+            self._labels[code] = label
+        return label
+
+    def collapsed(self) -> str:
+        """Pilas en formato "collapsed" (una por línea, `a;b;c conteo`), para flamegraph.pl o speedscope"""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in stacks)
+
+    def summary(self, top: int = 30) -> Dict[str, Any]:
+        """Funciones con más muestras propias (en la cima de la pila) y totales (en cualquier nivel)"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        total = sum(count for _, count in stacks)
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, count in stacks:
+            own[stack[-1]] += count
+            for label in set(stack):
+                inclusive[label] += count
+        ranking = lambda counter: [
+            {"function": label, "samples": count, "percent": round(100 * count / total, 2)}
+            for label, count in counter.most_common(top)
+        ]
+        return {**self.status(), "thread_samples": total, "self": ranking(own), "inclusive": ranking(inclusive)}
+
+    def status(self) -> Dict[str, Any]:
+        timestamp = lambda value: (
+            datetime.fromtimestamp(value, timezone.utc).isoformat(timespec="seconds") if value else None
+        )
+        return {
+            "active": self.active,
+            "requests": self.requests,
+            "target_requests": self.target_requests,
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "started_at": timestamp(self.started_at),
+            "finished_at": timestamp(self.finished_at),
+            "stop_reason": self.stop_reason,
+        }
+
+
+def create_profiler() -> Optional[SamplingProfiler]:
+    """Crea el profiler con la configuración de Settings (None si está desactivado)"""
+    if not settings.PROFILING_ENABLED:
+        return None
+    return SamplingProfiler(
+        max_requests=settings.PROFILING_MAX_REQUESTS,
+        max_seconds=settings.PROFILING_MAX_SECONDS
+    )
@@ -0,0 +1,231 @@
+import io
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.mongodb_parser import MongoDBParser
+
+SECONDS_PER_DAY = 86400.0
+
+# Posiciones de las sumas de cada (usuario, ejercicio)
+N, SUM_X, SUM_Y, SUM_XX, SUM_XY, ORIGIN, LAST_X, LAST_Y = range(8)
+
+
+def session_day(date_value: Any) -> Optional[float]:
+    """Fecha de la sesión en días desde epoch (ISO, $date de MongoDB o timestamp en segundos)"""
+    if isinstance(date_value, dict):
+        # {"$date": ...} con milisegundos o fecha ISO -> segundos desde epoch
+        try:
+            date_value = MongoDBParser.decode_value(date_value)
+        except ValueError:
+            return None
+    if isinstance(date_value, str):
+        try:
+            return datetime.fromisoformat(date_value.replace("Z", "+00:00")).timestamp() / SECONDS_PER_DAY
+        except ValueError:
+            return None
+    if isinstance(date_value, (int, float)) and date_value > 0:
+        return float(date_value) / SECONDS_PER_DAY
+    return None
+
+
+def set_weight(value: Any) -> float:
+    """Peso de un set (número o envoltorio de MongoDB); 0.0 si no es convertible"""
+    try:
+        return float(MongoDBParser.decode_value(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def exercise_average_weights(session_data: Dict[str, Any]) -> Dict[str, float]:
+    """Peso medio de los sets de cada ejercicio de la sesión (como en el notebook de entrenamiento)"""
+    averages: Dict[str, float] = {}
+    for exercise in session_data.get("exercises", []):
+        name = str(exercise.get("name", "")).strip()
+        weights = [set_weight(s.get("weight", 0)) for s in exercise.get("sets", [])]
+        if name and weights:
+            averages[name] = sum(weights) / len(weights)
+    return averages
+
+
+class ProgressionIndex:
+    """
+    Tendencia de progresión por (userId, ejercicio) calculada de forma incremental
+
+    Para cada par se guardan las sumas de una regresión lineal del peso medio
+    del ejercicio contra la fecha de la sesión (n, Σx, Σy, Σx², Σxy). Cada
+    sesión puntuada las actualiza en O(sets) y la pendiente se obtiene en
+    O(1), sin recorrer el historial; el orden de llegada de las sesiones no
+    afecta al resultado. x se mide en días desde la primera sesión del par
+    para mantener las sumas bien condicionadas.
+    """
+
+    def __init__(self, min_sessions: int = 3, stall_threshold: float = 0.02,
+                 path: Optional[str] = None, save_every: int = 500):
+        self.min_sessions = min_sessions
+        self.stall_threshold = stall_threshold
+        self.path = path
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._sums: Dict[Tuple[str, str], List[float]] = {}
+        self._exercises_by_user: Dict[str, List[str]] = {}
+        self._last_session: Dict[str, str] = {}
+        self._updates_since_save = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def update(self, session_data: Dict[str, Any], session_id: Optional[str] = None) -> None:
+        """
+        Añade una sesión a las sumas de cada uno de sus ejercicios
+
+        Re-enviar la última sesión de un usuario (mismo `session_id`) no la
+        vuelve a contar.
+        """
+        user_id = session_data.get("userId")
+        if isinstance(user_id, dict):
+            user_id = user_id.get("$oid")
+        day = session_day(session_data.get("date"))
+        if not user_id or day is None:
+            return
+        user_id = str(user_id)
+        averages = exercise_average_weights(session_data)
+
+        with self._lock:
+            if session_id is not None:
+                if self._last_session.get(user_id) == session_id:
+                    return
+                self._last_session[user_id] = session_id
+            for name, average in averages.items():
+                sums = self._sums.get((user_id, name))
+                if sums is None:
+                    sums = [0.0, 0.0, 0.0, 0.0, 0.0, day, day, average]
+                    self._sums[(user_id, name)] = sums
+                    self._exercises_by_user.setdefault(user_id, []).append(name)
+                x = day - sums[ORIGIN]
+                sums[N] += 1
+                sums[SUM_X] += x
+                sums[SUM_Y] += average
+                sums[SUM_XX] += x * x
+                sums[SUM_XY] += x * average
+                if day >= sums[LAST_X]:
+                    sums[LAST_X] = day
+                    sums[LAST_Y] = average
+            self._updates_since_save += 1
+            save = self.path is not None and self._updates_since_save >= self.save_every
+
+        if save:
+            self.save()
+
+    def trend(self, user_id: str, exercise: str) -> Optional[Dict[str, Any]]:
+        """
+        Pendiente y clasificación de la progresión de un ejercicio
+
+        Returns:
+            Dict con la pendiente (kg/día y kg/30 días), el cambio relativo a
+            30 días y la tendencia ("progresando", "estancado", "retrocediendo"
+            o None si hay menos de `min_sessions` sesiones o todas el mismo día)
+        """
+        with self._lock:
+            sums = self._sums.get((user_id, exercise))
+            if sums is None:
+                return None
+            n, sum_x, sum_y, sum_xx, sum_xy, origin, last_x, last_y = sums
+
+        slope = None
+        denominator = n * sum_xx - sum_x * sum_x
+        if n >= self.min_sessions and denominator > 1e-9:
+            slope = (n * sum_xy - sum_x * sum_y) / denominator
+        mean_weight = sum_y / n
+        relative_30d = slope * 30 / mean_weight if slope is not None and mean_weight > 0 else None
+
+        if relative_30d is None:
+            trend = None
+        elif relative_30d > self.stall_threshold:
+            trend = "progresando"
+        elif relative_30d < -self.stall_threshold:
+            trend = "retrocediendo"
+        else:
+            trend = "estancado"
+
+        return {
+            "exercise": exercise,
+            "sessions": int(n),
+            "slope_kg_per_day": slope,
+            "slope_kg_per_30_days": slope * 30 if slope is not None else None,
+            "relative_change_30_days": relative_30d,
+            "trend": trend,
+            "mean_weight": mean_weight,
+            "last_weight": last_y,
+            "first_date": datetime.fromtimestamp(origin * SECONDS_PER_DAY, timezone.utc).date().isoformat(),
+            "last_date": datetime.fromtimestamp(last_x * SECONDS_PER_DAY, timezone.utc).date().isoformat(),
+        }
+
+    def user_progression(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Tendencia de todos los ejercicios de un usuario (None si no tiene sesiones)"""
+        with self._lock:
+            exercises = list(self._exercises_by_user.get(user_id, []))
+        if not exercises:
+            return None
+        return [self.trend(user_id, exercise) for exercise in sorted(exercises)]
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Guarda las sumas en un .npz comprimido (reemplazo atómico)"""
+        path = path or self.path
+        with self._lock:
+            keys = list(self._sums)
+            arrays = {
+                "user_ids": np.array([user_id for user_id, _ in keys], dtype=str),
+                "exercises": np.array([exercise for _, exercise in keys], dtype=str),
+                "sums": np.array([self._sums[key] for key in keys], dtype=np.float64).reshape(-1, 8),
+                "last_users": np.array(list(self._last_session), dtype=str),
+                "last_sessions": np.array(list(self._last_session.values()), dtype=str),
+            }
+            self._updates_since_save = 0
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with self._save_lock:
+            with open(temp_path, "wb") as f:
+                f.write(buffer.getvalue())
+            os.replace(temp_path, path)
+
+    def load(self, path: str) -> None:
+        with np.load(path) as data:
+            with self._lock:
+                self._sums = {}
+                self._exercises_by_user = {}
+                for user_id, exercise, sums in zip(data["user_ids"].tolist(), data["exercises"].tolist(),
+                                                   data["sums"].tolist()):
+                    self._sums[(user_id, exercise)] = sums
+                    self._exercises_by_user.setdefault(user_id, []).append(exercise)
+                self._last_session = dict(zip(data["last_users"].tolist(), data["last_sessions"].tolist()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._exercises_by_user),
+            "exercises": len(self._sums),
+            "min_sessions": self.min_sessions,
+            "stall_threshold": self.stall_threshold,
+            "path": self.path,
+        }
+
+
+def create_progression_index() -> Optional[ProgressionIndex]:
+    """Crea el índice de progresión con la configuración de Settings (None si está desactivado)"""
+    if not settings.PROGRESSION_ENABLED:
+        return None
+    return ProgressionIndex(
+        min_sessions=settings.PROGRESSION_MIN_SESSIONS,
+        stall_threshold=settings.PROGRESSION_STALL_THRESHOLD,
+        path=settings.PROGRESSION_PATH or None,
+        save_every=settings.PROGRESSION_SAVE_EVERY
+    )
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.models.session_models import AnomalyPredictionResponse
+
+
+class MemoryCacheBackend:
+    """LRU en memoria con expiración por TTL (propio de cada proceso)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, AnomalyPredictionResponse]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> Optional[AnomalyPredictionResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def set(self, key: str, response: AnomalyPredictionResponse, expires_at: float) -> int:
+        """Guarda una entrada y devuelve cuántas se desalojaron"""
+        with self._lock:
+            self._entries[key] = (expires_at, response)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    Caché en disco compartida por todos los workers de uvicorn de la máquina
+
+    Cada hilo usa su propia conexión; SQLite en modo WAL permite lecturas
+    concurrentes desde varios procesos mientras uno escribe.
+    """
+
+    # Cada cuántas escrituras se recorta la tabla a max_entries
+    EVICTION_INTERVAL = 256
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str, now: float) -> Optional[AnomalyPredictionResponse]:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        self._connection().execute("UPDATE results SET last_access = ? WHERE key = ?", (now, key))
+        return AnomalyPredictionResponse.model_validate_json(row[0])
+
+    def set(self, key: str, response: AnomalyPredictionResponse, expires_at: float) -> int:
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO results (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, response.model_dump_json(), expires_at, time.time())
+        )
+        self._writes += 1
+        if self._writes % self.EVICTION_INTERVAL:
+            return 0
+        connection.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        cursor = connection.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        return max(cursor.rowcount, 0)
+
+    def size(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM results")
+
+
+class ResultCache:
+    """
+    Caché de resultados de predicción direccionada por contenido
+
+    La clave es un hash canónico de los campos de la sesión que influyen en el
+    resultado (ejercicios y sets, estadísticas por grupo muscular, duración y
+    descanso) más la huella del modelo, de modo que sesiones con distinto
+    `_id` o fechas pero el mismo contenido comparten resultado y un cambio de
+    modelo invalida todas las entradas anteriores.
+    """
+
+    BACKENDS = ("memory", "disk")
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600,
+                 backend: str = "memory", disk_path: str = "cache/results.sqlite"):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Backend de caché desconocido: {backend}")
+        self.backend_name = backend
+        self.ttl_seconds = ttl_seconds
+        if backend == "disk":
+            self.backend = SQLiteCacheBackend(disk_path, max_entries)
+        else:
+            self.backend = MemoryCacheBackend(max_entries)
+        # Protege los contadores: el executor consulta la caché desde varios hilos
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def session_key(session_data: Dict[str, Any], extended_json: bool, model_fingerprint: str) -> str:
+        """
+        Calcula la clave canónica de una sesión
+
+        Args:
+            session_data: Sesión como diccionario (en su formato original)
+            extended_json: Si la sesión viene en formato MongoDB Extended JSON
+            model_fingerprint: Versión y huella de los artefactos del modelo
+
+        Returns:
+            str: Hash hexadecimal de los campos relevantes para el scoring
+        """
+        statistics = session_data.get("statistics") or {}
+        sets_by_muscle_group = statistics.get("setsByMuscleGroup", {}) if isinstance(statistics, dict) else statistics
+        relevant = {
+            "extended_json": extended_json,
+            "totalDuration": session_data.get("totalDuration", 0),
+            "totalRestTime": session_data.get("totalRestTime", 0),
+            # Lista de pares en el orden original: el grupo dominante desempata por orden de inserción
+            "setsByMuscleGroup": (
+                list(sets_by_muscle_group.items()) if isinstance(sets_by_muscle_group, dict) else sets_by_muscle_group
+            ),
+            "exercises": [
+                {
+                    "muscleGroup": exercise.get("muscleGroup", ""),
+                    "sets": [
+                        [s.get("weight", 0), s.get("reps", 0), s.get("restTime", 0), s.get("completed", True)]
+                        for s in exercise.get("sets", [])
+                    ],
+                }
+                for exercise in session_data.get("exercises", [])
+            ],
+        }
+        canonical = json.dumps(relevant, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.blake2b(f"{model_fingerprint}:{canonical}".encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str) -> Optional[AnomalyPredictionResponse]:
+        response = self.backend.get(key, time.time())
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def set(self, key: str, response: AnomalyPredictionResponse) -> None:
+        evicted = self.backend.set(key, response, time.time() + self.ttl_seconds)
+        with self._lock:
+            self.evictions += evicted
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos y fallos de este proceso"""
+        with self._lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        lookups = hits + misses
+        return {
+            "backend": self.backend_name,
+            "entries": self.backend.size(),
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "evictions": evictions,
+        }
@@ -0,0 +1,316 @@
+import numpy as np
+from pydantic import ValidationError
+from typing import Dict, Any, List, Optional, Union
+from app.core.config import settings
+from app.models.session_models import (
+    AnomalyPredictionResponse, BatchPredictionItem, DictAccessModel, RealSessionInput, SessionInput
+)
+from app.services.feature_extractor import FeatureExtractor
+from app.services.metrics import span
+from app.services.anomaly_predictor import AnomalyPredictor
+from app.services.drift_monitor import DriftMonitor, create_drift_monitor
+from app.services.model_registry import create_model_registry
+from app.services.progression_index import ProgressionIndex, create_progression_index
+from app.services.result_cache import ResultCache
+from app.services.session_store import SessionStore, create_session_store
+from app.services.user_baselines import UserBaselineStore, create_user_baselines, personalize
+from app.utils.mongodb_parser import MongoDBParser
+
+class ScoringPipeline:
+    """Orquesta parseo, extracción de características y predicción para lotes de sesiones"""
+    
+    def __init__(self, feature_extractor: FeatureExtractor, anomaly_predictor: AnomalyPredictor,
+                 result_cache: Optional[ResultCache] = None,
+                 user_baselines: Optional[UserBaselineStore] = None,
+                 progression_index: Optional[ProgressionIndex] = None,
+                 session_store: Optional[SessionStore] = None,
+                 drift_monitor: Optional[DriftMonitor] = None):
+        self.feature_extractor = feature_extractor
+        self.anomaly_predictor = anomaly_predictor
+        self.result_cache = result_cache
+        self.user_baselines = user_baselines
+        self.progression_index = progression_index
+        self.session_store = session_store
+        self.drift_monitor = drift_monitor
+    
+    @property
+    def has_user_state(self) -> bool:
+        """Si el pipeline mantiene estado en el proceso principal (por usuario, historial o drift)"""
+        return (self.user_baselines is not None or self.progression_index is not None
+                or self.session_store is not None or self.drift_monitor is not None)
+    
+    @staticmethod
+    def get_session_id(session_data: Dict[str, Any]) -> Optional[str]:
+        """Obtiene el identificador de la sesión en cualquiera de los dos formatos"""
+        session_id = session_data.get("_id")
+        if session_id is None:
+            return None
+        try:
+            return str(MongoDBParser.decode_value(session_id))
+        except ValueError:
+            return str(session_id)
+    
+    def extract_features(self, session_data: Dict[str, Any], extended_json: bool = False) -> Dict[str, Any]:
+        """
+        Extrae las características de una sesión
+        
+        Args:
+            session_data: Sesión como diccionario
+            extended_json: Si la sesión viene en formato MongoDB Extended JSON
+            
+        Returns:
+            Dict: Características extraídas
+        """
+        if extended_json:
+            session_data = MongoDBParser.convert_session_data(session_data)
+        return self.feature_extractor.extract_features_from_session(session_data)
+    
+    def predict_session(self, session_data: Dict[str, Any], extended_json: bool = False) -> AnomalyPredictionResponse:
+        """
+        Extrae características y predice anomalías para una sola sesión
+        
+        Args:
+            session_data: Sesión como diccionario
+            extended_json: Si la sesión viene en formato MongoDB Extended JSON
+            
+        Returns:
+            AnomalyPredictionResponse: Respuesta completa con clasificación
+        """
+        outcome = self.predict_sessions([session_data], [extended_json])[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    
+    def predict_sessions(self, sessions: List[Dict[str, Any]],
+                         extended_json: List[bool]) -> List[Union[AnomalyPredictionResponse, Exception]]:
+        """
+        Predice anomalías para varias sesiones con una sola llamada al scaler y al modelo
+        
+        Las sesiones que no se pueden procesar devuelven su excepción en su
+        posición sin afectar al resto.
+        
+        Args:
+            sessions: Sesiones como diccionarios
+            extended_json: Para cada sesión, si viene en formato MongoDB Extended JSON
+            
+        Returns:
+            List: Respuesta o excepción por sesión, en el mismo orden
+        """
+        # Todo el lote usa el mismo predictor aunque se active otra versión mientras tanto
+        anomaly_predictor = self.anomaly_predictor
+        cache_namespace = f"{anomaly_predictor.model_version}:{anomaly_predictor.model_fingerprint}"
+        outcomes: List[Union[AnomalyPredictionResponse, Exception, None]] = [None] * len(sessions)
+        cache_keys: Dict[int, str] = {}
+        converted_positions: List[int] = []
+        converted: List[Dict[str, Any]] = []
+        
+        pending = list(range(len(sessions)))
+        if self.result_cache is not None:
+            pending = []
+            with span("result_cache"):
+                for index, (session_data, is_extended) in enumerate(zip(sessions, extended_json)):
+                    try:
+                        cache_keys[index] = self.result_cache.session_key(
+                            session_data, is_extended, cache_namespace
+                        )
+                        cached = self.result_cache.get(cache_keys[index])
+                    except Exception:
+                        cached = None  # sesión mal formada: se procesa y reporta su error normalmente
+                    if cached is not None:
+                        outcomes[index] = cached
+                    else:
+                        pending.append(index)
+        
+        with span("parse"):
+            for index in pending:
+                try:
+                    converted.append(
+                        MongoDBParser.convert_session_data(sessions[index]) if extended_json[index] else sessions[index]
+                    )
+                    converted_positions.append(index)
+                except Exception as e:
+                    outcomes[index] = e
+        
+        positions: List[int] = []
+        rows: List[np.ndarray] = []
+        features_dicts: List[Dict[str, Any]] = []
+        summaries: List[Dict[str, Any]] = []
+        
+        with span("extract"):
+            # Extracción columnar de todas las sesiones a la vez
+            extracted = self.feature_extractor.extract_features_batch(converted)
+            
+            for index, features_dict in zip(converted_positions, extracted):
+                try:
+                    if isinstance(features_dict, Exception):
+                        raise features_dict
+                    row = self.feature_extractor.to_model_array(features_dict)
+                    if not np.all(np.isfinite(row)):
+                        raise ValueError("Características no numéricas o infinitas")
+                except Exception as e:
+                    outcomes[index] = e
+                    continue
+                
+                positions.append(index)
+                rows.append(row)
+                features_dicts.append(features_dict)
+                summaries.append(self.feature_extractor.build_session_summary(features_dict))
+        
+        if rows:
+            responses = anomaly_predictor.get_batch_prediction_details(
+                np.vstack(rows), features_dicts, summaries
+            )
+            for index, response in zip(positions, responses):
+                outcomes[index] = response
+                if index in cache_keys:
+                    self.result_cache.set(cache_keys[index], response)
+        
+        # La caché guarda la respuesta del bosque; el estado por usuario se actualiza siempre
+        if self.has_user_state:
+            with span("personalize"):
+                outcomes = self.personalize_outcomes(sessions, outcomes)
+        return outcomes
+    
+    def personalize_outcomes(self, sessions: List[Dict[str, Any]],
+                             outcomes: List[Union[AnomalyPredictionResponse, Exception]]
+                             ) -> List[Union[AnomalyPredictionResponse, Exception]]:
+        """
+        Añade a cada respuesta el score respecto a la línea base de su usuario
+        y actualiza el estado por usuario (líneas base, índice de progresión e
+        historial de sesiones) y los sketches del monitor de drift
+        
+        Args:
+            sessions: Sesiones en su formato original
+            outcomes: Respuesta o excepción por sesión, en el mismo orden
+            
+        Returns:
+            List: Las mismas posiciones, con `personalized` en las respuestas
+        """
+        personalized: List[Union[AnomalyPredictionResponse, Exception]] = []
+        for session_data, outcome in zip(sessions, outcomes):
+            if isinstance(outcome, Exception):
+                personalized.append(outcome)
+                continue
+            session_id = self.get_session_id(session_data)
+            if self.progression_index is not None:
+                if settings.PROGRESSION_FEATURE_ENABLED:
+                    # Con el historial anterior a la sesión, antes de añadirla al índice
+                    extra = self.feature_extractor.extract_progression_features(session_data, self.progression_index)
+                    outcome = outcome.model_copy(update={"features_used": {**outcome.features_used, **extra}})
+                self.progression_index.update(session_data, session_id)
+            if self.user_baselines is not None:
+                outcome = personalize(self.user_baselines, session_data, outcome, session_id)
+            if self.session_store is not None:
+                self.session_store.append(session_data, outcome, session_id)
+            personalized.append(outcome)
+        if self.drift_monitor is not None:
+            self.drift_monitor.observe([outcome for outcome in personalized if not isinstance(outcome, Exception)])
+        return personalized
+    
+    def personalize_result(self, method: str, args: tuple, result: Any) -> Any:
+        """
+        Aplica el estado por usuario al resultado de un método ejecutado en otro proceso
+        
+        Los procesos worker no tienen líneas base, índice de progresión,
+        historial ni monitor de drift propios (cada uno vería solo una parte
+        del historial); el proceso principal los aplica al recibir el resultado.
+        """
+        if not self.has_user_state:
+            return result
+        if method == "predict_session":
+            return self.personalize_outcomes([args[0]], [result])[0]
+        if method == "predict_sessions":
+            return self.personalize_outcomes(args[0], result)
+        if method == "score_sessions":
+            for item, session_data in zip(result, args[0]):
+                if item.result is not None:
+                    item.result = self.personalize_outcomes([session_data], [item.result])[0]
+        return result
+    
+    def score_sessions(self, sessions: List[Any], first_index: int = 0) -> List[BatchPredictionItem]:
+        """
+        Puntúa un lote de sesiones en cualquiera de los dos formatos (se detecta por sesión)
+        
+        Cada sesión se valida con el mismo modelo que en /predict o
+        /predict-real; las que no pasan la validación reportan el error en su
+        posición y no llegan al modelo.
+        
+        Args:
+            sessions: Sesiones en formato MongoDB Extended JSON o JSON estándar
+            first_index: Índice del primer elemento (al puntuar un stream por bloques)
+            
+        Returns:
+            List[BatchPredictionItem]: Un resultado por sesión, en el mismo orden
+        """
+        items = [BatchPredictionItem(index=first_index + offset) for offset in range(len(sessions))]
+        valid_items: List[BatchPredictionItem] = []
+        valid_sessions: List[DictAccessModel] = []
+        extended_json: List[bool] = []
+        
+        for item, raw_session in zip(items, sessions):
+            if not isinstance(raw_session, dict):
+                item.error = "Error procesando sesión: La sesión debe ser un objeto JSON"
+                continue
+            is_extended = MongoDBParser.is_extended_json(raw_session)
+            try:
+                session = (SessionInput if is_extended else RealSessionInput).model_validate(raw_session)
+            except ValidationError as e:
+                item.error = f"Error procesando sesión: {validation_message(e)}"
+                continue
+            item.session_id = self.get_session_id(session)
+            valid_items.append(item)
+            valid_sessions.append(session)
+            extended_json.append(is_extended)
+        
+        outcomes = self.predict_sessions(valid_sessions, extended_json)
+        for item, outcome in zip(valid_items, outcomes):
+            if isinstance(outcome, Exception):
+                item.error = f"Error procesando sesión: {str(outcome)}"
+            else:
+                item.result = outcome
+        
+        return items
+
+
+def validation_message(error: ValidationError, limit: int = 5) -> str:
+    """Resumen legible de los errores de validación de una sesión (campo: motivo)"""
+    problems = [
+        f"{'.'.join(str(part) for part in detail['loc']) or 'sesión'}: {detail['msg']}"
+        for detail in error.errors()[:limit]
+    ]
+    if error.error_count() > limit:
+        problems.append(f"y {error.error_count() - limit} errores más")
+    return "Sesión inválida (" + "; ".join(problems) + ")"
+
+
+def create_scoring_pipeline(scoring_engine: Optional[str] = None, load_models: bool = True,
+                            model_version: Optional[str] = None, user_state: bool = True) -> ScoringPipeline:
+    """
+    Crea el pipeline de scoring con la configuración de Settings
+    
+    Args:
+        scoring_engine: Motor de scoring (por defecto SCORING_ENGINE)
+        load_models: Con False el modelo no se carga hasta llamar a
+            `anomaly_predictor.load_models()` (lo hace el lifespan de la aplicación)
+        model_version: Versión del registro (por defecto la versión activa)
+        user_state: Si se crean las líneas base, el índice de progresión, el historial
+            de sesiones y el monitor de drift (según USER_BASELINES_ENABLED,
+            PROGRESSION_ENABLED, SESSION_STORE_ENABLED y DRIFT_ENABLED)
+    """
+    result_cache = None
+    if settings.RESULT_CACHE_ENABLED:
+        result_cache = ResultCache(
+            max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+            backend=settings.RESULT_CACHE_BACKEND,
+            disk_path=settings.RESULT_CACHE_PATH
+        )
+    registry = create_model_registry()
+    anomaly_predictor = registry.create_predictor(model_version or registry.active_version(), scoring_engine, load_models)
+    return ScoringPipeline(
+        FeatureExtractor(), anomaly_predictor, result_cache,
+        create_user_baselines() if user_state else None,
+        create_progression_index() if user_state else None,
+        create_session_store() if user_state else None,
+        create_drift_monitor() if user_state else None
+    )
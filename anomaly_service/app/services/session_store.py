@@ -0,0 +1,378 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.session_models import AnomalyPredictionResponse
+from app.services.feature_extractor import FeatureExtractor
+from app.services.progression_index import SECONDS_PER_DAY, session_day
+
+FEATURES = FeatureExtractor.MODEL_FEATURES
+COLUMNS = ("session_id", "user_id", "session_date", "scored_at", "is_anomaly", "prediction",
+           "anomaly_type", "risk_score", "model_version", *FEATURES)
+
+
+def day_iso(day: int) -> str:
+    return datetime.fromtimestamp(day * SECONDS_PER_DAY, timezone.utc).date().isoformat()
+
+
+class SessionStore:
+    """
+    Historial persistente de las sesiones puntuadas en SQLite
+
+    Cada sesión puntuada se guarda con su usuario, fecha, características del
+    modelo, risk_score, etiqueta, tipo de anomalía y versión del modelo. Las
+    escrituras no ocurren en la petición: `append` solo añade la fila a un
+    buffer en memoria y un hilo la escribe junto con las demás en una sola
+    transacción cada `batch_size` filas o cada `flush_interval` segundos.
+
+    Las consultas por usuario usan el índice (user_id, session_date). Las
+    estadísticas globales se leen de la tabla `daily_stats` (conteos por día,
+    tipo de anomalía y versión del modelo, actualizada en la misma
+    transacción que las filas), así que su costo depende del número de días
+    y no del de sesiones. Una sesión con el mismo `_id` que otra ya guardada
+    la reemplaza (los reintentos no se cuentan dos veces).
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_buffer: int = 100000, retention_days: float = 0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.retention_days = retention_days
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer: List[Tuple[Any, ...]] = []
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._written = 0
+        self._dropped = 0
+        self._flushes = 0
+        self._last_flush_ms = 0.0
+        self._last_purge = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Conexión temporal: la del hilo principal no debe heredarse en los workers pre-fork
+        with sqlite3.connect(path, timeout=10.0, isolation_level=None) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            feature_columns = "".join(f", {name} REAL" for name in FEATURES)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS scored_sessions ("
+                "session_id TEXT, user_id TEXT, session_date REAL NOT NULL, scored_at REAL NOT NULL, "
+                "is_anomaly INTEGER NOT NULL, prediction TEXT NOT NULL, anomaly_type TEXT NOT NULL, "
+                f"risk_score REAL NOT NULL, model_version TEXT{feature_columns})"
+            )
+            connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS scored_sessions_id ON scored_sessions (session_id) "
+                "WHERE session_id IS NOT NULL"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS scored_sessions_user_date ON scored_sessions (user_id, session_date)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS scored_sessions_date ON scored_sessions (session_date)")
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS scored_sessions_type_date ON scored_sessions (anomaly_type, session_date)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS daily_stats ("
+                "day INTEGER NOT NULL, anomaly_type TEXT NOT NULL, model_version TEXT NOT NULL, "
+                "sessions INTEGER NOT NULL, anomalies INTEGER NOT NULL, risk_sum REAL NOT NULL, "
+                "PRIMARY KEY (day, anomaly_type, model_version)) WITHOUT ROWID"
+            )
+        connection.close()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def append(self, session_data: Dict[str, Any], response: AnomalyPredictionResponse,
+               session_id: Optional[str] = None) -> None:
+        """
+        Añade una sesión puntuada al buffer de escritura (no toca el disco)
+
+        Las sesiones sin fecha se guardan con la fecha en que se puntuaron.
+        Si el buffer está lleno (el disco no da abasto) la sesión se descarta
+        y se cuenta en `dropped`.
+        """
+        user_id = session_data.get("userId")
+        if isinstance(user_id, dict):
+            user_id = user_id.get("$oid")
+        now = time.time()
+        day = session_day(session_data.get("date"))
+        features = response.features_used
+        row = (
+            session_id,
+            str(user_id) if user_id else None,
+            day * SECONDS_PER_DAY if day is not None else now,
+            now,
+            int(response.prediction == "Anomalía"),
+            response.prediction,
+            response.anomaly_type,
+            float(response.risk_score),
+            response.model_version,
+            *(float(features[name]) for name in FEATURES),
+        )
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self._dropped += 1
+                return
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Arranca el hilo de escritura (en cada proceso que puntúa)"""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="session-store-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Detiene el hilo de escritura y escribe lo que quede en el buffer"""
+        if self._thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if self.retention_days and time.time() - self._last_purge > 3600:
+                    self.purge()
+            except Exception as e:
+                print(f"⚠️ Error escribiendo el historial de sesiones: {e}")
+                time.sleep(self.flush_interval)
+
+    def flush(self) -> int:
+        """Escribe el buffer en una sola transacción y devuelve las filas escritas"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            start = time.perf_counter()
+            try:
+                self._write(rows)
+            except Exception:
+                with self._lock:
+                    # Se reintentan en el próximo vaciado (sin pasar de max_buffer)
+                    self._buffer = rows[:max(self.max_buffer - len(self._buffer), 0)] + self._buffer
+                raise
+            self._written += len(rows)
+            self._flushes += 1
+            self._last_flush_ms = (time.perf_counter() - start) * 1000
+            return len(rows)
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> None:
+        # Dentro del lote, la última puntuación de cada sesión gana
+        by_id: Dict[str, Tuple[Any, ...]] = {}
+        anonymous: List[Tuple[Any, ...]] = []
+        for row in rows:
+            if row[0] is None:
+                anonymous.append(row)
+            else:
+                by_id[row[0]] = row
+        rows = anonymous + list(by_id.values())
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Las filas que se reemplazan dejan de contar en daily_stats
+            ids = list(by_id)
+            replaced: List[Tuple[Any, ...]] = []
+            for offset in range(0, len(ids), 500):
+                chunk = ids[offset:offset + 500]
+                replaced.extend(connection.execute(
+                    "SELECT session_date, anomaly_type, model_version, is_anomaly, risk_score "
+                    f"FROM scored_sessions WHERE session_id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall())
+            connection.executemany(
+                f"INSERT OR REPLACE INTO scored_sessions ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows
+            )
+            daily: Dict[Tuple[int, str, str], List[float]] = {}
+            for sign, items in ((-1, replaced), (1, [(r[2], r[6], r[8], r[4], r[7]) for r in rows])):
+                for session_date, anomaly_type, model_version, is_anomaly, risk_score in items:
+                    totals = daily.setdefault(
+                        (int(session_date // SECONDS_PER_DAY), anomaly_type, model_version or ""), [0, 0, 0.0]
+                    )
+                    totals[0] += sign
+                    totals[1] += sign * is_anomaly
+                    totals[2] += sign * risk_score
+            connection.executemany(
+                "INSERT INTO daily_stats (day, anomaly_type, model_version, sessions, anomalies, risk_sum) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (day, anomaly_type, model_version) DO UPDATE SET "
+                "sessions = sessions + excluded.sessions, anomalies = anomalies + excluded.anomalies, "
+                "risk_sum = risk_sum + excluded.risk_sum",
+                [(*key, *totals) for key, totals in daily.items() if any(totals)]
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def purge(self) -> int:
+        """Borra las sesiones (y sus conteos diarios) de fecha anterior a `retention_days` días"""
+        self._last_purge = time.time()
+        cutoff_day = int(self._last_purge // SECONDS_PER_DAY - self.retention_days)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(
+                "DELETE FROM scored_sessions WHERE session_date < ?", (cutoff_day * SECONDS_PER_DAY,)
+            )
+            connection.execute("DELETE FROM daily_stats WHERE day < ?", (cutoff_day,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return max(cursor.rowcount, 0)
+
+    def user_history(self, user_id: str, since: Optional[float] = None, until: Optional[float] = None,
+                     limit: int = 100, anomalies_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Sesiones puntuadas de un usuario, de la más reciente a la más antigua
+
+        Args:
+            user_id: Usuario
+            since, until: Rango de fechas de la sesión (segundos desde epoch)
+            limit: Máximo de sesiones
+            anomalies_only: Solo las sesiones marcadas como anomalía
+        """
+        query = f"SELECT {', '.join(COLUMNS)} FROM scored_sessions WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if since is not None:
+            query += " AND session_date >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND session_date <= ?"
+            params.append(until)
+        if anomalies_only:
+            query += " AND is_anomaly = 1"
+        query += " ORDER BY session_date DESC LIMIT ?"
+        rows = self._connection().execute(query, (*params, limit)).fetchall()
+        history = []
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            history.append({
+                "session_id": record["session_id"],
+                "date": datetime.fromtimestamp(record["session_date"], timezone.utc).isoformat(),
+                "scored_at": datetime.fromtimestamp(record["scored_at"], timezone.utc).isoformat(),
+                "prediction": record["prediction"],
+                "anomaly_type": record["anomaly_type"],
+                "risk_score": record["risk_score"],
+                "model_version": record["model_version"],
+                "features": {name: record[name] for name in FEATURES},
+            })
+        return history
+
+    def user_stats(self, user_id: str, days: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Conteo, tasa de anomalías y risk_score medio de un usuario en los últimos `days` días (None = todo)"""
+        since = time.time() - days * SECONDS_PER_DAY if days else float("-inf")
+        rows = self._connection().execute(
+            "SELECT anomaly_type, COUNT(*), SUM(is_anomaly), SUM(risk_score), MAX(risk_score), "
+            "MIN(session_date), MAX(session_date) FROM scored_sessions "
+            "WHERE user_id = ? AND session_date >= ? GROUP BY anomaly_type",
+            (user_id, since)
+        ).fetchall()
+        if not rows:
+            return None
+        sessions = sum(row[1] for row in rows)
+        anomalies = sum(row[2] for row in rows)
+        return {
+            "user_id": user_id,
+            "days": days,
+            "sessions": sessions,
+            "anomalies": anomalies,
+            "anomaly_rate": anomalies / sessions,
+            "avg_risk_score": sum(row[3] for row in rows) / sessions,
+            "max_risk_score": max(row[4] for row in rows),
+            "by_anomaly_type": {row[0]: row[1] for row in rows},
+            "first_session": datetime.fromtimestamp(min(row[5] for row in rows), timezone.utc).isoformat(),
+            "last_session": datetime.fromtimestamp(max(row[6] for row in rows), timezone.utc).isoformat(),
+        }
+
+    def global_stats(self, days: Optional[float] = None) -> Dict[str, Any]:
+        """Totales por tipo de anomalía, por versión del modelo y por día en los últimos `days` días"""
+        since_day = int(time.time() // SECONDS_PER_DAY - days) + 1 if days else -2 ** 62
+        rows = self._connection().execute(
+            "SELECT day, anomaly_type, model_version, sessions, anomalies, risk_sum FROM daily_stats "
+            "WHERE day >= ? AND sessions > 0 ORDER BY day",
+            (since_day,)
+        ).fetchall()
+        by_type: Dict[str, int] = {}
+        by_version: Dict[str, Dict[str, Any]] = {}
+        by_day: Dict[int, List[float]] = {}
+        for day, anomaly_type, model_version, sessions, anomalies, risk_sum in rows:
+            by_type[anomaly_type] = by_type.get(anomaly_type, 0) + sessions
+            version = by_version.setdefault(model_version or "desconocida", {"sessions": 0, "anomalies": 0})
+            version["sessions"] += sessions
+            version["anomalies"] += anomalies
+            totals = by_day.setdefault(day, [0, 0, 0.0])
+            totals[0] += sessions
+            totals[1] += anomalies
+            totals[2] += risk_sum
+        sessions = sum(totals[0] for totals in by_day.values())
+        anomalies = sum(totals[1] for totals in by_day.values())
+        return {
+            "days": days,
+            "sessions": sessions,
+            "anomalies": anomalies,
+            "anomaly_rate": anomalies / sessions if sessions else 0.0,
+            "avg_risk_score": sum(totals[2] for totals in by_day.values()) / sessions if sessions else None,
+            "by_anomaly_type": by_type,
+            "by_model_version": by_version,
+            "daily": [
+                {"date": day_iso(day), "sessions": int(totals[0]), "anomalies": int(totals[1]),
+                 "anomaly_rate": totals[1] / totals[0]}
+                for day, totals in by_day.items()
+            ],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "path": self.path,
+            "writer_running": self._thread is not None,
+            "buffered": buffered,
+            "written": self._written,
+            "dropped": self._dropped,
+            "flushes": self._flushes,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+            "retention_days": self.retention_days or None,
+        }
+
+
+def create_session_store() -> Optional[SessionStore]:
+    """Crea el historial de sesiones con la configuración de Settings (None si está desactivado)"""
+    if not settings.SESSION_STORE_ENABLED:
+        return None
+    return SessionStore(
+        path=settings.SESSION_STORE_PATH,
+        batch_size=settings.SESSION_STORE_BATCH_SIZE,
+        flush_interval=settings.SESSION_STORE_FLUSH_INTERVAL_SECONDS,
+        max_buffer=settings.SESSION_STORE_MAX_BUFFER,
+        retention_days=settings.SESSION_STORE_RETENTION_DAYS
+    )
@@ -0,0 +1,234 @@
+import io
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.session_models import PersonalizedScore
+from app.services.feature_extractor import FeatureExtractor
+
+
+class UserBaselineStore:
+    """
+    Estadísticas incrementales por usuario de las características del modelo
+
+    Para cada `userId` se mantiene la media y la varianza de cada
+    característica con el algoritmo de Welford ponderado con decaimiento
+    exponencial: cada sesión nueva pesa 1 y el peso acumulado de las
+    anteriores se multiplica por `decay`, de modo que la línea base sigue los
+    cambios del usuario (progresión, cambio de rutina). Cada actualización es
+    O(1) y no requiere volver a leer el historial.
+
+    Los datos viven en arreglos contiguos (una fila por usuario) y se guardan
+    en un .npz comprimido.
+    """
+
+    FEATURES = FeatureExtractor.MODEL_FEATURES
+    # Desviación mínima relativa a la media (evita z enormes en rutinas idénticas)
+    MIN_RELATIVE_STD = 0.05
+    MIN_STD = 1e-6
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, half_life_sessions: float = 20.0, min_sessions: int = 5,
+                 z_threshold: float = 3.0, path: Optional[str] = None, save_every: int = 500):
+        self.decay = 0.5 ** (1.0 / half_life_sessions)
+        self.min_sessions = min_sessions
+        self.z_threshold = z_threshold
+        self.path = path
+        self.save_every = save_every
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._last_session: Dict[str, str] = {}
+        self._allocate(self.INITIAL_CAPACITY)
+        self._updates_since_save = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def _allocate(self, capacity: int) -> None:
+        n_features = len(self.FEATURES)
+        self._count = np.zeros(capacity, dtype=np.int64)
+        self._weight = np.zeros(capacity, dtype=np.float64)
+        self._mean = np.zeros((capacity, n_features), dtype=np.float64)
+        self._m2 = np.zeros((capacity, n_features), dtype=np.float64)
+
+    def _row(self, user_id: str) -> int:
+        """Fila del usuario, creándola (y ampliando los arreglos) si no existe"""
+        row = self._index.get(user_id)
+        if row is not None:
+            return row
+        row = len(self._index)
+        if row >= len(self._count):
+            capacity = 2 * len(self._count)
+            self._count = np.resize(self._count, capacity)
+            self._weight = np.resize(self._weight, capacity)
+            self._mean = np.resize(self._mean, (capacity, self._mean.shape[1]))
+            self._m2 = np.resize(self._m2, (capacity, self._m2.shape[1]))
+            self._count[row:] = 0
+            self._weight[row:] = 0.0
+            self._mean[row:] = 0.0
+            self._m2[row:] = 0.0
+        self._index[user_id] = row
+        return row
+
+    def score_and_update(self, user_id: str, features: np.ndarray,
+                         session_id: Optional[str] = None) -> PersonalizedScore:
+        """
+        Calcula los z-scores de la sesión respecto a la línea base del usuario y la actualiza
+
+        El z-score se calcula con la línea base anterior a la sesión. Si
+        `session_id` coincide con la última sesión registrada del usuario
+        (reintento o re-envío) la línea base no se vuelve a actualizar.
+
+        Args:
+            user_id: Identificador del usuario
+            features: Vector de características del modelo (sin escalar)
+            session_id: Identificador de la sesión, si se conoce
+
+        Returns:
+            PersonalizedScore: z-scores (None si aún no hay historial suficiente)
+        """
+        with self._lock:
+            row = self._row(user_id)
+            count = int(self._count[row])
+            weight = self._weight[row]
+            mean = self._mean[row]
+            m2 = self._m2[row]
+            score = self._score(features, count, weight, mean, m2)
+
+            if session_id is not None and self._last_session.get(user_id) == session_id:
+                return score
+            if session_id is not None:
+                self._last_session[user_id] = session_id
+
+            # Welford ponderado: el peso de la historia decae, la sesión nueva pesa 1
+            weight = self.decay * weight + 1.0
+            delta = features - mean
+            mean += delta / weight
+            m2 *= self.decay
+            m2 += delta * (features - mean)
+            self._weight[row] = weight
+            self._count[row] = count + 1
+            self._updates_since_save += 1
+            save = self.path is not None and self._updates_since_save >= self.save_every
+
+        if save:
+            self.save()
+        return score
+
+    def _score(self, features: np.ndarray, count: int, weight: float,
+               mean: np.ndarray, m2: np.ndarray) -> PersonalizedScore:
+        if count < self.min_sessions:
+            return PersonalizedScore(sessions_seen=count)
+        std = np.sqrt(np.maximum(m2 / weight, 0.0))
+        std = np.maximum(std, np.maximum(self.MIN_RELATIVE_STD * np.abs(mean), self.MIN_STD))
+        z_scores = (features - mean) / std
+        deviating = [name for name, z in zip(self.FEATURES, z_scores) if abs(z) > self.z_threshold]
+        return PersonalizedScore(
+            sessions_seen=count,
+            z_scores={name: float(z) for name, z in zip(self.FEATURES, z_scores)},
+            max_abs_z=float(np.max(np.abs(z_scores))),
+            deviating_features=deviating,
+            is_unusual=bool(deviating)
+        )
+
+    def baseline(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Media y desviación actuales de un usuario (None si no tiene historial)"""
+        with self._lock:
+            row = self._index.get(user_id)
+            if row is None:
+                return None
+            weight = self._weight[row]
+            return {
+                "sessions_seen": int(self._count[row]),
+                "mean": dict(zip(self.FEATURES, self._mean[row].tolist())),
+                "std": dict(zip(self.FEATURES, np.sqrt(self._m2[row] / weight).tolist())),
+            }
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Guarda las líneas base en un .npz comprimido (reemplazo atómico)"""
+        path = path or self.path
+        with self._lock:
+            n_users = len(self._index)
+            user_ids = np.array(list(self._index), dtype=str)
+            last_users = np.array(list(self._last_session), dtype=str)
+            last_sessions = np.array(list(self._last_session.values()), dtype=str)
+            arrays = {
+                "features": np.array(self.FEATURES, dtype=str),
+                "user_ids": user_ids,
+                "count": self._count[:n_users].copy(),
+                "weight": self._weight[:n_users].copy(),
+                "mean": self._mean[:n_users].copy(),
+                "m2": self._m2[:n_users].copy(),
+                "last_users": last_users,
+                "last_sessions": last_sessions,
+            }
+            self._updates_since_save = 0
+
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with self._save_lock:
+            with open(temp_path, "wb") as f:
+                f.write(buffer.getvalue())
+            os.replace(temp_path, path)
+
+    def load(self, path: str) -> None:
+        """Carga las líneas base guardadas; se ignoran si las características no coinciden"""
+        with np.load(path) as data:
+            if list(data["features"]) != list(self.FEATURES):
+                print(f"⚠️ Líneas base de {path} con otras características; se empieza de cero")
+                return
+            user_ids = data["user_ids"].tolist()
+            with self._lock:
+                self._allocate(max(self.INITIAL_CAPACITY, 2 * len(user_ids)))
+                self._index = {user_id: row for row, user_id in enumerate(user_ids)}
+                self._count[:len(user_ids)] = data["count"]
+                self._weight[:len(user_ids)] = data["weight"]
+                self._mean[:len(user_ids)] = data["mean"]
+                self._m2[:len(user_ids)] = data["m2"]
+                self._last_session = dict(zip(data["last_users"].tolist(), data["last_sessions"].tolist()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._index),
+            "half_life_sessions": float(np.log(0.5) / np.log(self.decay)),
+            "min_sessions": self.min_sessions,
+            "z_threshold": self.z_threshold,
+            "path": self.path,
+        }
+
+
+def personalize(store: UserBaselineStore, session_data: Dict[str, Any], response: Any,
+                session_id: Optional[str] = None) -> Any:
+    """
+    Añade el score personalizado a una respuesta del bosque (copia; no modifica la original)
+
+    Las sesiones sin `userId` se devuelven sin cambios.
+    """
+    user_id = session_data.get("userId")
+    if isinstance(user_id, dict):
+        user_id = user_id.get("$oid")
+    if not user_id:
+        return response
+    features = FeatureExtractor.to_model_array(response.features_used)
+    personalized = store.score_and_update(str(user_id), features, session_id)
+    return response.model_copy(update={"personalized": personalized})
+
+
+def create_user_baselines() -> Optional[UserBaselineStore]:
+    """Crea el almacén de líneas base con la configuración de Settings (None si está desactivado)"""
+    if not settings.USER_BASELINES_ENABLED:
+        return None
+    return UserBaselineStore(
+        half_life_sessions=settings.USER_BASELINES_HALF_LIFE_SESSIONS,
+        min_sessions=settings.USER_BASELINES_MIN_SESSIONS,
+        z_threshold=settings.USER_BASELINES_Z_THRESHOLD,
+        path=settings.USER_BASELINES_PATH or None,
+        save_every=settings.USER_BASELINES_SAVE_EVERY
+    )
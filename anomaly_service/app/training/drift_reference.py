@@ -0,0 +1,72 @@
+"""
+Referencia de drift para un modelo ya entrenado
+
+`app.training.train` guarda la referencia en metadata.json de cada versión
+nueva. Este script la genera para los modelos que no la tienen: la versión
+"default" (se escribe en DRIFT_REFERENCE_PATH) o versiones del registro
+entrenadas antes (se añade a su metadata.json). Hay que pasarle las mismas
+sesiones con las que se entrenó el modelo.
+
+Uso:
+    python -m app.training.drift_reference sessions_all.json
+    python -m app.training.drift_reference export.ndjson --version 20250801-120000
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.drift_monitor import build_reference
+from app.services.model_registry import DEFAULT_VERSION, create_model_registry
+from app.training.feature_cache import FeatureCache
+from app.training.train import build_feature_matrix
+from app.utils.session_stream import iter_sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera la referencia de drift de un modelo existente")
+    parser.add_argument("input", help="Sesiones de entrenamiento del modelo (arreglo JSON o NDJSON); '-' para stdin")
+    parser.add_argument("--version", default=DEFAULT_VERSION, help="Versión del registro (por defecto 'default')")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Sesiones por bloque de extracción")
+    args = parser.parse_args()
+
+    registry = create_model_registry()
+    if not registry.exists(args.version):
+        parser.error(f"Versión de modelo desconocida: {args.version}")
+    predictor = registry.create_predictor(args.version, scoring_engine="sklearn")
+
+    input_stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        _, _, matrix, counts = build_feature_matrix(iter_sessions(input_stream), FeatureCache(None), args.chunk_size)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+    if len(matrix) < 2:
+        raise SystemExit("❌ No hay suficientes sesiones válidas")
+    is_anomaly, scores = predictor.predict_batch(matrix)
+    reference = build_reference(matrix, scores, float(np.mean(is_anomaly)))
+
+    if args.version == DEFAULT_VERSION:
+        target = settings.DRIFT_REFERENCE_PATH
+        with open(target, "w") as f:
+            json.dump(reference, f, indent=2)
+    else:
+        target = os.path.join(registry.version_dir(args.version), "metadata.json")
+        metadata = registry.metadata(args.version)
+        metadata["drift_reference"] = reference
+        temp_path = f"{target}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, target)
+    print(
+        f"✅ Referencia de {args.version} en {target} ({len(matrix)} sesiones, "
+        f"{counts['failed']} con error, {reference['anomaly_rate']:.1%} anómalas)",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
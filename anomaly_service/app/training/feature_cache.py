@@ -0,0 +1,74 @@
+import io
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.feature_extractor import FeatureExtractor
+
+# Cambiar al modificar la extracción de características: invalida todas las filas guardadas
+FEATURE_CACHE_VERSION = "1"
+
+
+class FeatureCache:
+    """
+    Caché columnar en disco de las características de entrenamiento
+
+    Guarda, por sesión, su identificador, su marca de cambio (`updatedAt` o
+    hash del contenido) y la fila de MODEL_FEATURES en un .npz (una columna
+    por arreglo). En la siguiente ejecución solo se extraen las sesiones
+    nuevas o cuya marca cambió.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.features = list(FeatureExtractor.MODEL_FEATURES)
+        # session_id -> (marca de cambio, fila de características)
+        self._rows: Dict[str, Tuple[str, np.ndarray]] = {}
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load(self, path: str) -> None:
+        with np.load(path) as data:
+            if str(data["version"]) != FEATURE_CACHE_VERSION or list(data["features"]) != self.features:
+                print(f"⚠️ Caché de características de {path} con otra versión; se reconstruye")
+                return
+            self._rows = {
+                session_id: (marker, row)
+                for session_id, marker, row
+                in zip(data["session_ids"].tolist(), data["markers"].tolist(), data["matrix"])
+            }
+
+    def get(self, session_id: str, marker: str) -> Optional[np.ndarray]:
+        """Fila guardada de la sesión, o None si no existe o su contenido cambió"""
+        entry = self._rows.get(session_id)
+        if entry is None or entry[0] != marker:
+            return None
+        return entry[1]
+
+    @staticmethod
+    def save(path: str, session_ids: List[str], markers: List[str], matrix: np.ndarray) -> None:
+        """
+        Escribe la caché con exactamente las sesiones de esta ejecución (reemplazo atómico)
+
+        Las sesiones que ya no están en el origen desaparecen de la caché.
+        """
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            version=np.array(FEATURE_CACHE_VERSION),
+            features=np.array(FeatureExtractor.MODEL_FEATURES, dtype=str),
+            session_ids=np.array(session_ids, dtype=str),
+            markers=np.array(markers, dtype=str),
+            matrix=np.asarray(matrix, dtype=np.float64).reshape(-1, len(FeatureExtractor.MODEL_FEATURES))
+        )
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(buffer.getvalue())
+        os.replace(temp_path, path)
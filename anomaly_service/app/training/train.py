@@ -0,0 +1,300 @@
+"""
+Entrenamiento del modelo de anomalías
+
+Reemplaza al notebook TrainingModel.ipynb como camino oficial de
+entrenamiento: las características se calculan con el mismo
+FeatureExtractor que usa el servicio, las sesiones se leen por bloques
+(export JSON/NDJSON o la API del backend página a página) y las filas ya
+extraídas se reutilizan desde una caché columnar en disco. El resultado es
+una versión nueva en el registro de modelos (models/registry/<versión>/).
+
+Uso:
+    python -m app.training.train sessions_all.json
+    python -m app.training.train --api-url http://localhost:3000/api/v1/sessions/all --activate
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
+
+from app.services.drift_monitor import build_reference
+from app.services.feature_extractor import FeatureExtractor
+from app.core.config import settings
+from app.services.model_registry import MODEL_FILE, SCALER_FILE, WARMUP_FILE, ModelRegistry, create_model_registry
+from app.services.result_cache import ResultCache
+from app.services.scoring_pipeline import ScoringPipeline
+from app.training.feature_cache import FEATURE_CACHE_VERSION, FeatureCache
+from app.utils.mongodb_parser import MongoDBParser
+from app.utils.session_stream import iter_chunks, iter_sessions
+
+# Mismos hiperparámetros que el modelo entrenado en el notebook
+DEFAULT_CONTAMINATION = 0.1
+DEFAULT_N_ESTIMATORS = 100
+DEFAULT_RANDOM_STATE = 42
+
+
+def iter_api_sessions(url: str, page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Descarga las sesiones de la API del backend página a página
+
+    Solo una página está en memoria a la vez; la respuesta esperada es
+    `{"data": [...], "totalPages": n}`.
+    """
+    page = 1
+    while True:
+        query = urllib.parse.urlencode({"page": page, "limit": page_size})
+        separator = "&" if "?" in url else "?"
+        with urllib.request.urlopen(f"{url}{separator}{query}", timeout=60) as response:
+            body = json.load(response)
+        yield from body["data"]
+        print(f"📥 Página {page}/{body['totalPages']}: {len(body['data'])} sesiones", file=sys.stderr)
+        if page >= body["totalPages"]:
+            return
+        page += 1
+
+
+def change_marker(session_data: Dict[str, Any], extended: bool) -> str:
+    """
+    Marca que cambia cuando cambia el contenido de la sesión
+
+    Se usa `updatedAt` (Mongo lo actualiza en cada edición), que es mucho más
+    barato que hashear la sesión; sin `updatedAt` se usa el hash canónico del
+    contenido relevante.
+    """
+    updated_at = session_data.get("updatedAt")
+    if updated_at:
+        return f"updatedAt:{json.dumps(updated_at, sort_keys=True)}"
+    return ResultCache.session_key(session_data, extended, FEATURE_CACHE_VERSION)
+
+
+def build_feature_matrix(sessions: Iterable[Any], cache: FeatureCache,
+                         chunk_size: int = 1000) -> Tuple[List[str], List[str], np.ndarray, Dict[str, int]]:
+    """
+    Calcula la matriz de características de entrenamiento reutilizando la caché
+
+    Args:
+        sessions: Sesiones en JSON estándar o MongoDB Extended JSON (se detecta por sesión)
+        cache: Caché de filas de ejecuciones anteriores
+        chunk_size: Sesiones extraídas por cada llamada a extract_features_batch
+
+    Returns:
+        tuple: (ids de sesión, marcas de cambio, matriz n x MODEL_FEATURES, contadores)
+    """
+    extractor = FeatureExtractor()
+    session_ids: List[str] = []
+    markers: List[str] = []
+    rows: List[np.ndarray] = []
+    counts = {"total": 0, "cached": 0, "extracted": 0, "failed": 0}
+
+    for chunk in iter_chunks(sessions, chunk_size):
+        pending: List[Tuple[str, str]] = []
+        pending_sessions: List[Dict[str, Any]] = []
+        counts["total"] += len(chunk)
+
+        for raw_session in chunk:
+            if not isinstance(raw_session, dict):
+                counts["failed"] += 1
+                continue
+            extended = MongoDBParser.is_extended_json(raw_session)
+            try:
+                marker = change_marker(raw_session, extended)
+                session_id = ScoringPipeline.get_session_id(raw_session)
+                if session_id is None:
+                    session_id = ResultCache.session_key(raw_session, extended, FEATURE_CACHE_VERSION)
+                row = cache.get(session_id, marker)
+                if row is None:
+                    pending_sessions.append(
+                        MongoDBParser.convert_session_data(raw_session) if extended else raw_session
+                    )
+                    pending.append((session_id, marker))
+                    continue
+            except Exception:
+                counts["failed"] += 1
+                continue
+            session_ids.append(session_id)
+            markers.append(marker)
+            rows.append(row)
+            counts["cached"] += 1
+
+        for (session_id, marker), features in zip(pending, extractor.extract_features_batch(pending_sessions)):
+            if isinstance(features, Exception):
+                counts["failed"] += 1
+                continue
+            row = extractor.to_model_array(features)
+            if not np.all(np.isfinite(row)):
+                counts["failed"] += 1
+                continue
+            session_ids.append(session_id)
+            markers.append(marker)
+            rows.append(row)
+            counts["extracted"] += 1
+
+    matrix = np.vstack(rows) if rows else np.empty((0, len(FeatureExtractor.MODEL_FEATURES)))
+    return session_ids, markers, matrix, counts
+
+
+def fit_models(matrix: np.ndarray, n_jobs: int = -1, contamination: float = DEFAULT_CONTAMINATION,
+               n_estimators: int = DEFAULT_N_ESTIMATORS,
+               random_state: int = DEFAULT_RANDOM_STATE) -> Tuple[StandardScaler, IsolationForest]:
+    """Ajusta el StandardScaler y el IsolationForest (árboles en paralelo con n_jobs)"""
+    scaler = StandardScaler()
+    matrix_scaled = scaler.fit_transform(matrix)
+    model = IsolationForest(
+        n_estimators=n_estimators,
+        contamination=contamination,
+        random_state=random_state,
+        n_jobs=n_jobs
+    )
+    model.fit(matrix_scaled)
+    return scaler, model
+
+
+def sample_sessions(sessions: Iterable[Any], sample: List[Dict[str, Any]], size: int) -> Iterator[Any]:
+    """
+    Deja pasar las sesiones y guarda en `sample` las primeras `size` válidas
+
+    Las sesiones en Extended JSON se guardan ya convertidas: son la muestra
+    con la que el servicio calienta la versión antes de activarla.
+    """
+    for raw_session in sessions:
+        if len(sample) < size and isinstance(raw_session, dict):
+            try:
+                sample.append(
+                    MongoDBParser.convert_session_data(raw_session)
+                    if MongoDBParser.is_extended_json(raw_session) else raw_session
+                )
+            except Exception:
+                pass
+        yield raw_session
+
+
+def write_version(registry: ModelRegistry, version: str, scaler: StandardScaler,
+                  model: IsolationForest, metadata: Dict[str, Any],
+                  warmup_sessions: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Escribe una versión nueva en el registro
+
+    Los archivos se escriben en un directorio temporal que se renombra al
+    final, así el servicio nunca ve una versión a medio escribir. Con
+    `warmup_sessions` se incluye también la muestra de calentamiento.
+
+    Returns:
+        str: Directorio de la versión
+    """
+    target = registry.version_dir(version)
+    if os.path.exists(target):
+        raise ValueError(f"La versión {version} ya existe en {registry.root}")
+    temp_dir = os.path.join(registry.root, f".{version}.tmp")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    # Sin comprimir, igual que los artefactos originales
+    joblib.dump(model, os.path.join(temp_dir, MODEL_FILE))
+    joblib.dump(scaler, os.path.join(temp_dir, SCALER_FILE))
+    with open(os.path.join(temp_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    if warmup_sessions:
+        with open(os.path.join(temp_dir, WARMUP_FILE), "w", encoding="utf-8") as f:
+            json.dump(warmup_sessions, f, ensure_ascii=False)
+    os.rename(temp_dir, target)
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena una versión nueva del modelo de anomalías")
+    parser.add_argument("input", nargs="?", help="Export de sesiones (arreglo JSON o NDJSON); '-' para stdin")
+    parser.add_argument("--api-url", help="Descargar las sesiones de la API del backend en lugar de un export")
+    parser.add_argument("--page-size", type=int, default=1000, help="Sesiones por página de la API")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Sesiones por bloque de extracción")
+    parser.add_argument("--feature-cache", default="cache/training_features.npz",
+                        help="Caché columnar de características ('' para desactivarla)")
+    parser.add_argument("--version", help="Nombre de la versión (por defecto fecha y hora UTC)")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Procesos para ajustar el bosque (-1 = todos)")
+    parser.add_argument("--contamination", type=float, default=DEFAULT_CONTAMINATION)
+    parser.add_argument("--n-estimators", type=int, default=DEFAULT_N_ESTIMATORS)
+    parser.add_argument("--random-state", type=int, default=DEFAULT_RANDOM_STATE)
+    parser.add_argument("--activate", action="store_true", help="Marcar la versión como activa (ACTIVE)")
+    args = parser.parse_args()
+
+    if (args.input is None) == (args.api_url is None):
+        parser.error("Indica un export de sesiones o --api-url")
+    registry = create_model_registry()
+    version = args.version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    if os.path.exists(registry.version_dir(version)):
+        parser.error(f"La versión {version} ya existe en {registry.root}")
+
+    start = time.perf_counter()
+    cache = FeatureCache(args.feature_cache or None)
+    if args.api_url:
+        sessions = iter_api_sessions(args.api_url, args.page_size)
+        source = args.api_url
+    else:
+        input_stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        sessions = iter_sessions(input_stream)
+        source = args.input
+    warmup_sessions: List[Dict[str, Any]] = []
+    sessions = sample_sessions(sessions, warmup_sessions, settings.MODEL_WARMUP_SESSIONS)
+
+    try:
+        session_ids, markers, matrix, counts = build_feature_matrix(sessions, cache, args.chunk_size)
+    finally:
+        if not args.api_url and input_stream is not sys.stdin:
+            input_stream.close()
+    if args.feature_cache:
+        FeatureCache.save(args.feature_cache, session_ids, markers, matrix)
+    extraction_seconds = time.perf_counter() - start
+    print(
+        f"🔧 {counts['total']} sesiones: {counts['cached']} desde la caché, "
+        f"{counts['extracted']} extraídas, {counts['failed']} con error ({extraction_seconds:.1f} s)",
+        file=sys.stderr
+    )
+    if len(matrix) < 2:
+        raise SystemExit("❌ No hay suficientes sesiones válidas para entrenar")
+
+    fit_start = time.perf_counter()
+    scaler, model = fit_models(matrix, args.n_jobs, args.contamination, args.n_estimators, args.random_state)
+    matrix_scaled = scaler.transform(matrix)
+    scores = model.score_samples(matrix_scaled)
+    anomaly_rate = float(np.mean(scores < model.offset_))  # mismo criterio que model.predict
+    fit_seconds = time.perf_counter() - fit_start
+
+    metadata = {
+        "version": version,
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "source": source,
+        "features": FeatureExtractor.MODEL_FEATURES,
+        "sessions": counts,
+        "training_rows": int(len(matrix)),
+        "anomaly_rate": anomaly_rate,
+        "params": {
+            "contamination": args.contamination,
+            "n_estimators": args.n_estimators,
+            "random_state": args.random_state,
+        },
+        "timings_seconds": {"extraction": extraction_seconds, "fit": fit_seconds},
+        # Distribuciones de entrenamiento con las que se compara el tráfico en vivo (GET /anomaly/drift)
+        "drift_reference": build_reference(matrix, scores, anomaly_rate),
+    }
+    target = write_version(registry, version, scaler, model, metadata, warmup_sessions)
+    if args.activate:
+        registry.set_active(version)
+    print(
+        f"✅ Versión {version} en {target} ({len(matrix)} sesiones, "
+        f"{anomaly_rate:.1%} anómalas, ajuste en {fit_seconds:.1f} s)"
+        + (" — activa" if args.activate else ""),
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
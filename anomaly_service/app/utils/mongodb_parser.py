@@ -1,8 +1,15 @@
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Union
 from datetime import datetime
 
 class MongoDBParser:
-    """Utilidades para parsear formato de MongoDB"""
+    """
+    Utilidades para parsear formato de MongoDB
+
+    `parse_date`, `parse_number` y `parse_object_id` son los conversores
+    originales, campo por campo: ante un valor mal formado devuelven el valor
+    por defecto sin lanzar ni escribir en la salida. El servicio usa
+    `decode_value` y `convert_session_data`, que reportan el error.
+    """
     
     @staticmethod
     def parse_date(date_dict: Dict[str, Any]) -> Union[float, datetime]:
@@ -37,8 +44,7 @@ class MongoDBParser:
                 
                 return timestamp_seconds
             return 0.0
-        except Exception as e:
-            print(f"Error parseando fecha: {e}")
+        except Exception:
             return 0.0
     
     @staticmethod
@@ -64,8 +70,7 @@ class MongoDBParser:
                 return float(number_dict['$numberDouble'])
             else:
                 return 0.0
-        except Exception as e:
-            print(f"Error parseando número: {e}")
+        except Exception:
             return 0.0
     
     @staticmethod
@@ -86,42 +91,165 @@ class MongoDBParser:
                 return oid_dict
             else:
                 return str(oid_dict)
-        except Exception as e:
-            print(f"Error parseando ObjectId: {e}")
+        except Exception:
             return str(oid_dict)
     
+    @staticmethod
+    def is_extended_json(session_data: Dict[str, Any]) -> bool:
+        """
+        Indica si una sesión viene en formato MongoDB Extended JSON
+        
+        Args:
+            session_data: Sesión en formato MongoDB o JSON estándar
+            
+        Returns:
+            True si los campos de fecha o numéricos vienen envueltos ($date, $numberInt, ...)
+        """
+        for key in ("date", "totalDuration", "totalRestTime", "createdAt"):
+            if isinstance(session_data.get(key), dict):
+                return True
+        return False
+    
+    @staticmethod
+    def decode_value(value: Any) -> Any:
+        """
+        Decodifica recursivamente un valor en MongoDB Extended JSON
+
+        Los envoltorios `$numberInt`, `$numberLong`, `$numberDouble`,
+        `$numberDecimal`, `$date` y `$oid` se reemplazan por su valor (int,
+        float, segundos desde epoch o string) a cualquier profundidad,
+        incluidos los sets de cada ejercicio y `statistics`. El documento se
+        recorre una sola vez y se construye una única copia; el original no se
+        modifica.
+
+        Raises:
+            ValueError: Si un envoltorio contiene un valor no convertible
+        """
+        return _decode(value)
+    
     @staticmethod
     def convert_session_data(session_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Convierte una sesión completa del formato MongoDB al formato estándar
         
+        Solo se decodifican los campos que usa el servicio; los ejercicios y
+        sus sets quedan con valores numéricos, listos para el FeatureExtractor.
+        
         Args:
             session_data: Sesión en formato MongoDB
             
         Returns:
             Sesión en formato estándar
-        """
-        try:
-            converted = {
-                "userId": session_data.get("userId", ""),
-                "date": MongoDBParser.parse_date(session_data.get("date", {})),
-                "startTime": MongoDBParser.parse_date(session_data.get("startTime", {})),
-                "endTime": MongoDBParser.parse_date(session_data.get("endTime", {})),
-                "totalDuration": MongoDBParser.parse_number(session_data.get("totalDuration", 0)),
-                "totalRestTime": MongoDBParser.parse_number(session_data.get("totalRestTime", 0)),
-                "totalSets": MongoDBParser.parse_number(session_data.get("totalSets", 0)),
-                "exercises": session_data.get("exercises", []),
-                "statistics": session_data.get("statistics", {}),
-                "createdAt": MongoDBParser.parse_date(session_data.get("createdAt", {})),
-                "updatedAt": MongoDBParser.parse_date(session_data.get("updatedAt", {}))
-            }
-            
-            # Procesar ObjectId si existe
-            if "_id" in session_data:
-                converted["_id"] = MongoDBParser.parse_object_id(session_data["_id"])
             
-            return converted
-            
-        except Exception as e:
-            print(f"Error convirtiendo sesión: {e}")
-            return session_data 
\ No newline at end of file
+        Raises:
+            ValueError: Si algún envoltorio de la sesión está mal formado
+        """
+        get = session_data.get
+        converted = {
+            "userId": _decode(get("userId", "")),
+            "date": _to_seconds(get("date")),
+            "startTime": _to_seconds(get("startTime")),
+            "endTime": _to_seconds(get("endTime")),
+            "totalDuration": _to_float(get("totalDuration", 0)),
+            "totalRestTime": _to_float(get("totalRestTime", 0)),
+            "totalSets": _to_float(get("totalSets", 0)),
+            "exercises": _decode(get("exercises", [])),
+            "statistics": _decode(get("statistics", {})),
+            "createdAt": _to_seconds(get("createdAt")),
+            "updatedAt": _to_seconds(get("updatedAt"))
+        }
+        
+        # Procesar ObjectId si existe
+        session_id = get("_id")
+        if session_id is not None:
+            converted["_id"] = str(_decode(session_id))
+        
+        return converted
+
+
+def _decode_date(value: Any) -> float:
+    """Contenido de `$date` (milisegundos envueltos o no, o fecha ISO) en segundos desde epoch"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    return float(_decode(value)) / 1000
+
+
+def _decode_number(value: Any) -> float:
+    return float(value)
+
+
+def _decode_int(value: Any) -> int:
+    return int(value)
+
+
+# Envoltorio de un solo campo -> conversión de su contenido
+_WRAPPERS = {
+    "$numberInt": _decode_int,
+    "$numberLong": _decode_int,
+    "$numberDouble": _decode_number,
+    "$numberDecimal": _decode_number,
+    "$date": _decode_date,
+    "$oid": str,
+}
+
+
+def _decode(value: Any) -> Any:
+    value_type = type(value)
+    if value_type is dict:
+        return _decode_dict(value)
+    if value_type is list:
+        return _decode_list(value)
+    return value
+
+
+def _decode_dict(value: Dict[str, Any]) -> Any:
+    if len(value) == 1:
+        for key, inner in value.items():
+            decoder = _WRAPPERS.get(key)
+            if decoder is not None:
+                try:
+                    return decoder(inner)
+                except (TypeError, ValueError, OverflowError) as e:
+                    raise ValueError(f"Valor {key} inválido: {inner!r}") from e
+    # Las hojas (la mayoría de los valores) se copian sin llamada recursiva
+    decoded = {}
+    for key, item in value.items():
+        item_type = type(item)
+        if item_type is dict:
+            item = _decode_dict(item)
+        elif item_type is list:
+            item = _decode_list(item)
+        decoded[key] = item
+    return decoded
+
+
+def _decode_list(value: List[Any]) -> List[Any]:
+    decoded = []
+    for item in value:
+        item_type = type(item)
+        if item_type is dict:
+            item = _decode_dict(item)
+        elif item_type is list:
+            item = _decode_list(item)
+        decoded.append(item)
+    return decoded
+
+
+def _to_seconds(value: Any) -> float:
+    """Campo de fecha de la sesión en segundos desde epoch (0.0 si falta)"""
+    if value is None:
+        return 0.0
+    decoded = _decode(value)
+    if isinstance(decoded, str):
+        return _decode_date(decoded)
+    if isinstance(decoded, (int, float)):
+        return float(decoded)
+    return 0.0
+
+
+def _to_float(value: Any) -> float:
+    """Campo numérico de la sesión como float"""
+    decoded = _decode(value)
+    if isinstance(decoded, dict):
+        return 0.0
+    return float(decoded)
@@ -0,0 +1,194 @@
+import json
+import re
+from typing import Any, AsyncIterator, Iterable, Iterator, List, TextIO
+
+# Caracteres leídos por cada lectura del archivo
+READ_SIZE = 1 << 16
+# Tamaño máximo de un valor (una sesión) en caracteres
+MAX_VALUE_SIZE = 1 << 24
+# Tamaño máximo de una línea NDJSON recibida por HTTP, en bytes
+MAX_LINE_BYTES = 1 << 20
+
+_WHITESPACE = " \t\r\n"
+# Lo que puede quedar tras la posición del error si el valor solo está cortado:
+# un número o un literal a medias (o nada)
+_TRUNCATED_TOKEN = re.compile(
+    r"[-+.0-9eE]*|t(r(ue?)?)?|f(a(l(se?)?)?)?|n(u(ll?)?)?|N(aN?)?|I(n(f(i(n(i(ty?)?)?)?)?)?)?"
+)
+
+
+class SessionStreamReader:
+    """
+    Lee sesiones de un export de forma incremental con memoria acotada
+
+    Soporta:
+        - Arreglo JSON estándar (`[{...}, {...}]`), como sessions_all.json
+        - NDJSON / JSON Lines (un objeto por línea) o objetos concatenados
+    Las sesiones se devuelven tal como vienen; las que estén en MongoDB
+    Extended JSON se convierten después con MongoDBParser.
+    """
+
+    def __init__(self, stream: TextIO, read_size: int = READ_SIZE, max_value_size: int = MAX_VALUE_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.max_value_size = max_value_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        if not self._skip_whitespace():
+            return
+        if self._buffer[self._pos] == "[":
+            self._pos += 1
+            yield from self._iter_array()
+        else:
+            yield from self._iter_concatenated()
+
+    def _fill(self) -> bool:
+        """Lee más texto del archivo descartando lo ya consumido; False si no hay más"""
+        if self._eof:
+            return False
+        chunk = self.stream.read(self.read_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _skip_whitespace(self) -> bool:
+        """Avanza hasta el siguiente carácter significativo; False al llegar al final"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return True
+            if not self._fill():
+                return False
+
+    def _is_truncated(self, error: json.JSONDecodeError) -> bool:
+        """Si el error se debe a que el buffer corta el valor (y no a JSON inválido)"""
+        if error.msg.startswith("Unterminated string"):
+            return True
+        if error.msg.startswith("Invalid \\uXXXX escape") and len(self._buffer) - error.pos < 6:
+            return True
+        return _TRUNCATED_TOKEN.fullmatch(self._buffer, error.pos) is not None
+
+    def _decode_value(self) -> Any:
+        """
+        Decodifica el siguiente valor JSON, leyendo más texto si el valor está incompleto
+
+        Solo se lee más si el error está al final del buffer; un error en medio
+        es JSON inválido y se lanza sin leer el resto del archivo. Un valor de
+        más de `max_value_size` caracteres lanza ValueError.
+        """
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if not self._is_truncated(e):
+                    raise
+                if len(self._buffer) - self._pos > self.max_value_size:
+                    raise ValueError(f"Valor JSON de más de {self.max_value_size} caracteres") from e
+                if not self._fill():
+                    raise
+                continue
+            # Un número al final del buffer podría continuar en la siguiente lectura
+            if end == len(self._buffer) and not self._eof and not isinstance(value, (dict, list, str)):
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    def _iter_array(self) -> Iterator[Any]:
+        if not self._skip_whitespace():
+            raise ValueError("Arreglo JSON sin cerrar")
+        if self._buffer[self._pos] == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            if not self._skip_whitespace():
+                raise ValueError("Arreglo JSON sin cerrar")
+            separator = self._buffer[self._pos]
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Se esperaba ',' o ']' y se encontró {separator!r}")
+            if not self._skip_whitespace():
+                raise ValueError("Arreglo JSON sin cerrar")
+
+    def _iter_concatenated(self) -> Iterator[Any]:
+        while self._skip_whitespace():
+            yield self._decode_value()
+
+
+def iter_sessions(stream: TextIO) -> Iterator[Any]:
+    """Itera las sesiones de un export (arreglo JSON o NDJSON) sin cargarlo completo"""
+    return iter(SessionStreamReader(stream))
+
+
+def iter_chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Agrupa un iterable en listas de tamaño fijo (la última puede ser menor)"""
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def aiter_ndjson(byte_chunks: AsyncIterator[bytes],
+                       max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Any]:
+    """
+    Decodifica un cuerpo NDJSON que llega por partes (p. ej. request.stream())
+
+    Cada línea no vacía produce su valor decodificado; una línea inválida
+    produce la excepción en su lugar para que quien consume la reporte sin
+    cortar el stream. Una línea de más de `max_line_bytes` bytes produce un
+    ValueError y se descarta sin acumularla. Los saltos de línea se buscan
+    solo en los bytes nuevos de cada parte.
+    """
+    pending = bytearray()
+    oversized = False  # la línea en curso ya superó el máximo: se descarta hasta el próximo salto
+    async for data in byte_chunks:
+        start = 0
+        while True:
+            newline = data.find(b"\n", start)
+            if newline == -1:
+                break
+            if oversized or len(pending) + newline - start > max_line_bytes:
+                yield _line_too_long(max_line_bytes)
+            else:
+                pending += data[start:newline]
+                if pending.strip():
+                    yield _decode_line(pending)
+            pending.clear()
+            oversized = False
+            start = newline + 1
+        if not oversized:
+            if len(pending) + len(data) - start > max_line_bytes:
+                oversized = True
+                pending.clear()
+            else:
+                pending += data[start:]
+    if oversized:
+        yield _line_too_long(max_line_bytes)
+    elif pending.strip():
+        yield _decode_line(pending)
+
+
+def _line_too_long(max_line_bytes: int) -> ValueError:
+    return ValueError(f"La línea supera el máximo de {max_line_bytes} bytes")
+
+
+def _decode_line(line: bytearray) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
@@ -1,18 +1,56 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import time
 
 from app.core.config import settings
+from app.api.middleware import MetricsMiddleware
 from app.api.routes import api_router
+from app.api.endpoints.anomaly import scoring_pipeline, prediction_executor, micro_batcher, model_manager, job_runner
+from app.services.metrics import metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gestión del ciclo de vida de la aplicación"""
     # Startup
     print("🚀 Iniciando servicio de detección de anomalías...")
+    start = time.perf_counter()
+    predictor = scoring_pipeline.anomaly_predictor
+    if predictor.is_loaded:
+        # Modo pre-fork: el padre ya cargó el modelo y los workers comparten sus páginas
+        print(f"✅ Modelo {predictor.model_version} precargado ({predictor.scoring_engine})")
+    else:
+        model_manager.load_active()
+        predictor = scoring_pipeline.anomaly_predictor
+        print(f"✅ Modelo {predictor.model_version} cargado ({predictor.scoring_engine}) "
+              f"en {(time.perf_counter() - start) * 1000:.0f} ms")
+    model_manager.start_watcher(settings.MODEL_WATCH_INTERVAL_SECONDS)
+    prediction_executor.start()
+    if settings.MICROBATCH_ENABLED:
+        micro_batcher.start()
+    if job_runner is not None:
+        job_runner.start()
+    if scoring_pipeline.session_store is not None:
+        scoring_pipeline.session_store.start()
+    if scoring_pipeline.drift_monitor is not None:
+        scoring_pipeline.drift_monitor.start(settings.DRIFT_CHECK_INTERVAL_SECONDS)
     yield
     # Shutdown
     print("🛑 Cerrando servicio de detección de anomalías...")
+    await model_manager.stop()
+    if scoring_pipeline.drift_monitor is not None:
+        await scoring_pipeline.drift_monitor.stop()
+    await micro_batcher.stop()
+    if job_runner is not None:
+        await job_runner.stop()
+    prediction_executor.shutdown()
+    if scoring_pipeline.session_store is not None:
+        scoring_pipeline.session_store.stop()
+    if scoring_pipeline.user_baselines is not None and scoring_pipeline.user_baselines.path:
+        scoring_pipeline.user_baselines.save()
+    if scoring_pipeline.progression_index is not None and scoring_pipeline.progression_index.path:
+        scoring_pipeline.progression_index.save()
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -31,6 +69,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Conteo, errores y latencia por endpoint (GET /metrics)
+if metrics is not None:
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
 # Incluir rutas de la API
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -53,16 +95,45 @@ async def info():
         "description": settings.DESCRIPTION,
         "endpoints": {
             "predict_anomaly": f"{settings.API_V1_STR}/anomaly/predict",
+            "predict_anomaly_batch": f"{settings.API_V1_STR}/anomaly/predict-batch",
             "test_features": f"{settings.API_V1_STR}/anomaly/test-features",
-            "health": f"{settings.API_V1_STR}/anomaly/health"
+            "health": f"{settings.API_V1_STR}/anomaly/health",
+            "stats": f"{settings.API_V1_STR}/anomaly/stats",
+            "models": f"{settings.API_V1_STR}/anomaly/models",
+            "jobs": f"{settings.API_V1_STR}/anomaly/jobs",
+            "history": f"{settings.API_V1_STR}/anomaly/history",
+            "drift": f"{settings.API_V1_STR}/anomaly/drift",
+            "metrics": "/metrics"
         }
     }
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Métricas del servicio en el formato de texto de Prometheus"""
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Las métricas están desactivadas (METRICS_ENABLED=false)")
+    # Algunos gauges consultan SQLite (trabajos por estado): fuera del event loop
+    content = await asyncio.to_thread(metrics.render)
+    return Response(content=content, media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=settings.DEBUG
-    )
+    from app.core.prefork import PreforkServer, worker_count
+    workers = worker_count()
+    if workers == 1:
+        import uvicorn
+        uvicorn.run(
+            "main:app",
+            host=settings.HOST,
+            port=settings.PORT,
+            reload=settings.DEBUG,
+            timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+            access_log=settings.SERVER_ACCESS_LOG
+        )
+    else:
+        PreforkServer(
+            app,
+            workers=workers,
+            preload=model_manager.load_active if settings.SERVER_PRELOAD else None,
+            host=settings.HOST,
+            port=settings.PORT
+        ).run()
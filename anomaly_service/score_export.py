@@ -0,0 +1,72 @@
+"""
+Re-scoring de exports de sesiones por streaming
+
+Lee un export (arreglo JSON, como sessions_all.json, o NDJSON; JSON estándar
+o MongoDB Extended JSON) de forma incremental, lo puntúa por bloques de
+tamaño fijo y escribe un resultado por sesión en NDJSON. La memoria máxima
+depende del tamaño de bloque, no del tamaño del export.
+
+Uso:
+    python score_export.py sessions_all.json -o scored.ndjson
+    cat export.ndjson | python score_export.py - > scored.ndjson
+"""
+import argparse
+import resource
+import sys
+import time
+
+from app.services.feature_extractor import FeatureExtractor
+from app.services.model_registry import create_model_registry
+from app.services.scoring_pipeline import ScoringPipeline
+from app.utils.session_stream import iter_sessions, iter_chunks
+
+
+def score_stream(input_stream, output_stream, pipeline: ScoringPipeline, chunk_size: int) -> dict:
+    """
+    Puntúa todas las sesiones de `input_stream` y escribe los resultados en `output_stream`
+
+    Returns:
+        dict: Totales de sesiones procesadas, correctas y con error
+    """
+    total = failed = 0
+    for chunk in iter_chunks(iter_sessions(input_stream), chunk_size):
+        for item in pipeline.score_sessions(chunk, first_index=total):
+            output_stream.write(item.model_dump_json())
+            output_stream.write("\n")
+            failed += item.error is not None
+        total += len(chunk)
+    return {"total": total, "succeeded": total - failed, "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntúa un export de sesiones y escribe NDJSON")
+    parser.add_argument("input", help="Export de sesiones (arreglo JSON o NDJSON); '-' para stdin")
+    parser.add_argument("-o", "--output", default="-", help="Archivo NDJSON de salida; '-' para stdout")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Sesiones por bloque")
+    args = parser.parse_args()
+
+    registry = create_model_registry()
+    pipeline = ScoringPipeline(FeatureExtractor(), registry.create_predictor(registry.active_version()))
+    input_stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output_stream = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    start = time.perf_counter()
+    try:
+        totals = score_stream(input_stream, output_stream, pipeline, args.chunk_size)
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"✅ {totals['total']} sesiones ({totals['succeeded']} correctas, {totals['failed']} con error) "
+        f"en {elapsed:.1f} s, RSS máximo {peak_rss_mb:.0f} MB",
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import copy
+import json
+import os
+import tempfile
+
+# Antes de importar la aplicación (Settings se lee al importar): todo el estado en un directorio temporal
+TEST_DIRECTORY = tempfile.mkdtemp(prefix="anomaly_tests_")
+os.environ.update({
+    "RESULT_CACHE_ENABLED": "false",
+    "USER_BASELINES_PATH": "",
+    "PROGRESSION_PATH": "",
+    "SESSION_STORE_PATH": os.path.join(TEST_DIRECTORY, "sessions.sqlite"),
+    "JOBS_PATH": os.path.join(TEST_DIRECTORY, "jobs.sqlite"),
+    "MODEL_REGISTRY_DIR": os.path.join(TEST_DIRECTORY, "registry"),
+    "MODEL_WATCH_INTERVAL_SECONDS": "0",
+    "METRICS_ENABLED": "true",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+
+SERVICE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_sample(name: str):
+    with open(os.path.join(SERVICE_DIRECTORY, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def pipeline(client):
+    from app.api.endpoints.anomaly import scoring_pipeline
+    return scoring_pipeline
+
+
+@pytest.fixture
+def real_session():
+    """Sesión de ejemplo en JSON estándar (copia modificable)"""
+    return copy.deepcopy(load_sample("test_real_session.json"))
+
+
+@pytest.fixture
+def extended_session():
+    """Sesión de ejemplo en MongoDB Extended JSON (copia modificable)"""
+    return copy.deepcopy(load_sample("test_session.json"))
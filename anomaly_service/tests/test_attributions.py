@@ -0,0 +1,18 @@
+import math
+
+import pytest
+
+from app.services.compiled_forest import average_path_length
+
+
+def test_attributions_sum_to_depth_saved_over_the_forest(client, pipeline, real_session):
+    response = client.post("/api/v1/anomaly/predict-real", json=real_session)
+    assert response.status_code == 200
+    result = response.json()
+
+    # score = -2^(-profundidad media / c(n))  =>  c(n) - profundidad media = c(n) * (1 + log2(-score))
+    c = average_path_length([pipeline.anomaly_predictor.model.max_samples_])[0]
+    expected = c * (1 + math.log2(-result["risk_score"]))
+    attributions = result["feature_attributions"]
+    assert sum(attributions.values()) == pytest.approx(expected, abs=1e-3)
+    assert list(attributions.values()) == sorted(attributions.values(), reverse=True)
@@ -0,0 +1,17 @@
+def test_malformed_session_fails_in_its_own_slot(client, real_session, extended_session):
+    incomplete = dict(real_session)
+    del incomplete["exercises"]
+    sessions = [real_session, {"foo": 1}, extended_session, incomplete, "no es un objeto"]
+
+    response = client.post("/api/v1/anomaly/predict-batch", json={"sessions": sessions})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["succeeded"], body["failed"]) == (5, 2, 3)
+
+    results = body["results"]
+    assert [item["index"] for item in results] == [0, 1, 2, 3, 4]
+    for position in (0, 2):
+        assert results[position]["error"] is None and results[position]["result"] is not None
+    assert results[1]["result"] is None and "userId" in results[1]["error"]
+    assert results[3]["result"] is None and "exercises" in results[3]["error"]
+    assert "objeto JSON" in results[4]["error"]
@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from conftest import SERVICE_DIRECTORY, TEST_DIRECTORY
+
+from app.services.anomaly_predictor import AnomalyPredictor
+from app.services.feature_extractor import FeatureExtractor
+
+
+def make_predictor(scoring_engine):
+    return AnomalyPredictor(
+        scoring_engine=scoring_engine,
+        compiled_path=os.path.join(TEST_DIRECTORY, f"parity_{scoring_engine}.joblib"),
+        attributions=False,
+    )
+
+
+@pytest.fixture(scope="module")
+def reference():
+    """Predictor sklearn: su modelo y scaler son la referencia de todas las comparaciones"""
+    return make_predictor("sklearn")
+
+
+@pytest.fixture(scope="module")
+def training_features():
+    extractor = FeatureExtractor()
+    with open(os.path.join(SERVICE_DIRECTORY, "sessions_all.json")) as f:
+        sessions = json.load(f)
+    return np.vstack([
+        extractor.to_model_array(features)
+        for features in extractor.extract_features_batch(sessions)
+        if not isinstance(features, Exception)
+    ])
+
+
+@pytest.fixture(scope="module")
+def scaled_inputs(reference, training_features):
+    """Filas ya escaladas: entrenamiento, al azar, repetidas, fuera de rango y sobre los umbrales"""
+    rng = np.random.default_rng(0)
+    scaled = reference.scaler.transform(training_features)
+    low, high = scaled.min(axis=0), scaled.max(axis=0)
+    n_features = scaled.shape[1]
+
+    tree = reference.model.estimators_[0].tree_
+    split_nodes = np.flatnonzero(tree.children_left != -1)
+    on_thresholds = np.tile(scaled.mean(axis=0), (len(split_nodes), 1))
+    on_thresholds[np.arange(len(split_nodes)), tree.feature[split_nodes]] = tree.threshold[split_nodes]
+
+    return {
+        "entrenamiento": scaled,
+        "al azar": rng.uniform(low, high, size=(500, n_features)),
+        "repetidas": np.tile(scaled[0], (64, 1)),
+        "fuera de rango": np.vstack([
+            high + rng.uniform(1, 1000, size=(50, n_features)),
+            low - rng.uniform(1, 1000, size=(50, n_features)),
+            np.where(rng.random((50, n_features)) < 0.5, high * 100, low * 100),
+        ]),
+        "sobre los umbrales": on_thresholds,
+    }
+
+
+INPUT_SETS = ["entrenamiento", "al azar", "repetidas", "fuera de rango", "sobre los umbrales"]
+
+
+@pytest.mark.parametrize("input_set", INPUT_SETS)
+def test_sklearn_single_traversal_matches_sklearn(reference, scaled_inputs, input_set):
+    X = scaled_inputs[input_set]
+    is_anomaly, scores, attributions = reference._score(X)
+
+    np.testing.assert_allclose(scores, reference.model.score_samples(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(np.where(is_anomaly, -1, 1), reference.model.predict(X))
+    assert attributions is None
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return make_predictor("compiled")
+
+
+@pytest.mark.parametrize("input_set", INPUT_SETS)
+def test_compiled_forest_matches_sklearn(reference, compiled, scaled_inputs, input_set):
+    X = scaled_inputs[input_set]
+    forest = compiled.compiled_model
+
+    np.testing.assert_allclose(forest.score_samples(X), reference.model.score_samples(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(forest.predict(X), reference.model.predict(X))
+    is_anomaly, scores, _ = compiled._score(X)
+    np.testing.assert_allclose(scores, reference.model.score_samples(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(np.where(is_anomaly, -1, 1), reference.model.predict(X))
+
+
+def test_compiled_engine_scales_like_the_sklearn_scaler(reference, compiled, training_features):
+    rng = np.random.default_rng(1)
+    features = np.vstack([
+        training_features,
+        training_features * rng.uniform(0, 20, size=training_features.shape),  # fuera del rango de entrenamiento
+        np.zeros((1, training_features.shape[1])),
+    ])
+    expected = reference.model.score_samples(reference.scaler.transform(features))
+
+    is_anomaly, scores = compiled.predict_batch(features)
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(is_anomaly, expected < reference.model.offset_)
+
+
+def test_compiled_artifact_reloaded_with_mmap_matches(reference, compiled, scaled_inputs):
+    reloaded = make_predictor("compiled")  # abre el artefacto que guardó `compiled`
+    assert reloaded.model is None  # sin sklearn: solo el artefacto
+    X = scaled_inputs["al azar"]
+    np.testing.assert_allclose(reloaded.compiled_model.score_samples(X), reference.model.score_samples(X),
+                               rtol=0, atol=1e-12)
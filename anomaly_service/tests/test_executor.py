@@ -0,0 +1,48 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.executor import ExecutorSaturatedError, PredictionExecutor
+
+
+def blocking_pipeline(release):
+    return SimpleNamespace(wait=lambda value: release.wait(5) and value)
+
+
+def test_run_rejects_tasks_beyond_workers_plus_queue():
+    release = threading.Event()
+    executor = PredictionExecutor(blocking_pipeline(release), max_workers=1, max_queue=1)
+
+    async def scenario():
+        running = [asyncio.create_task(executor.run("wait", value)) for value in (1, 2)]
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == executor.capacity == 2
+        with pytest.raises(ExecutorSaturatedError, match="máximo 2"):
+            await executor.run("wait", 3)
+        release.set()
+        return await asyncio.gather(*running)
+
+    try:
+        assert asyncio.run(scenario()) == [1, 2]
+    finally:
+        executor.shutdown()
+    assert executor.in_flight == 0
+
+
+def test_saturated_executor_responds_503(client, monkeypatch, real_session):
+    from app.api.endpoints.anomaly import prediction_executor
+
+    monkeypatch.setattr(prediction_executor, "_in_flight", prediction_executor.capacity)
+    responses = [
+        client.post("/api/v1/anomaly/predict-real", json=real_session),
+        client.post("/api/v1/anomaly/predict-batch", json={"sessions": [real_session]}),
+    ]
+    for response in responses:
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert "saturado" in response.json()["detail"]
+
+    monkeypatch.setattr(prediction_executor, "_in_flight", 0)
+    assert client.post("/api/v1/anomaly/predict-real", json=real_session).status_code == 200
@@ -0,0 +1,72 @@
+import copy
+import json
+import os
+
+import pytest
+
+from conftest import SERVICE_DIRECTORY
+
+from app.services.feature_extractor import FeatureExtractor
+
+
+def with_exercises(session, exercises):
+    edited = copy.deepcopy(session)
+    edited["exercises"] = exercises
+    return edited
+
+
+def edge_sessions(real_session):
+    first = real_session["exercises"][0]
+    single_set = {**first, "sets": [first["sets"][0]]}
+    not_completed = {**first, "sets": [{**s, "completed": False} for s in first["sets"]]}
+    return {
+        "sin ejercicios": with_exercises(real_session, []),
+        "ejercicio sin sets": with_exercises(real_session, [{**first, "sets": []}]),
+        "sets no completados": with_exercises(real_session, [not_completed]),
+        "un solo set": with_exercises(real_session, [single_set]),
+        "completados y no completados": with_exercises(real_session, [single_set, not_completed]),
+        "sesión completa": real_session,
+    }
+
+
+def assert_same_features(batch_features, single_features):
+    assert list(batch_features) == list(single_features)
+    for name, value in single_features.items():
+        assert batch_features[name] == value, name
+
+
+def test_batch_matches_single_session_on_edge_cases(real_session):
+    extractor = FeatureExtractor()
+    sessions = edge_sessions(real_session)
+    batch = extractor.extract_features_batch(list(sessions.values()))
+
+    for (case, session), batch_features in zip(sessions.items(), batch):
+        single_features = extractor.extract_features_from_session(session)
+        assert not isinstance(batch_features, Exception), case
+        assert_same_features(batch_features, single_features)
+
+    single_set = batch[list(sessions).index("un solo set")]
+    assert (single_set["total_sets"], single_set["std_weight"], single_set["std_reps"]) == (1, 0, 0)
+    for case in ("sin ejercicios", "ejercicio sin sets", "sets no completados"):
+        empty = batch[list(sessions).index(case)]
+        assert (empty["total_sets"], empty["avg_weight"], empty["total_volume"], empty["rest_per_set"]) == (0, 0, 0, 0)
+
+
+def test_batch_matches_single_session_on_the_sample_export():
+    extractor = FeatureExtractor()
+    with open(os.path.join(SERVICE_DIRECTORY, "sessions_all.json")) as f:
+        sessions = json.load(f)
+
+    for session, batch_features in zip(sessions, extractor.extract_features_batch(sessions)):
+        assert_same_features(batch_features, extractor.extract_features_from_session(session))
+
+
+def test_invalid_session_fails_only_its_own_position(real_session):
+    extractor = FeatureExtractor()
+    broken = with_exercises(real_session, [{"muscleGroup": "PECHO", "sets": [{"reps": "x"}]}])
+    outcomes = extractor.extract_features_batch([real_session, broken, real_session])
+
+    assert isinstance(outcomes[1], ValueError)
+    with pytest.raises(ValueError):
+        extractor.extract_features_from_session(broken)
+    assert_same_features(outcomes[2], extractor.extract_features_from_session(real_session))
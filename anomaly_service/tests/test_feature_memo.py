@@ -0,0 +1,60 @@
+import copy
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import SERVICE_DIRECTORY
+
+from app.services.feature_memo import FeatureMemo
+
+
+@pytest.fixture(scope="module")
+def features(pipeline):
+    extractor = pipeline.feature_extractor
+    with open(os.path.join(SERVICE_DIRECTORY, "sessions_all.json")) as f:
+        sessions = json.load(f)
+    rows = [extractor.to_model_array(row) for row in extractor.extract_features_batch(sessions)]
+    # Filas repetidas dentro de la misma matriz
+    return np.vstack(rows + rows[:5])
+
+
+def predictor_with(pipeline, feature_memo):
+    predictor = copy.copy(pipeline.anomaly_predictor)
+    predictor.feature_memo = feature_memo
+    return predictor
+
+
+@pytest.mark.parametrize("explain", [False, True])
+def test_memoized_results_match_a_fresh_score(pipeline, features, explain):
+    memo = FeatureMemo(max_entries=1000)
+    memoized = predictor_with(pipeline, memo)
+    fresh = predictor_with(pipeline, None).predict_batch(features, explain)
+
+    for _ in range(2):
+        for expected, actual in zip(fresh, memoized.predict_batch(features, explain)):
+            np.testing.assert_array_equal(actual, expected)
+    stats = memo.stats()
+    assert stats["misses"] == stats["hits"] == len(features)
+
+
+def test_concurrent_lookups_count_every_lookup(features):
+    memo = FeatureMemo(max_entries=1000)
+    keys = FeatureMemo.keys(features[:4])
+    memo.set_many([(key, (False, 0.5, None)) for key in keys[:2]])
+    threads_count, rounds = 8, 300
+
+    def lookup():
+        for _ in range(rounds):
+            memo.get_many(keys)
+
+    threads = [threading.Thread(target=lookup) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = memo.stats()
+    assert stats["hits"] == stats["misses"] == threads_count * rounds * 2
@@ -0,0 +1,155 @@
+import asyncio
+import http.server
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from conftest import TEST_DIRECTORY
+
+from app.services.executor import ExecutorSaturatedError
+from app.core.config import settings
+from app.services.job_queue import (
+    DONE, FAILED, CallbackRejectedError, JobRunner, JobStore, callback_error_message, post_callback
+)
+
+
+class SaturatedExecutor:
+    """Executor saturado durante `busy_seconds`; después puntúa con el pipeline real"""
+
+    def __init__(self, pipeline, busy_seconds):
+        self.pipeline = pipeline
+        self.busy_until = time.monotonic() + busy_seconds
+
+    async def run(self, method, *args):
+        if time.monotonic() < self.busy_until:
+            raise ExecutorSaturatedError("saturado")
+        return getattr(self.pipeline, method)(*args)
+
+
+def test_job_waiting_on_saturated_executor_keeps_its_lease(pipeline, real_session):
+    store = JobStore(os.path.join(TEST_DIRECTORY, "jobs_lease.sqlite"), lease_seconds=0.2)
+    job_id = store.enqueue([real_session])
+
+    async def scenario():
+        runner = JobRunner(store, SaturatedExecutor(pipeline, busy_seconds=0.8), workers=1)
+        runner.start()
+        # Mientras espera al executor, otro worker no puede volver a tomar el trabajo
+        for _ in range(6):
+            await asyncio.sleep(0.1)
+            assert await asyncio.to_thread(store.claim, 10) == []
+        while (await asyncio.to_thread(store.get, job_id))["status"] != DONE:
+            await asyncio.sleep(0.05)
+        await runner.stop()
+
+    asyncio.run(scenario())
+    job = store.get(job_id)
+    assert job["attempts"] == 1
+    assert json.loads(job["result"])["succeeded"] == 1
+
+
+class CallbackServer:
+    """Servidor HTTP local que guarda los callbacks recibidos y responde con `status`"""
+
+    def __init__(self, status=200, location=None):
+        received = self.received = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                self.send_response(status)
+                if location:
+                    self.send_header("Location", location)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/callback"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "tiempo de espera agotado"
+        time.sleep(0.02)
+
+
+def test_callback_to_a_host_outside_the_allowlist_is_rejected(client, real_session, monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_CALLBACK_ALLOWED_HOSTS", "hooks.example.com")
+    for url in ("http://169.254.169.254/latest/meta-data", "http://localhost:8080/", "http://hooks.example.com.evil/"):
+        response = client.post("/api/v1/anomaly/jobs", json={"sessions": [real_session], "callback_url": url})
+        assert response.status_code == 400
+
+    monkeypatch.setattr(settings, "JOBS_CALLBACK_ALLOWED_HOSTS", "")
+    response = client.post("/api/v1/anomaly/jobs",
+                           json={"sessions": [real_session], "callback_url": "http://hooks.example.com/"})
+    assert response.status_code == 400
+
+
+def test_callback_is_delivered_to_an_allowed_host(client, real_session, monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_CALLBACK_ALLOWED_HOSTS", "127.0.0.1")
+    server = CallbackServer()
+    try:
+        response = client.post("/api/v1/anomaly/jobs", json={"sessions": [real_session], "callback_url": server.url})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        wait_for(lambda: server.received)
+        assert server.received[0]["job_id"] == job_id
+        assert server.received[0]["result"]["succeeded"] == 1
+    finally:
+        server.close()
+
+
+def test_callback_errors_do_not_leak_connection_details_or_follow_redirects(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_CALLBACK_ALLOWED_HOSTS", "127.0.0.1")
+    redirecting = CallbackServer(status=302, location="http://169.254.169.254/")
+    try:
+        with pytest.raises(Exception) as redirect:
+            post_callback(redirecting.url, b"{}")
+        assert callback_error_message(redirect.value) == "El callback respondió 302"
+        assert len(redirecting.received) == 1
+    finally:
+        redirecting.close()
+
+    # Puerto cerrado: el motivo (conexión rechazada, DNS, timeout) no se expone
+    with pytest.raises(Exception) as refused:
+        post_callback("http://127.0.0.1:9/callback", b"{}")
+    assert callback_error_message(refused.value) == "No se pudo conectar con el callback"
+
+    with pytest.raises(CallbackRejectedError):
+        post_callback("http://10.0.0.1/callback", b"{}")
+
+
+def test_job_failed_after_max_attempts_gets_its_callback(pipeline, real_session, monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_CALLBACK_ALLOWED_HOSTS", "127.0.0.1")
+    server = CallbackServer()
+    store = JobStore(os.path.join(TEST_DIRECTORY, "jobs_expired.sqlite"), lease_seconds=0.05, max_attempts=1)
+    job_id = store.enqueue([real_session], callback_url=server.url)
+    assert len(store.claim(10)) == 1  # un worker lo toma y muere sin terminarlo
+    time.sleep(0.1)
+
+    async def scenario():
+        runner = JobRunner(store, SaturatedExecutor(pipeline, busy_seconds=0), workers=1)
+        runner.start()
+        while not server.received:
+            await asyncio.sleep(0.02)
+        await runner.stop()
+        return runner
+
+    try:
+        runner = asyncio.run(scenario())
+    finally:
+        server.close()
+    assert runner.jobs_failed == 1
+    assert server.received[0]["job_id"] == job_id and server.received[0]["status"] == FAILED
+    assert store.get(job_id)["callback_status"] == "delivered"
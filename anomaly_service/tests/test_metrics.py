@@ -0,0 +1,95 @@
+import re
+from collections import defaultdict
+
+from app.services.metrics import MetricsRegistry
+
+SAMPLE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(?P<labels>\{(?:[^"}]|"(?:[^"\\]|\\.)*")*\})? (?P<value>\S+)$')
+LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_exposition(text):
+    """Familias {nombre: (tipo, [(muestra, etiquetas, valor)])} validando el orden HELP/TYPE/muestras"""
+    assert text.endswith("\n")
+    families = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            current = line.split(" ", 3)[2]
+            assert current not in families, f"familia repetida: {current}"
+        elif line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name == current and kind in ("counter", "gauge", "histogram")
+            families[name] = (kind, [])
+        else:
+            match = SAMPLE.match(line)
+            assert match, f"línea inválida: {line!r}"
+            name = match["name"]
+            assert name == current or name.startswith(current + "_"), f"{name} fuera de {current}"
+            labels = dict(LABEL.findall(match["labels"] or ""))
+            families[current][1].append((name, labels, float(match["value"])))
+    return families
+
+
+def assert_histograms_are_cumulative(families):
+    for family, (kind, samples) in families.items():
+        if kind != "histogram":
+            continue
+        series = defaultdict(list)
+        counts = {}
+        for name, labels, value in samples:
+            key = tuple(sorted((k, v) for k, v in labels.items() if k != "le"))
+            if name.endswith("_bucket"):
+                series[key].append((labels["le"], value))
+            elif name.endswith("_count"):
+                counts[key] = value
+        for key, buckets in series.items():
+            values = [value for _, value in buckets]
+            assert values == sorted(values), family
+            assert buckets[-1][0] == "+Inf" and buckets[-1][1] == counts[key], family
+
+
+def test_metrics_endpoint_serves_valid_exposition(client, real_session):
+    assert client.post("/api/v1/anomaly/predict-real", json=real_session).status_code == 200
+    client.get("/api/v1/anomaly/progression/metrics-user")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    families = parse_exposition(response.text)
+    assert_histograms_are_cumulative(families)
+
+    kinds = {name: kind for name, (kind, _) in families.items()}
+    assert kinds["anomaly_http_requests_total"] == "counter"
+    assert kinds["anomaly_http_request_duration_seconds"] == "histogram"
+    assert kinds["anomaly_executor_in_flight"] == "gauge"
+
+    routes = {labels["route"] for _, labels, _ in families["anomaly_http_requests_total"][1]}
+    assert "/api/v1/anomaly/predict-real" in routes
+    assert "/api/v1/anomaly/progression/{user_id}" in routes
+    assert not any("metrics-user" in route for route in routes)
+    stages = {labels["stage"] for _, labels, _ in families["anomaly_stage_duration_seconds"][1]}
+    assert {"extract", "score"} <= stages
+    predictions = families["anomaly_predictions_total"][1]
+    assert sum(value for _, _, value in predictions) >= 1
+
+
+def test_registry_escapes_labels_and_formats_values():
+    registry = MetricsRegistry(window_size=10, namespace="prueba")
+    registry.observe_request("GET", '/ruta/"rara"\\\n', 500, 0.003)
+    registry.observe_request("GET", "/ok", 200, 20.0)
+    text = registry.render()
+    families = parse_exposition(text)
+    assert_histograms_are_cumulative(families)
+
+    assert 'prueba_http_request_errors_total{method="GET",route="/ruta/\\"rara\\"\\\\\\n"} 1' in text
+    assert 'prueba_http_request_duration_seconds_bucket{method="GET",route="/ok",le="+Inf"} 1' in text
+    assert 'prueba_http_request_duration_seconds_bucket{method="GET",route="/ok",le="0.005"} 0' in text
+    # Sin predicciones en la ventana los gauges no tienen muestras
+    assert families["prueba_anomaly_rate"][1] == []
+    assert families["prueba_risk_score_window"][1] == []
+
+    registry.observe_prediction("Anomalía", "Sesión muy corta", -0.62)
+    registry.observe_prediction("Normal", "Ninguna", -0.41)
+    families = parse_exposition(registry.render())
+    assert families["prueba_anomaly_rate"][1] == [("prueba_anomaly_rate", {}, 0.5)]
+    assert [labels["quantile"] for _, labels, _ in families["prueba_risk_score_window"][1]] == ["0.5", "0.9", "0.99"]
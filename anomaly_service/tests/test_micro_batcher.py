@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from app.services.executor import ExecutorSaturatedError
+from app.services.micro_batcher import MicroBatcher
+
+
+class RecordingExecutor:
+    """Executor falso: registra los lotes y puede retener el primero hasta `release`"""
+
+    def __init__(self, hold_first: bool = False):
+        self.batches = []
+        self.hold_first = hold_first
+        self.release = asyncio.Event()
+
+    async def run(self, method, sessions, flags):
+        assert method == "predict_sessions"
+        self.batches.append([session["n"] for session in sessions])
+        if self.hold_first and len(self.batches) == 1:
+            await self.release.wait()
+        return [ValueError("sesión inválida") if session.get("invalid") else session["n"] for session in sessions]
+
+
+def run_with_batcher(scenario, **options):
+    async def main():
+        executor = RecordingExecutor(hold_first=options.pop("hold_first", False))
+        batcher = MicroBatcher(executor, **options)
+        try:
+            return await scenario(batcher, executor)
+        finally:
+            await batcher.stop()
+    return asyncio.run(main())
+
+
+def test_idle_request_is_dispatched_immediately():
+    async def scenario(batcher, executor):
+        start = time.perf_counter()
+        assert await batcher.submit({"n": 1}, False) == 1
+        return time.perf_counter() - start, batcher.stats()
+
+    elapsed, stats = run_with_batcher(scenario, max_batch_size=64, max_wait_ms=1000)
+    assert elapsed < 0.5
+    assert stats["flush_reasons"] == {"idle": 1}
+    assert stats["batch_size_histogram"]["1"] == 1
+
+
+def test_requests_during_a_flush_are_batched_by_size():
+    async def scenario(batcher, executor):
+        first = asyncio.create_task(batcher.submit({"n": 0}, False))
+        await asyncio.sleep(0.01)
+        others = [asyncio.create_task(batcher.submit({"n": n}, False)) for n in range(1, 9)]
+        await asyncio.sleep(0.05)
+        executor.release.set()
+        return await asyncio.gather(first, *others), executor.batches, batcher.stats()
+
+    results, batches, stats = run_with_batcher(scenario, max_batch_size=4, max_wait_ms=1000, hold_first=True)
+    assert results == list(range(9))
+    assert batches == [[0], [1, 2, 3, 4], [5, 6, 7, 8]]
+    assert stats["flush_reasons"] == {"idle": 1, "size": 2}
+    assert stats["avg_batch_size"] == 3
+
+
+def test_partial_batch_is_flushed_after_the_wait():
+    async def scenario(batcher, executor):
+        first = asyncio.create_task(batcher.submit({"n": 0}, False))
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        others = asyncio.gather(*(batcher.submit({"n": n}, False) for n in (1, 2)))
+        while len(executor.batches) < 2:
+            await asyncio.sleep(0.001)
+        waited = time.perf_counter() - start
+        executor.release.set()
+        return await first, await others, waited, executor.batches, batcher.stats()
+
+    first, others, waited, batches, stats = run_with_batcher(
+        scenario, max_batch_size=64, max_wait_ms=50, hold_first=True
+    )
+    assert (first, others) == (0, [1, 2])
+    assert batches == [[0], [1, 2]]
+    assert waited >= 0.04
+    assert stats["flush_reasons"] == {"idle": 1, "timeout": 1}
+
+
+def test_errors_and_saturation_reach_only_their_callers():
+    async def scenario(batcher, executor):
+        return await asyncio.gather(
+            batcher.submit({"n": 1}, False),
+            batcher.submit({"n": 2}, False),
+            return_exceptions=True
+        )
+
+    results = run_with_batcher(scenario, max_pending=1)
+    assert results[0] == 1
+    assert isinstance(results[1], ExecutorSaturatedError)
+
+    async def invalid(batcher, executor):
+        held = asyncio.create_task(batcher.submit({"n": 0}, False))
+        await asyncio.sleep(0.01)
+        batch = asyncio.gather(
+            batcher.submit({"n": 1}, False), batcher.submit({"n": 2, "invalid": True}, False),
+            return_exceptions=True
+        )
+        await asyncio.sleep(0.02)
+        executor.release.set()
+        return await held, await batch
+
+    held, batch = run_with_batcher(invalid, max_wait_ms=10, hold_first=True)
+    assert held == 0 and batch[0] == 1
+    assert isinstance(batch[1], ValueError)
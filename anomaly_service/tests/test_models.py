@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import SERVICE_DIRECTORY, TEST_DIRECTORY
+
+from app.core.config import settings
+
+
+def test_admin_endpoints_are_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get("/api/v1/anomaly/models").status_code == 403
+    response = client.post("/api/v1/anomaly/models/default/activate", headers={"X-Admin-Token": ""})
+    assert response.status_code == 403
+
+
+def test_admin_endpoints_require_the_configured_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secreto")
+    assert client.get("/api/v1/anomaly/models").status_code == 401
+    assert client.get("/api/v1/anomaly/models", headers={"X-Admin-Token": "otro"}).status_code == 401
+    response = client.get("/api/v1/anomaly/models", headers={"X-Admin-Token": "secreto"})
+    assert response.status_code == 200 and "active_version" in response.text
+
+
+def test_warm_up_reads_only_the_sessions_it_needs(client, monkeypatch):
+    from app.api.endpoints.anomaly import model_manager, scoring_pipeline
+
+    # Las primeras sesiones son válidas y el resto del archivo está cortado: no debe leerse
+    path = os.path.join(TEST_DIRECTORY, "warmup.ndjson")
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), "sessions_all.json")) as f:
+        sessions = json.load(f)[:3]
+    with open(path, "w") as f:
+        f.write("\n".join(json.dumps(session) for session in sessions) + '\n{"cortado": ')
+    monkeypatch.setattr(settings, "MODEL_WARMUP_PATH", path)
+    monkeypatch.setattr(settings, "MODEL_WARMUP_SESSIONS", 3)
+
+    model_manager.warm_up(scoring_pipeline.anomaly_predictor)
+
+    monkeypatch.setattr(settings, "MODEL_WARMUP_SESSIONS", 4)
+    with pytest.raises(ValueError):
+        model_manager.warm_up(scoring_pipeline.anomaly_predictor)
+
+
+def test_shipped_warm_up_sample_is_used_by_default(client, capsys):
+    from app.api.endpoints.anomaly import model_manager, scoring_pipeline
+
+    path = os.path.join(SERVICE_DIRECTORY, settings.MODEL_WARMUP_PATH)
+    with open(path) as f:
+        sessions = json.load(f)
+    assert len(sessions) >= settings.MODEL_WARMUP_SESSIONS
+    features = scoring_pipeline.feature_extractor.extract_features_batch(sessions)
+    assert not any(isinstance(row, Exception) for row in features)
+
+    model_manager.warm_up(scoring_pipeline.anomaly_predictor)
+    assert "⚠️" not in capsys.readouterr().out
+
+
+def test_warm_up_falls_back_to_synthetic_rows_and_logs_it(client, monkeypatch, capsys):
+    from app.api.endpoints.anomaly import model_manager, scoring_pipeline
+
+    monkeypatch.setattr(settings, "MODEL_WARMUP_PATH", os.path.join(TEST_DIRECTORY, "no-existe.json"))
+    model_manager.warm_up(scoring_pipeline.anomaly_predictor)
+    assert "⚠️ Sin sesiones de muestra válidas" in capsys.readouterr().out
+
+
+def test_registry_version_prefers_its_own_warm_up_sample(client, monkeypatch, capsys):
+    from app.api.endpoints.anomaly import model_manager
+
+    registry = model_manager.registry
+    directory = registry.version_dir("con-muestra")
+    os.makedirs(directory, exist_ok=True)
+    shutil.copy(os.path.join(SERVICE_DIRECTORY, settings.MODEL_PATH), os.path.join(directory, "modelo_isolation.pkl"))
+    shutil.copy(os.path.join(SERVICE_DIRECTORY, settings.SCALER_PATH), os.path.join(directory, "scaler.pkl"))
+    with open(os.path.join(SERVICE_DIRECTORY, "sessions_all.json")) as f:
+        sessions = json.load(f)[:2]
+    with open(os.path.join(directory, "warmup_sessions.json"), "w") as f:
+        json.dump(sessions, f)
+    monkeypatch.setattr(settings, "MODEL_WARMUP_PATH", os.path.join(TEST_DIRECTORY, "no-existe.json"))
+
+    assert registry.warmup_path("con-muestra") == os.path.join(directory, "warmup_sessions.json")
+    assert registry.warmup_path("default") == settings.MODEL_WARMUP_PATH
+    model_manager.warm_up(registry.create_predictor("con-muestra"))
+    assert "⚠️" not in capsys.readouterr().out
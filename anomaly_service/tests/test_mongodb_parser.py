@@ -0,0 +1,60 @@
+import pytest
+
+from app.services.progression_index import SECONDS_PER_DAY, exercise_average_weights, session_day
+from app.services.scoring_pipeline import ScoringPipeline
+from app.utils.mongodb_parser import MongoDBParser
+
+DAY = 20000  # 2024-10-04
+
+
+@pytest.mark.parametrize("date_value, expected", [
+    ({"$date": {"$numberLong": str(DAY * 86400 * 1000)}}, DAY),
+    ({"$date": "2024-10-04T00:00:00Z"}, DAY),
+    ("2024-10-04T00:00:00.000Z", DAY),
+    (DAY * SECONDS_PER_DAY, DAY),
+    ({"$date": {"$numberLong": "no es un número"}}, None),
+    ({"$date": "no es una fecha"}, None),
+    ({"sin": "envoltorio"}, None),
+    (None, None),
+])
+def test_session_day(date_value, expected, capsys):
+    assert session_day(date_value) == expected
+    assert capsys.readouterr().out == ""
+
+
+def test_exercise_average_weights_decodes_wrappers_silently(capsys):
+    session = {"exercises": [
+        {"name": "Press", "sets": [{"weight": {"$numberInt": "20"}}, {"weight": {"$numberDouble": "30.0"}}]},
+        {"name": "Remo", "sets": [{"weight": 40}, {"weight": {"$numberInt": "x"}}]},
+    ]}
+    assert exercise_average_weights(session) == {"Press": 25.0, "Remo": 20.0}
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("session_id, expected", [
+    ({"$oid": "6874ac9acce77ea8580e6158"}, "6874ac9acce77ea8580e6158"),
+    ("6874ac9acce77ea8580e6158", "6874ac9acce77ea8580e6158"),
+    ({"$numberInt": "x"}, "{'$numberInt': 'x'}"),
+])
+def test_get_session_id(session_id, expected, capsys):
+    assert ScoringPipeline.get_session_id({"_id": session_id}) == expected
+    assert ScoringPipeline.get_session_id({}) is None
+    assert capsys.readouterr().out == ""
+
+
+def test_legacy_helpers_return_defaults_without_printing(capsys):
+    assert MongoDBParser.parse_date({"$date": {"$numberLong": "x"}}) == 0.0
+    assert MongoDBParser.parse_number({"$numberInt": "x"}) == 0.0
+    assert MongoDBParser.parse_number(None) == 0.0
+    assert capsys.readouterr().out == ""
+
+
+def test_unconverted_set_wrapper_fails_its_own_session(pipeline, real_session):
+    wrapped = {**real_session, "exercises": [dict(exercise) for exercise in real_session["exercises"]]}
+    wrapped["exercises"][0]["sets"] = [{**wrapped["exercises"][0]["sets"][0], "weight": {"$numberInt": "25"}}]
+
+    outcomes = pipeline.feature_extractor.extract_features_batch([real_session, wrapped])
+    assert isinstance(outcomes[0], dict)
+    assert isinstance(outcomes[1], TypeError)
+    with pytest.raises(TypeError):
+        pipeline.feature_extractor.extract_exercise_features(wrapped["exercises"])
@@ -0,0 +1,15 @@
+import pytest
+
+from app.core.config import settings
+from app.core.prefork import PreforkServer
+
+
+def test_prefork_refuses_shared_per_user_state_files(monkeypatch):
+    monkeypatch.setattr(settings, "USER_BASELINES_PATH", "cache/user_baselines.npz")
+    with pytest.raises(RuntimeError, match="USER_BASELINES_PATH"):
+        PreforkServer(app=None, workers=2)
+
+    # Un solo worker puede persistir; varios solo con el estado en memoria
+    PreforkServer(app=None, workers=1)
+    monkeypatch.setattr(settings, "USER_BASELINES_PATH", "")
+    PreforkServer(app=None, workers=2)
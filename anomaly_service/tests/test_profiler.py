@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from app.core.config import settings
+from app.services.profiler import SamplingProfiler
+
+ADMIN_HEADERS = {"X-Admin-Token": "secreto"}
+PROFILE_ENDPOINTS = [
+    ("post", "/api/v1/anomaly/profile"),
+    ("get", "/api/v1/anomaly/profile"),
+    ("get", "/api/v1/anomaly/profile/download"),
+]
+
+
+@pytest.fixture
+def profiler(monkeypatch):
+    from app.api.endpoints import anomaly
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secreto")
+    request_profiler = SamplingProfiler(max_requests=50, max_seconds=10)
+    monkeypatch.setattr(anomaly, "request_profiler", request_profiler)
+    yield request_profiler
+    request_profiler.stop()
+
+
+@pytest.mark.parametrize("method,path", PROFILE_ENDPOINTS)
+def test_profile_endpoints_require_the_admin_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert getattr(client, method)(path, headers=ADMIN_HEADERS).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secreto")
+    assert getattr(client, method)(path).status_code == 401
+    assert getattr(client, method)(path, headers={"X-Admin-Token": "otro"}).status_code == 401
+    # PROFILING_ENABLED=false: con el token correcto el profiler no existe
+    response = getattr(client, method)(path, headers=ADMIN_HEADERS)
+    assert response.status_code == 404 and "PROFILING_ENABLED" in response.json()["detail"]
+
+
+def test_capture_stops_after_the_requested_predictions(client, profiler, real_session):
+    assert client.get("/api/v1/anomaly/profile/download", headers=ADMIN_HEADERS).status_code == 404
+    assert client.post("/api/v1/anomaly/profile?requests=0", headers=ADMIN_HEADERS).status_code == 400
+
+    response = client.post("/api/v1/anomaly/profile?requests=2&interval_ms=1", headers=ADMIN_HEADERS)
+    assert response.status_code == 202
+    assert response.json()["active"] and response.json()["target_requests"] == 2
+    assert client.post("/api/v1/anomaly/profile?requests=2", headers=ADMIN_HEADERS).status_code == 409
+
+    for _ in range(2):
+        assert client.post("/api/v1/anomaly/predict-real", json=real_session).status_code == 200
+    profiler._thread.join(5)
+    status = client.get("/api/v1/anomaly/profile", headers=ADMIN_HEADERS).json()
+    assert not status["active"]
+    assert (status["requests"], status["stop_reason"]) == (2, "peticiones completadas")
+    assert status["finished_at"] is not None
+
+    collapsed = client.get("/api/v1/anomaly/profile/download", headers=ADMIN_HEADERS)
+    assert collapsed.status_code == 200
+    assert "profile.collapsed.txt" in collapsed.headers["content-disposition"]
+    assert all(re.fullmatch(r"\S.* \d+", line) for line in collapsed.text.splitlines())
+    summary = client.get("/api/v1/anomaly/profile/download?format=json&top=5", headers=ADMIN_HEADERS).json()
+    assert {"self", "inclusive", "thread_samples"} <= set(summary)
+    assert len(summary["self"]) <= 5
+    response = client.get("/api/v1/anomaly/profile/download?format=svg", headers=ADMIN_HEADERS)
+    assert response.status_code == 400
+
+
+def test_capture_stops_at_the_time_limit():
+    profiler = SamplingProfiler(max_requests=10, max_seconds=0.05)
+    profiler.start(10, interval_ms=1)
+    profiler._thread.join(5)
+    assert not profiler.active
+    assert profiler.stop_reason == "tiempo máximo alcanzado"
+    assert profiler.requests == 0 and profiler.samples > 0
@@ -0,0 +1,89 @@
+import copy
+import threading
+
+import pytest
+
+from app.services.feature_extractor import FeatureExtractor
+from app.services.result_cache import ResultCache
+from app.services.scoring_pipeline import ScoringPipeline
+
+
+@pytest.fixture
+def cached_pipeline(pipeline):
+    return ScoringPipeline(FeatureExtractor(), pipeline.anomaly_predictor, ResultCache(max_entries=100))
+
+
+def score(scoring_pipeline, session):
+    outcome = scoring_pipeline.predict_sessions([session], [False])[0]
+    assert not isinstance(outcome, Exception)
+    return outcome
+
+
+def fresh_score(pipeline, session):
+    return score(ScoringPipeline(FeatureExtractor(), pipeline.anomaly_predictor), session)
+
+
+def test_repeated_content_is_a_hit_and_matches_a_fresh_score(cached_pipeline, pipeline, real_session):
+    cache = cached_pipeline.result_cache
+    first = score(cached_pipeline, real_session)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # Mismo contenido con otro _id: comparte entrada
+    resent = copy.deepcopy(real_session)
+    resent["_id"] = "otra-sesion"
+    cached = score(cached_pipeline, resent)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cached == first == fresh_score(pipeline, resent)
+
+    resent["exercises"][0]["sets"][0]["weight"] += 5
+    score(cached_pipeline, resent)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_tied_muscle_groups_in_another_order_are_a_miss(cached_pipeline, pipeline, real_session):
+    real_session["statistics"]["setsByMuscleGroup"] = {"PECHO": 3, "HOMBRO": 3}
+    reordered = copy.deepcopy(real_session)
+    reordered["statistics"]["setsByMuscleGroup"] = {"HOMBRO": 3, "PECHO": 3}
+
+    assert score(cached_pipeline, real_session).session_summary["dominant_muscle_group"] == "PECHO"
+    response = score(cached_pipeline, reordered)
+    assert cached_pipeline.result_cache.hits == 0
+    assert response.session_summary["dominant_muscle_group"] == "HOMBRO"
+    assert response == fresh_score(pipeline, reordered)
+
+
+def test_model_swap_invalidates_cached_results(cached_pipeline, pipeline, real_session):
+    cache = cached_pipeline.result_cache
+    score(cached_pipeline, real_session)
+
+    swapped = copy.copy(pipeline.anomaly_predictor)
+    swapped.model_version = "otra-version"
+    cached_pipeline.anomaly_predictor = swapped
+    response = score(cached_pipeline, real_session)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert response.model_version == "otra-version"
+
+    assert score(cached_pipeline, real_session).model_version == "otra-version"
+    assert cache.hits == 1
+
+
+def test_concurrent_lookups_count_every_lookup(cached_pipeline, real_session):
+    cache = cached_pipeline.result_cache
+    response = score(cached_pipeline, real_session)
+    cache.set("conocida", response)
+    threads_count, rounds = 8, 300
+
+    def lookup():
+        for _ in range(rounds):
+            cache.get("conocida")
+            cache.get("desconocida")
+
+    threads = [threading.Thread(target=lookup) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["hits"] == threads_count * rounds
+    assert stats["misses"] == threads_count * rounds + 1
@@ -0,0 +1,54 @@
+import sqlite3
+
+import pytest
+
+from app.core.config import settings
+
+ADMIN_HEADERS = {"X-Admin-Token": "secreto"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secreto")
+
+
+def stored_rows(pipeline, session_id):
+    pipeline.session_store.flush()
+    with sqlite3.connect(pipeline.session_store.path) as connection:
+        return connection.execute(
+            "SELECT COUNT(*) FROM scored_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+
+
+def test_resent_real_session_is_stored_once(client, pipeline, real_session):
+    real_session["_id"] = "store-real-1"
+    real_session["userId"] = "store-user-real"
+    for _ in range(2):
+        assert client.post("/api/v1/anomaly/predict-real", json=real_session).status_code == 200
+
+    assert stored_rows(pipeline, "store-real-1") == 1
+    stats = client.get("/api/v1/anomaly/history/users/store-user-real/stats?days=0", headers=ADMIN_HEADERS).json()
+    assert stats["sessions"] == 1
+
+
+def test_resent_extended_session_is_stored_once(client, pipeline, extended_session):
+    extended_session["_id"] = {"$oid": "5f0000000000000000000001"}
+    extended_session["userId"] = "store-user-extended"
+    for _ in range(2):
+        assert client.post("/api/v1/anomaly/predict", json=extended_session).status_code == 200
+
+    assert stored_rows(pipeline, "5f0000000000000000000001") == 1
+    global_before = client.get("/api/v1/anomaly/history/stats?days=0", headers=ADMIN_HEADERS).json()["sessions"]
+    client.post("/api/v1/anomaly/predict", json=extended_session)
+    pipeline.session_store.flush()
+    assert client.get("/api/v1/anomaly/history/stats?days=0", headers=ADMIN_HEADERS).json()["sessions"] == global_before
+
+
+def test_history_requires_the_admin_token(client, monkeypatch):
+    for path in ("/history/stats", "/history/users/store-user-real", "/history/users/store-user-real/stats"):
+        assert client.get(f"/api/v1/anomaly{path}").status_code == 401
+        assert client.get(f"/api/v1/anomaly{path}", headers={"X-Admin-Token": "otro"}).status_code == 401
+        assert client.get(f"/api/v1/anomaly{path}", headers=ADMIN_HEADERS).status_code in (200, 404)
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get("/api/v1/anomaly/history/stats", headers={"X-Admin-Token": ""}).status_code == 403
@@ -0,0 +1,84 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from app.utils.session_stream import SessionStreamReader, aiter_ndjson
+
+SESSIONS = [
+    {"userId": f"u{i}", "notes": "descanso largo éሴ", "sets": [1.5e3, True, None, False, -2]}
+    for i in range(20)
+]
+
+
+class CountingStream(io.StringIO):
+    """StringIO que cuenta las lecturas"""
+    reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 64])
+@pytest.mark.parametrize("text", [json.dumps(SESSIONS), "\n".join(json.dumps(s) for s in SESSIONS)])
+def test_values_split_across_reads_are_decoded(text, read_size):
+    assert list(SessionStreamReader(io.StringIO(text), read_size=read_size)) == SESSIONS
+
+
+def test_invalid_json_raises_without_reading_to_the_end():
+    stream = CountingStream('{"userId": "u0", oops}\n' + "\n".join(json.dumps(s) for s in SESSIONS) * 50)
+    with pytest.raises(ValueError):
+        list(SessionStreamReader(stream, read_size=64))
+    assert stream.reads == 1
+
+
+def test_value_larger_than_the_limit_raises():
+    stream = io.StringIO('[{"notes": "' + "x" * 5000 + '"}]')
+    with pytest.raises(ValueError, match="más de 1000 caracteres"):
+        list(SessionStreamReader(stream, read_size=64, max_value_size=1000))
+
+
+async def collect_ndjson(parts, max_line_bytes):
+    async def chunks():
+        for part in parts:
+            yield part
+    return [value async for value in aiter_ndjson(chunks(), max_line_bytes)]
+
+
+def split_every(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("part_size", [1, 5, 64, 10000])
+def test_ndjson_lines_over_the_limit_fail_in_their_own_slot(part_size):
+    body = b"\n".join([
+        json.dumps(SESSIONS[0]).encode(),
+        b"",
+        b'{"notes": "' + b"x" * 500 + b'"}',
+        b"{invalido",
+        json.dumps(SESSIONS[1]).encode(),
+    ]) + b"\n" + b"y" * 300
+
+    values = asyncio.run(collect_ndjson(split_every(body, part_size), max_line_bytes=200))
+    assert values[0] == SESSIONS[0]
+    assert isinstance(values[1], ValueError) and "máximo de 200 bytes" in str(values[1])
+    assert isinstance(values[2], ValueError) and "máximo" not in str(values[2])
+    assert values[3] == SESSIONS[1]
+    assert isinstance(values[4], ValueError) and "máximo de 200 bytes" in str(values[4])
+    assert len(values) == 5
+
+
+def test_stream_endpoint_reports_oversized_line(client, real_session, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "STREAM_MAX_LINE_BYTES", 4096)
+    line = json.dumps(real_session)
+    body = "\n".join([line, '{"notes": "' + "x" * 5000 + '"}', line]) + "\n"
+
+    response = client.post("/api/v1/anomaly/predict-stream", content=body,
+                           headers={"Content-Type": "application/x-ndjson"})
+    results = [json.loads(row) for row in response.text.splitlines()]
+    assert [item["index"] for item in results] == [0, 1, 2]
+    assert results[0]["result"] is not None and results[2]["result"] is not None
+    assert "4096 bytes" in results[1]["error"]
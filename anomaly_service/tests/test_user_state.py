@@ -0,0 +1,44 @@
+from app.core.config import settings
+
+
+def post_real(client, session, session_id):
+    session["_id"] = session_id
+    response = client.post("/api/v1/anomaly/predict-real", json=session)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_resent_session_updates_user_baseline_once(client, pipeline, real_session):
+    real_session["userId"] = "baseline-user-resend"
+    for _ in range(2):
+        post_real(client, real_session, "baseline-session-1")
+    assert pipeline.user_baselines.baseline("baseline-user-resend")["sessions_seen"] == 1
+
+    post_real(client, real_session, "baseline-session-2")
+    assert pipeline.user_baselines.baseline("baseline-user-resend")["sessions_seen"] == 2
+
+
+def test_resent_session_counts_once_in_progression(client, pipeline, real_session):
+    real_session["userId"] = "progression-user-resend"
+    for _ in range(2):
+        post_real(client, real_session, "progression-session-1")
+    trends = pipeline.progression_index.user_progression("progression-user-resend")
+    assert trends and all(trend["sessions"] == 1 for trend in trends)
+
+    post_real(client, real_session, "progression-session-2")
+    trends = pipeline.progression_index.user_progression("progression-user-resend")
+    assert all(trend["sessions"] == 2 for trend in trends)
+
+
+def test_progression_requires_the_admin_token(client, monkeypatch, real_session):
+    real_session["userId"] = "progression-user-admin"
+    post_real(client, real_session, "progression-admin-1")
+    path = "/api/v1/anomaly/progression/progression-user-admin"
+
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+    assert client.get(path).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "secreto")
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"X-Admin-Token": "otro"}).status_code == 401
+    response = client.get(path, headers={"X-Admin-Token": "secreto"})
+    assert response.status_code == 200 and response.json()["user_id"] == "progression-user-admin"
@@ -0,0 +1,80 @@
+import pytest
+
+REAL = "/api/v1/anomaly/predict-real"
+EXTENDED = "/api/v1/anomaly/predict"
+BATCH = "/api/v1/anomaly/predict-batch"
+
+
+def first_set(session):
+    return session["exercises"][0]["sets"][0]
+
+
+def test_real_session_as_sent_by_the_backend_still_scores(client, real_session):
+    # SessionSetDto: `weight?: number`, sin id de set ni de ejercicio
+    for exercise in real_session["exercises"]:
+        del exercise["id"]
+        for s in exercise["sets"]:
+            del s["id"]
+    del first_set(real_session)["weight"]
+    first_set(real_session)["reps"] = 10.0
+
+    response = client.post(REAL, json=real_session)
+    assert response.status_code == 200
+    assert response.json()["features_used"]["total_sets"] > 0
+
+    body = client.post(BATCH, json={"sessions": [real_session]}).json()
+    assert body["succeeded"] == 1
+
+
+def test_extended_session_without_optional_fields_still_scores(client, extended_session):
+    exercise = extended_session["exercises"][0]
+    del exercise["id"]
+    del exercise["sets"][0]["weight"]
+    exercise["sets"][1]["reps"] = 10  # sin envolver
+    exercise["sets"][1]["weight"] = {"$numberDouble": "30.5"}
+
+    assert client.post(EXTENDED, json=extended_session).status_code == 200
+
+
+@pytest.mark.parametrize("field, value", [
+    ("reps", "10"),  # número como texto
+    ("restTime", True),  # booleano como número
+    ("weight", None),
+])
+def test_real_session_rejects_mistyped_sets(client, real_session, field, value):
+    first_set(real_session)[field] = value
+    response = client.post(REAL, json=real_session)
+    assert response.status_code == 422
+    assert any(field in error["loc"] and "sets" in error["loc"] for error in response.json()["detail"])
+
+
+@pytest.mark.parametrize("value", [
+    {"$numberInt": "doce"},
+    {"$oid": "12"},
+    {"$numberInt": "1", "$numberLong": "1"},
+    "12",
+    False,
+])
+def test_extended_session_rejects_mistyped_sets(client, extended_session, value):
+    first_set(extended_session)["reps"] = value
+    response = client.post(EXTENDED, json=extended_session)
+    assert response.status_code == 422
+    assert any("reps" in error["loc"] for error in response.json()["detail"])
+
+
+def test_extended_session_requires_exercise_fields(client, extended_session):
+    del extended_session["exercises"][0]["muscleGroup"]
+    assert client.post(EXTENDED, json=extended_session).status_code == 422
+
+
+def test_compact_responses_omit_features_used(client, real_session, extended_session):
+    for url, session in ((REAL, real_session), (EXTENDED, extended_session)):
+        full = client.post(url, json=session).json()
+        compact = client.post(f"{url}?compact=true", json=session).json()
+        assert "features_used" in full and "features_used" not in compact
+        assert compact["risk_score"] == full["risk_score"]
+        assert compact["session_summary"] == full["session_summary"]
+
+    body = client.post(f"{BATCH}?compact=true", json={"sessions": [real_session, extended_session]}).json()
+    assert body["succeeded"] == 2
+    assert all("features_used" not in item["result"] for item in body["results"])